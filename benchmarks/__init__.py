@@ -0,0 +1,4 @@
+"""Benchmarks for mdframe.
+
+Run from the root of the repository, e.g. `python -m benchmarks.suite --sizes 1k,10k`.
+"""
@@ -0,0 +1,145 @@
+"""Generator of synthetic metadata archives for benchmarking.
+
+Every synthetic file is a copy of one of the bundled metadata files (`src/mdframe/data`)
+with a fresh `gid`/`uid`, renamed RGBD files and jittered weight, quality and capture
+times, so the archive has realistic contents and still validates against `schema.json`.
+
+    python -m benchmarks.archive OUTPUT_DIR -n 10k
+"""
+
+import argparse
+import copy
+import json
+import random
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List
+import toml
+from mdframe.reader import list_metadata_files, load_metadata_file
+
+PACKAGE_DIR = Path(__file__).parent.parent / "src" / "mdframe"
+TEMPLATE_DIR = PACKAGE_DIR / "data"
+SCHEMA_PATH = PACKAGE_DIR / "schema.json"
+
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+# written last, an archive without it is incomplete and gets regenerated
+ARCHIVE_MANIFEST = "archive.json"
+
+
+def parse_size(size: str) -> int:
+    """Parses an archive size given as a number or as one of `SIZES`, e.g. `10k`."""
+    return SIZES[size.lower()] if size.lower() in SIZES else int(size)
+
+
+def load_templates(template_dir: Path = TEMPLATE_DIR, schema_path: Path = SCHEMA_PATH) -> List[Dict[str, Any]]:
+    with open(schema_path, "r") as f:
+        schema = json.load(f)
+    return [load_metadata_file(path, schema) for path in list_metadata_files(template_dir, "toml")]
+
+
+def _shift_time(value: Any, seconds: int) -> Any:
+    if not isinstance(value, str) or value.count(":") != 2:
+        return value
+    try:
+        hours, minutes, secs = (int(part) for part in value.split(":"))
+    except ValueError:
+        return value
+    total = (hours * 3600 + minutes * 60 + secs + seconds) % (24 * 3600)
+    return f"{total // 3600:02d}:{total // 60 % 60:02d}:{total % 60:02d}"
+
+
+def synthesize_record(template: Dict[str, Any], gid: int, rng: random.Random) -> Dict[str, Any]:
+    """Derives a new record from `template`.
+
+    Args:
+        template (Dict[str, Any]): contents of a valid metadata file
+        gid (int): `gid` of the new record
+        rng (random.Random): source of randomness
+
+    Returns:
+        Dict[str, Any]: the new record
+    """
+    record = copy.deepcopy(template)
+    old_gid = str(template.get("gid"))
+    record["gid"] = gid
+    record["uid"] = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+    metrics = record.get("metrics", {})
+    if isinstance(metrics.get("weight"), (int, float)) and not isinstance(metrics.get("weight"), bool):
+        metrics["weight"] = max(1, round(metrics["weight"] * rng.uniform(0.5, 1.5)))
+
+    model = record.get("model", {})
+    model["rgbd_file_names"] = [name.replace(old_gid, str(gid), 1) if isinstance(name, str) else name
+                                for name in model.get("rgbd_file_names", [])]
+    if "quality" in model:
+        model["quality"] = rng.randint(1, 3)
+
+    times = record.get("time")
+    if isinstance(times, dict):
+        shift = rng.randint(-3600, 3600)
+        for key in ("started", "finished"):
+            if key in times:
+                times[key] = _shift_time(times[key], shift)
+    return record
+
+
+def generate_archive(output_dir: Path,
+                     count: int,
+                     template_dir: Path = TEMPLATE_DIR,
+                     seed: int = 0) -> Path:
+    """Writes an archive of `count` synthetic metadata files to `output_dir`.
+
+    An existing complete archive of the same size and seed is reused as is.
+
+    Args:
+        output_dir (Path): directory of the archive, created if missing
+        count (int): number of metadata files
+        template_dir (Path): directory with the metadata files used as templates
+        seed (int): seed of the random generator, equal seeds give equal archives
+
+    Returns:
+        Path: `output_dir`
+    """
+    output_dir = Path(output_dir)
+    manifest_path = output_dir / ARCHIVE_MANIFEST
+    manifest = {"count": count, "seed": seed, "templates": str(Path(template_dir).resolve())}
+    if manifest_path.exists() and json.loads(manifest_path.read_text()) == manifest:
+        return output_dir
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for stale in output_dir.glob("*.toml"):
+        stale.unlink()
+
+    templates = load_templates(template_dir)
+    rng = random.Random(seed)
+    width = len(str(count - 1))
+    for gid in range(count):
+        template = templates[gid % len(templates)]
+        record = synthesize_record(template, gid, rng)
+        food_type = str(record.get("item", {}).get("food_type", "item")).replace(" ", "_")
+        with open(output_dir / f"{gid:0{width}d}_{food_type}.toml", "w") as f:
+            f.write(toml.dumps(record))
+
+    manifest_path.write_text(json.dumps(manifest))
+    return output_dir
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('output',
+                        help='Directory to write the archive to')
+    parser.add_argument('-n', '--size',
+                        help=f'Number of metadata files, either a number or one of {", ".join(SIZES)}',
+                        default="1k")
+    parser.add_argument('--seed',
+                        type=int,
+                        default=0)
+    args = parser.parse_args()
+
+    count = parse_size(args.size)
+    generate_archive(Path(args.output), count, seed=args.seed)
+    print(f"Wrote {count} metadata files to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
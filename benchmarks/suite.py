@@ -0,0 +1,195 @@
+"""Scaling benchmarks of the ingestion, filtering, histogram and timing entry points.
+
+Every case runs in a fresh process so its peak RSS isn't inflated by earlier cases. The
+results (wall time, peak RSS and files per second per case and archive size) are written
+as JSON, and a previous result file can be passed to `--compare` to spot regressions.
+
+    python -m benchmarks.suite --sizes 1k,10k -o results.json [--compare baseline.json]
+"""
+
+import argparse
+import gc
+import json
+import multiprocessing
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from queue import Empty
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from benchmarks.archive import SCHEMA_PATH, generate_archive, parse_size
+
+RESULTS_FORMAT_VERSION = 1
+
+
+@dataclass
+class Result:
+    case: str
+    size: int
+    wall_time: float
+    peak_rss: int
+    files_per_second: float
+
+
+def _prepare(case: str, data_path: Path, workers: int) -> Callable[[], Any]:
+    """Does the untimed set-up of `case` and returns the function to time."""
+    import matplotlib
+    # histograms are drawn off-screen, `plt.show` must not block
+    matplotlib.use("Agg")
+    from mdframe.reader import Config, run
+    from mdframe.analysis import filter_data, generate_histogram, load_flattened_data
+    from mdframe.filtering import filter_files
+    from mdframe.timing import calc_time_and_rate_from_a_generic_df
+
+    config = Config(data_path, "toml", SCHEMA_PATH, workers=workers)
+    query = 'quality >= 2 and food_type in ["apple", "banana"]'
+    if case == "run":
+        return lambda: run(config)
+    if case == "run_records":
+        return lambda: run(config, output="records")
+    if case == "load_flattened_data":
+        return lambda: load_flattened_data(config)
+    if case == "filter_data":
+        output = Path(tempfile.mkdtemp()) / "filtered.csv"
+        return lambda: filter_data(config, query, output)
+    if case == "filter_files":
+        files_query = 'weight > 100'
+        if not filter_files(data_path, "toml", query=files_query, schema_loc=SCHEMA_PATH):
+            raise RuntimeError(f"Benchmark query {files_query} matches no records")
+        return lambda: filter_files(data_path, "toml", query=files_query, contain_list=["IMG_4166"],
+                                    schema_loc=SCHEMA_PATH)
+    if case == "generate_histogram":
+        return lambda: generate_histogram(config, "weight", data_type="continuous")
+    if case == "calc_time_and_rate_from_a_generic_df":
+        # only the timing itself is measured, the records are loaded beforehand
+        records = [record.to_dict() for record in run(config)]
+        return lambda: calc_time_and_rate_from_a_generic_df(records, start_key="started", end_key="finished",
+                                                            skip_invalid=True)
+    raise ValueError(f"Unknown benchmark case {case}")
+
+
+CASES = ("run", "run_records", "load_flattened_data", "filter_data", "filter_files", "generate_histogram",
+         "calc_time_and_rate_from_a_generic_df")
+
+
+def _peak_rss() -> int:
+    usage = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # kilobytes on Linux, bytes on macOS
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+def _measure(case: str, data_path: Path, size: int, workers: int, queue: multiprocessing.Queue):
+    function = _prepare(case, data_path, workers)
+    gc.collect()
+    start = time.perf_counter()
+    function()
+    wall_time = time.perf_counter() - start
+    queue.put(Result(case, size, wall_time, _peak_rss(), size / wall_time if wall_time > 0 else float("inf")))
+
+
+def run_case(case: str, data_path: Path, size: int, workers: int = 1) -> Result:
+    """Times `case` on the archive at `data_path` in a fresh process."""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_measure, args=(case, data_path, size, workers, queue))
+    process.start()
+    try:
+        while True:
+            try:
+                return queue.get(timeout=1.0)
+            except Empty:
+                if not process.is_alive():
+                    raise RuntimeError(f"Benchmark case {case} failed with exit code {process.exitcode}")
+    finally:
+        process.join()
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: List[Result], baseline: Dict[str, Any]) -> List[Tuple[str, int, float, float]]:
+    """Pairs `results` with the matching entries of a previous results file.
+
+    Returns:
+        List[Tuple[str, int, float, float]]: case, size, and the ratios of wall time and
+            peak RSS to the baseline (above 1 means slower or bigger)
+    """
+    previous = {(entry["case"], entry["size"]): entry for entry in baseline["results"]}
+    ratios = []
+    for result in results:
+        entry = previous.get((result.case, result.size))
+        if entry is not None:
+            ratios.append((result.case, result.size,
+                           result.wall_time / entry["wall_time"], result.peak_rss / entry["peak_rss"]))
+    return ratios
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes',
+                        help='Comma-separated archive sizes, e.g. 1k,10k,100k,1m',
+                        default="1k,10k")
+    parser.add_argument('--cases',
+                        help=f'Comma-separated cases to run, out of {", ".join(CASES)}',
+                        default=",".join(CASES))
+    parser.add_argument('--archive-dir',
+                        help='Directory where the synthetic archives are generated and kept between runs',
+                        default=Path(tempfile.gettempdir()) / "mdframe-benchmarks")
+    parser.add_argument('-j', '--jobs',
+                        type=int,
+                        help='Number of worker processes used to parse and validate the metadata',
+                        default=1)
+    parser.add_argument('-o', '--output',
+                        help='Path of the JSON results file',
+                        default=None)
+    parser.add_argument('--compare',
+                        help='Path of a previous JSON results file to compare against',
+                        default=None)
+    args = parser.parse_args()
+
+    cases = [case for case in args.cases.split(",") if case]
+    unknown_cases = set(cases) - set(CASES)
+    if unknown_cases:
+        parser.error(f"Unknown cases {sorted(unknown_cases)}")
+
+    results = []
+    for size in (parse_size(size) for size in args.sizes.split(",") if size):
+        data_path = generate_archive(Path(args.archive_dir) / str(size), size)
+        for case in cases:
+            result = run_case(case, data_path, size, args.jobs)
+            results.append(result)
+            print(f"{case:<40}{size:>9} files {result.wall_time:>10.3f} s {result.peak_rss / 2**20:>9.1f} MiB"
+                  f" {result.files_per_second:>12.1f} files/s", flush=True)
+
+    report = {
+        "format_version": RESULTS_FORMAT_VERSION,
+        "commit": _git_commit(),
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "jobs": args.jobs,
+        "results": [asdict(result) for result in results],
+    }
+    if args.output is not None:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+    if args.compare is not None:
+        baseline = json.loads(Path(args.compare).read_text())
+        print(f"Compared with {baseline.get('commit') or args.compare}:")
+        for case, size, time_ratio, rss_ratio in compare(results, baseline):
+            print(f"{case:<40}{size:>9} files  time x{time_ratio:.2f}  peak RSS x{rss_ratio:.2f}")
+
+
+if __name__ == "__main__":
+    main()
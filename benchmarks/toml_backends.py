@@ -0,0 +1,63 @@
+"""Per-file cost of every available TOML backend on the bundled metadata corpus.
+
+Two numbers are reported per backend: parsing alone (documents already in memory) and
+`load_metadata_file` end to end (reading, parsing and schema validation).
+
+    python benchmarks/toml_backends.py [-d DIRECTORY] [-r REPEAT]
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from mdframe.reader import (SUPPORTED_TOML_BACKENDS, get_toml_backend, list_metadata_files,
+                            load_metadata_file)
+from mdframe.validation import MetadataValidator
+
+PACKAGE_DIR = Path(__file__).parent.parent / "src" / "mdframe"
+
+
+def best_of(repeat: int, function) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', '--directory',
+                        help='Path to the directory containing metadata files',
+                        default=PACKAGE_DIR / "data")
+    parser.add_argument('-s', '--schema',
+                        help='Path to the schema file for validating the metadata',
+                        default=PACKAGE_DIR / "schema.json")
+    parser.add_argument('-r', '--repeat',
+                        type=int,
+                        help='Number of passes over the corpus, the fastest one is reported',
+                        default=5)
+    args = parser.parse_args()
+
+    paths = list_metadata_files(Path(args.directory), "toml")
+    texts = [path.read_text(encoding="utf-8") for path in paths]
+    with open(args.schema, "r") as f:
+        schema = json.load(f)
+    validator = MetadataValidator(schema)
+    print(f"{len(paths)} files, best of {args.repeat} passes, default backend: {get_toml_backend().name}")
+    print(f"{'backend':<10}{'parse [us/file]':>18}{'load [us/file]':>18}")
+
+    for name in SUPPORTED_TOML_BACKENDS:
+        try:
+            backend = get_toml_backend(name)
+        except ImportError:
+            print(f"{name:<10}{'not installed':>18}")
+            continue
+        parse = best_of(args.repeat, lambda: [backend.loads(text) for text in texts])
+        load = best_of(args.repeat, lambda: [load_metadata_file(path, schema, validator, backend) for path in paths])
+        print(f"{name:<10}{parse / len(paths) * 1e6:>18.1f}{load / len(paths) * 1e6:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,20 @@
-from . import reader
-from . import timing
+"""View metadata files as a Pandas DataFrame.
+
+Submodules are imported on first access (e.g. `mdframe.reader`), so importing the
+package doesn't pull in pandas, jsonschema or matplotlib before they are needed.
+"""
+
+import importlib
+
+__all__ = ["analysis", "cache", "columnar", "diagnostics", "discovery", "filtering", "index", "profiling", "query",
+           "reader", "records", "schemas", "search", "server", "timing", "validation", "verify", "watch"]
+
+
+def __getattr__(name: str):
+    if name in __all__:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
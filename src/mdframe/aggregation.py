@@ -0,0 +1,184 @@
+"""Single-pass aggregation of metadata properties, without plotting.
+
+`aggregate` scans the records once and feeds every requested property into its own
+aggregate: discrete properties (e.g. `quality`, `merged`) are counted per value and
+continuous ones (e.g. `weight`) are binned into a histogram. Records are never kept
+around; with preset bin edges a continuous aggregate only holds its bin counts, without
+them it keeps the values as a compact float array until the edges are computed.
+"""
+
+from array import array
+from collections import Counter
+from dataclasses import dataclass, field
+from numbers import Real
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+import numpy as np
+from mdframe.records import lookup_flattened
+
+# values are binned in batches, which is much faster than one `searchsorted` per value
+BATCH_SIZE = 4096
+
+_MISSING = object()
+
+Bins = Sequence[float] | int | str
+
+
+@dataclass
+class DiscreteAggregate:
+    """Number of records per value of a property."""
+    property_name: str
+    counts: Counter = field(default_factory=Counter)
+    missing: int = 0
+
+    def add(self, value: Any):
+        if value is _MISSING:
+            self.missing += 1
+            return
+        if isinstance(value, list):
+            value = tuple(value)
+        self.counts[value] += 1
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def items(self) -> List[Tuple[Any, int]]:
+        """Values and their counts, sorted by value (by their text for mixed types)."""
+        try:
+            return sorted(self.counts.items())
+        except TypeError:
+            return sorted(self.counts.items(), key=lambda item: str(item[0]))
+
+
+@dataclass
+class ContinuousAggregate:
+    """Histogram of a numeric property.
+
+    Args:
+        property_name (str): flattened name of the property
+        bins (Bins): preset bin edges, or a number of bins or a `numpy.histogram_bin_edges`
+            method (e.g. `"auto"`) to derive the edges from the data
+    """
+    property_name: str
+    bins: Bins = "auto"
+    count: int = 0
+    missing: int = 0
+    # values that aren't real numbers, e.g. strings or booleans
+    invalid: int = 0
+    # values outside of preset edges
+    underflow: int = 0
+    overflow: int = 0
+    minimum: float = float("inf")
+    maximum: float = float("-inf")
+    total: float = 0.0
+    _buffer: List[float] = field(default_factory=list, init=False, repr=False)
+    _values: array = field(default_factory=lambda: array("d"), init=False, repr=False)
+    _edges: Optional[np.ndarray] = field(default=None, init=False, repr=False)
+    _counts: Optional[np.ndarray] = field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        if not isinstance(self.bins, (int, str)):
+            self._edges = np.asarray(self.bins, dtype=float)
+            if self._edges.ndim != 1 or len(self._edges) < 2 or np.any(np.diff(self._edges) <= 0):
+                raise ValueError(f"Bin edges of {self.property_name} must be at least two increasing values")
+            self._counts = np.zeros(len(self._edges) - 1, dtype=np.int64)
+
+    @property
+    def preset_edges(self) -> bool:
+        return not isinstance(self.bins, (int, str))
+
+    def add(self, value: Any):
+        if value is _MISSING:
+            self.missing += 1
+            return
+        if not isinstance(value, Real) or isinstance(value, bool) or value != value:
+            self.invalid += 1
+            return
+        value = float(value)
+        self.count += 1
+        self.total += value
+        if value < self.minimum:
+            self.minimum = value
+        if value > self.maximum:
+            self.maximum = value
+        self._buffer.append(value)
+        if len(self._buffer) >= BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        if self.preset_edges:
+            values = np.asarray(self._buffer)
+            self._counts += np.histogram(values, bins=self._edges)[0]
+            self.underflow += int(np.count_nonzero(values < self._edges[0]))
+            self.overflow += int(np.count_nonzero(values > self._edges[-1]))
+        else:
+            self._values.extend(self._buffer)
+            self._edges = self._counts = None
+        self._buffer.clear()
+
+    def _finalize(self):
+        self._flush()
+        if self._counts is None:
+            values = np.frombuffer(self._values, dtype=float)
+            self._edges = np.histogram_bin_edges(values, bins=self.bins)
+            self._counts = np.histogram(values, bins=self._edges)[0]
+
+    @property
+    def edges(self) -> np.ndarray:
+        """Bin edges, `len(counts) + 1` values."""
+        self._finalize()
+        return self._edges
+
+    @property
+    def counts(self) -> np.ndarray:
+        """Number of values per bin; the last bin includes its right edge."""
+        self._finalize()
+        return self._counts
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else float("nan")
+
+
+Aggregate = DiscreteAggregate | ContinuousAggregate
+
+
+def aggregate(records: Iterable[Dict[str, Any]],
+              discrete: Iterable[str] = (),
+              continuous: Iterable[str] | Mapping[str, Bins] = ()) -> Dict[str, Aggregate]:
+    """Aggregates several properties in a single pass over `records`.
+
+    Args:
+        records (Iterable[Dict[str, Any]]): metadata records, e.g. `reader.iter_records(config)`;
+            `pd.Series` records are accepted too
+        discrete (Iterable[str]): properties whose values are counted, e.g. `["quality", "merged"]`
+        continuous (Iterable[str] | Mapping[str, Bins]): properties binned into histograms,
+            optionally mapped to their preset bin edges, number of bins or binning method
+
+    Returns:
+        Dict[str, Aggregate]: one aggregate per property
+
+    Raises:
+        ValueError: if a property is requested twice
+    """
+    if not isinstance(continuous, Mapping):
+        continuous = {property_name: "auto" for property_name in continuous}
+    aggregates: Dict[str, Aggregate] = {}
+    for property_name in discrete:
+        if property_name in aggregates:
+            raise ValueError(f"Property {property_name} is aggregated more than once")
+        aggregates[property_name] = DiscreteAggregate(property_name)
+    for property_name, bins in continuous.items():
+        if property_name in aggregates:
+            raise ValueError(f"Property {property_name} is aggregated more than once")
+        aggregates[property_name] = ContinuousAggregate(property_name, bins)
+
+    targets = list(aggregates.items())
+    for record in records:
+        if not isinstance(record, dict):
+            record = record.to_dict()
+        for property_name, target in targets:
+            target.add(lookup_flattened(record, property_name, _MISSING))
+    return aggregates
@@ -1,8 +1,13 @@
 from pathlib import Path
-from typing import Dict, Any, Tuple, Optional, Literal, get_args, List
-from mdframe.reader import Config, run
+from typing import Dict, Any, Tuple, Optional, Literal, get_args, List, Iterable
+from mdframe.reader import Config, data_version, run, iter_records
+from mdframe.aggregation import Aggregate, Bins, DiscreteAggregate, aggregate
+from mdframe.cache import ResultCache
+from mdframe.columnar import build_flattened_frame
+from mdframe.profiling import activate
+from mdframe.query import validate_query
+from mdframe.validation import ValidationIssue
 import pandas as pd
-import matplotlib.pyplot as plt
 
 def flatten_property_dict(property_dict: Dict) -> Dict:
     flattened_dict = dict()
@@ -15,12 +20,14 @@ def flatten_property_dict(property_dict: Dict) -> Dict:
     return flattened_dict
 
 
-def load_flattened_data(config):
+def load_flattened_data(config: Config | Iterable[Dict | pd.Series]):
     """
     Loads and flattens data based on the given configuration.
 
     Args:
-        config: Configuration for data retrieval and processing.
+        config: Configuration for data retrieval and processing, or an iterable of
+            already loaded records (e.g. `reader.iter_records(config)` or
+            `reader.run(config, output="records")`), which is consumed one record at a time.
 
     Returns:
         pandas.DataFrame: DataFrame containing flattened data.
@@ -28,17 +35,17 @@ def load_flattened_data(config):
     Note:
         This function flattens nested dictionaries in the data entries.
     """
-    entries = run(config)
-    
-    # convert all pandas Series objects into dictionaries, and flatten them in order to isolate property_name
-    entries = [pd.Series.to_dict(entry) for entry in entries]
-    entries = [flatten_property_dict(entry) for entry in entries]
+    if isinstance(config, Config) and config.profile:
+        with activate(config.profiler), config.profiler.stage("total"):
+            return load_flattened_data(iter_records(config))
+    entries = iter_records(config) if isinstance(config, Config) else config
 
-    df = pd.DataFrame(entries)
-    return df
+    # flattened fields are appended straight into per-column arrays, the DataFrame is built once
+    return build_flattened_frame(entry if isinstance(entry, dict) else entry.to_dict()
+                                 for entry in entries)
 
 
-def filter_data(config, query, filename):
+def filter_data(config, query, filename, cache: Optional[ResultCache] = None):
     """
     Filters data from a DataFrame based on a given query and saves the result to a CSV file.
 
@@ -46,82 +53,99 @@ def filter_data(config, query, filename):
         config: Configuration for data retrieval and processing.
         query (str): A string representing the filtering condition.
         filename (str): The name of the CSV file to save the filtered data.
+        cache (Optional[ResultCache]): cache of filtered tables, keyed by the normalized
+            query and the version of the data (see `reader.data_version`), e.g. the shared
+            `cache.result_cache`; no caching by default. A hit restores the `errors` the
+            load collected into `config`
 
     Returns:
         None
 
     Note:
-        This function evaluates the query string to filter the DataFrame. Use with caution,
-        as using `eval()` with arbitrary input can pose security risks.
+        The query is written in the language of `mdframe.query`, e.g.
+        `quality == 1 and "IMG_4166" in rgbd_file_names`. Columns may also be referenced
+        as `df["quality"]`. The query is parsed and never passed to `eval()`.
     """
-    df = load_flattened_data(config)
+    compiled_query = validate_query(query)
 
-    # df.query has many limitations, so ditching that for eval(query)
-    # df = df.query(query)
+    def compute() -> Tuple[pd.DataFrame, List[ValidationIssue]]:
+        df = load_flattened_data(config)
+        return df[compiled_query.evaluate(df)], list(config.errors)
 
-    df = df[eval(query)]
-    # print(df)
+    if cache is None:
+        df, _ = compute()
+    else:
+        df, errors = cache.get_or_compute(("filter_data", compiled_query.normalized, data_version(config)),
+                                          compute)
+        # a hit skips the load, which would have collected the errors of the skipped files
+        config.errors[:] = errors
 
     df.to_csv(filename)
 
 
-# TODO: augment generate_histogram to use load_data function
-# TODO: have generate_histogram use global flatten_property_dict method
-def generate_histogram(config, property_name='quality', data_type='discrete'):
+def plot_aggregate(aggregate: Aggregate, ax=None):
+    """Draws the histogram of an aggregate computed by `aggregation.aggregate`.
+
+    Args:
+        aggregate (Aggregate): counts of a discrete property or bins of a continuous one
+        ax (Optional[matplotlib.axes.Axes]): axes to draw into, the current axes by default
+
+    Returns:
+        matplotlib.axes.Axes: the axes drawn into
+    """
+    # matplotlib is slow to import and only needed for plotting
+    import matplotlib.pyplot as plt
+
+    if ax is None:
+        ax = plt.gca()
+    if isinstance(aggregate, DiscreteAggregate):
+        unique_values = [value for value, _ in aggregate.items()]
+        frequencies = [frequency for _, frequency in aggregate.items()]
+        ax.set_xticks(unique_values)
+        ax.bar(unique_values, frequencies, align='center')
+    else:
+        ax.hist(aggregate.edges[:-1], bins=aggregate.edges, weights=aggregate.counts, edgecolor='black')
+        ax.grid(True)
+
+    ax.set_xlabel('Values')
+    ax.set_ylabel('Frequency')
+    ax.set_title(f'Histogram of {aggregate.property_name} in Data')
+    return ax
+
+
+def generate_histogram(config, property_name='quality', data_type='discrete', bins: Bins = 'auto'):
     """Generates a histogram based on the given configuration, property name, and data type.
 
+    The property is aggregated in a single pass over the metadata files (see
+    `aggregation.aggregate`, which computes the same data without plotting).
+
     Args:
         config: Configuration for data retrieval and processing.
         property_name (str, optional): The name of the property. Defaults to 'quality'.
         data_type (str, optional): The type of data. Either 'discrete' or 'continuous'. Defaults to 'discrete'.
+        bins (Bins, optional): Preset bin edges, number of bins or binning method of continuous data. Defaults to 'auto'.
 
     Returns:
         None
     """
-    def flatten_property_dict(property_dict: Dict) -> Dict:
-        flattened_dict = dict()
-        for property_name, value in property_dict.items():
-            if isinstance(value, dict):
-                for subproperty, subvalue in value.items():
-                    flattened_dict[subproperty] = subvalue
-            else:
-                flattened_dict[property_name] = value
-        return flattened_dict
-
     if data_type not in ['discrete', 'continuous']:
         raise ValueError(f"{data_type} must either be 'discrete' or 'continuous'")
 
-    entries = run(config)
-
-    # convert all pandas Series objects into dictionaries, and flatten them in order to isolate property_name
-    entries = [pd.Series.to_dict(entry) for entry in entries]
-    entries = [flatten_property_dict(entry) for entry in entries]
-
-    # extract all data relevant to specific property_name
-    property_data = []
-    for entry in entries:
-        if property_name in entry:
-            property_data.append(entry[property_name])
-
-    # if the property_name doesn't exist in the data, then raise ValueError    
-    if len(property_data) == 0:
-        raise ValueError(f'No entries with column name {property_name} found')
-
-    # plotting discrete and continuous data in different fashion
     if data_type == 'discrete':
-        unique_values = sorted(set(property_data))
-        frequencies = [property_data.count(value) for value in unique_values]
-
-        plt.xticks(unique_values)
-        plt.bar(unique_values, frequencies, align='center')  
+        result = aggregate(iter_records(config), discrete=[property_name])[property_name]
+        found = result.total
     else:
-        plt.hist(property_data, bins='auto', edgecolor='black')
-        plt.grid(True)
+        result = aggregate(iter_records(config), continuous={property_name: bins})[property_name]
+        found = result.count + result.invalid
 
-    plt.xlabel('Values')
-    plt.ylabel('Frequency')
-    plt.title(f'Histogram of {property_name} in Data')
+    # if the property_name doesn't exist in the data, then raise ValueError
+    if found == 0:
+        raise ValueError(f'No entries with column name {property_name} found')
+    if data_type == 'continuous' and result.invalid:
+        raise ValueError(f'{result.invalid} entries of {property_name} are not numbers')
 
+    import matplotlib.pyplot as plt
+    plot_aggregate(result)
     plt.show()
 
 
@@ -142,4 +166,4 @@ if __name__ == '__main__':
 
     # filter data and get insights
     # filter_data(config, "df['quality'] == 1", "quality1-scans.csv")
-    # filter_data(config, "df['nutrition_facts_sources'].astype(bool)", "empty-nutrition-facts.csv")
+    # filter_data(config, "df['nutrition_facts_sources']", "empty-nutrition-facts.csv")
@@ -0,0 +1,343 @@
+"""Persistent on-disk cache of parsed and validated metadata files.
+
+Each entry is keyed by the path of a metadata file and stores the parsed
+contents alongside a fingerprint made of the file's modification time, size and
+the hash of the schema it was validated against. Only files whose fingerprint
+changed since the last run have to be parsed and validated again. Sharded archives
+(see `mdframe.discovery`) are cached per directory instead, so that unchanged
+directories are skipped as a whole.
+
+`ResultCache` memoizes query results in memory instead, keyed by the query and the
+version of the archive it was answered from.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, List, NamedTuple, Optional, Tuple
+
+Fingerprint = Tuple[int, int, str]
+
+CACHE_FORMAT_VERSION = 1
+DEFAULT_RESULT_CACHE_SIZE = 128
+
+
+def schema_hash(schema: Dict) -> str:
+    """Computes a stable hash of a JSON schema.
+
+    Args:
+        schema (Dict): the JSON schema
+
+    Returns:
+        str: hex digest identifying the schema
+    """
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def file_fingerprint(path: Path, schema_digest: str) -> Fingerprint:
+    """Computes the fingerprint of a metadata file.
+
+    Args:
+        path (Path): path to the metadata file
+        schema_digest (str): hash of the schema the file is validated against
+
+    Returns:
+        Fingerprint: modification time (ns), size (bytes) and schema hash
+    """
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size, schema_digest
+
+
+class ParseCache:
+    """Cache of parsed metadata files belonging to a single data directory.
+
+    The cache is stored as a single pickle file inside `cache_dir`. Only point
+    `cache_dir` at directories you trust, since the file is unpickled on load.
+
+    Args:
+        cache_dir (Path): directory holding the cache files
+        data_path (Path): data directory whose metadata files are cached
+        schema (Dict): JSON schema the cached files are validated against
+        validation (str): validation mode the cached files were loaded with
+        toml_backend (str): name of the TOML parser the cached files were parsed with
+    """
+
+    def __init__(self, cache_dir: Path, data_path: Path, schema: Dict, validation: str = "full", toml_backend: str = ""):
+        self.cache_dir = Path(cache_dir)
+        # files validated in a weaker mode must not be served to a stricter one, and
+        # parsers differ in edge cases such as trailing spaces in multi-line strings
+        self.schema_digest = f"{schema_hash(schema)}:{validation}:{toml_backend}"
+        data_path_digest = hashlib.sha1(str(Path(data_path).resolve()).encode("utf-8")).hexdigest()
+        self.cache_file = self.cache_dir / f"parse-cache-{data_path_digest[:16]}.pickle"
+        self._entries: Dict[str, Tuple[Fingerprint, Dict[str, Any]]] = {}
+        self._dirty = False
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, path: Path) -> bool:
+        return self._key(path) in self._entries
+
+    @staticmethod
+    def _key(path: Path) -> str:
+        return os.fspath(path)
+
+    def fingerprint(self, path: Path) -> Fingerprint:
+        return file_fingerprint(path, self.schema_digest)
+
+    def load(self):
+        """Reads the cache file from disk, discarding it if it is unreadable or outdated."""
+        self._entries = {}
+        if not self.cache_file.exists():
+            return
+        try:
+            with open(self.cache_file, "rb") as f:
+                version, entries = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError):
+            return
+        if version == CACHE_FORMAT_VERSION:
+            self._entries = entries
+
+    def save(self):
+        """Writes the cache file to disk if any entry changed since it was loaded."""
+        if not self._dirty:
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.cache_file.with_suffix(".tmp")
+        with open(tmp_file, "wb") as f:
+            pickle.dump((CACHE_FORMAT_VERSION, self._entries), f, protocol=pickle.HIGHEST_PROTOCOL)
+        # atomic replace so that a crashed run never leaves a truncated cache behind
+        os.replace(tmp_file, self.cache_file)
+        self._dirty = False
+
+    def get(self, path: Path, fingerprint: Fingerprint) -> Optional[Dict[str, Any]]:
+        """Returns the cached contents of `path` if its fingerprint is unchanged.
+
+        Args:
+            path (Path): path to the metadata file
+            fingerprint (Fingerprint): current fingerprint of the file
+
+        Returns:
+            Optional[Dict[str, Any]]: cached contents or `None` on a cache miss
+        """
+        entry = self._entries.get(self._key(path))
+        if entry is None or entry[0] != fingerprint:
+            return None
+        return entry[1]
+
+    def put(self, path: Path, fingerprint: Fingerprint, contents: Dict[str, Any]):
+        self._entries[self._key(path)] = (fingerprint, contents)
+        self._dirty = True
+
+    def prune(self, paths: Iterable[Path]):
+        """Drops entries of files that are not in `paths` (e.g. deleted files).
+
+        Args:
+            paths (Iterable[Path]): paths of all metadata files that still exist
+        """
+        keep = {self._key(path) for path in paths}
+        stale = [key for key in self._entries if key not in keep]
+        for key in stale:
+            del self._entries[key]
+        if stale:
+            self._dirty = True
+
+
+class ShardCache:
+    """Cache of the parsed and sorted records of whole shards (directories of metadata files).
+
+    Each shard is stored as its own pickle file inside `cache_dir`, keyed by the shard's
+    directory, together with the fingerprint of its file listing. A shard whose listing is
+    unchanged is served without parsing, or even stat-ing, its files one by one. Only point
+    `cache_dir` at directories you trust, since the files are unpickled on load.
+
+    Args:
+        cache_dir (Path): directory holding the cache files
+        schema (Dict): JSON schema the cached records are validated against
+        validation (str): validation mode the cached records were loaded with
+        toml_backend (str): name of the TOML parser the cached records were parsed with
+    """
+
+    def __init__(self, cache_dir: Path, schema: Dict, validation: str = "full", toml_backend: str = ""):
+        self.cache_dir = Path(cache_dir)
+        self.schema_digest = f"{schema_hash(schema)}:{validation}:{toml_backend}"
+
+    def cache_file(self, shard_path: Path) -> Path:
+        shard_digest = hashlib.sha1(str(Path(shard_path).resolve()).encode("utf-8")).hexdigest()
+        return self.cache_dir / f"shard-cache-{shard_digest[:16]}.pickle"
+
+    def get(self, shard_path: Path, fingerprint: str) -> Optional[List[Dict[str, Any]]]:
+        """Returns the cached records of a shard if its fingerprint and the schema are unchanged.
+
+        Args:
+            shard_path (Path): directory of the shard
+            fingerprint (str): current fingerprint of the shard's file listing
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: cached records or `None` on a cache miss
+        """
+        try:
+            with open(self.cache_file(shard_path), "rb") as f:
+                version, schema_digest, cached_fingerprint, records = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError):
+            return None
+        if (version, schema_digest, cached_fingerprint) != (CACHE_FORMAT_VERSION, self.schema_digest, fingerprint):
+            return None
+        return records
+
+    def put(self, shard_path: Path, fingerprint: str, records: List[Dict[str, Any]]):
+        """Writes the records of a shard to its cache file."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        cache_file = self.cache_file(shard_path)
+        tmp_file = cache_file.with_suffix(".tmp")
+        with open(tmp_file, "wb") as f:
+            pickle.dump((CACHE_FORMAT_VERSION, self.schema_digest, fingerprint, records), f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+
+
+class StatCache:
+    """Cache of file sizes, grouped by directory and keyed by the directory's modification time.
+
+    Adding, removing or renaming a file changes the modification time of its directory,
+    which invalidates all sizes cached for that directory. Files rewritten in place don't,
+    so only use the cache for files which aren't modified after they are written.
+
+    Args:
+        cache_file (Path): pickle file holding the cache
+    """
+
+    def __init__(self, cache_file: Path):
+        self.cache_file = Path(cache_file)
+        # directory -> (st_mtime_ns, file name -> size, or None for a missing file)
+        self._entries: Dict[str, Tuple[int, Dict[str, Optional[int]]]] = {}
+        self._dirty = False
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def load(self):
+        """Reads the cache file from disk, discarding it if it is unreadable or outdated."""
+        self._entries = {}
+        try:
+            with open(self.cache_file, "rb") as f:
+                version, entries = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError):
+            return
+        if version == CACHE_FORMAT_VERSION:
+            self._entries = entries
+
+    def save(self):
+        """Writes the cache file to disk if any entry changed since it was loaded."""
+        if not self._dirty:
+            return
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.cache_file.with_suffix(".tmp")
+        with open(tmp_file, "wb") as f:
+            pickle.dump((CACHE_FORMAT_VERSION, self._entries), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, self.cache_file)
+        self._dirty = False
+
+    def get(self, directory: Path, mtime_ns: int) -> Dict[str, Optional[int]]:
+        """Returns the cached sizes of the files in `directory`, empty if the directory changed.
+
+        Args:
+            directory (Path): the directory
+            mtime_ns (int): current modification time of the directory
+
+        Returns:
+            Dict[str, Optional[int]]: size of each cached file name, `None` for missing files
+        """
+        entry = self._entries.get(os.fspath(directory))
+        if entry is None or entry[0] != mtime_ns:
+            return {}
+        return entry[1]
+
+    def update(self, directory: Path, mtime_ns: int, sizes: Dict[str, Optional[int]]):
+        """Adds the sizes of files in `directory`, dropping cached sizes of an older directory version."""
+        key = os.fspath(directory)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != mtime_ns:
+            entry = self._entries[key] = (mtime_ns, {})
+        entry[1].update(sizes)
+        self._dirty = True
+
+
+class ResultCacheStats(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    maxsize: int
+
+
+class ResultCache:
+    """Bounded in-memory cache of query results, evicting the least recently used entry.
+
+    Keys are expected to contain a version of the data the result was computed from
+    (see `reader.data_version`), so entries of an outdated archive are never hit again
+    and simply age out. The cache is safe to share between threads.
+
+    Args:
+        maxsize (int): maximum number of cached results
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_RESULT_CACHE_SIZE):
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be at least 1, got {maxsize}")
+        self.maxsize = maxsize
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Returns the cached result for `key`, computing and caching it first on a miss.
+
+        `compute` runs without holding the lock, so concurrent misses of the same key may
+        compute the result more than once. Results are returned as cached, callers must not
+        modify them.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return self._entries[key]
+            self._misses += 1
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return value
+
+    def clear(self):
+        """Drops all cached results and resets the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._hits = self._misses = self._evictions = 0
+
+    @property
+    def stats(self) -> ResultCacheStats:
+        """Hits, misses and evictions since the cache was created or cleared, and its current size."""
+        with self._lock:
+            return ResultCacheStats(self._hits, self._misses, self._evictions, len(self._entries), self.maxsize)
+
+
+# shared cache for callers opting in, e.g. `filter_files(..., cache=result_cache)`
+result_cache = ResultCache()
@@ -0,0 +1,140 @@
+"""Single-pass builder of flattened metadata tables.
+
+Instead of wrapping every record in a `pd.Series`, converting it back to a dictionary,
+flattening it and letting `pd.DataFrame` reassemble the columns, `ColumnarBuilder`
+appends the flattened fields of every record straight into per-column lists and
+builds the DataFrame once, with dtypes suited to the known metadata fields.
+"""
+
+import time
+from typing import Any, Dict, Iterable, List
+import numpy as np
+import pandas as pd
+from mdframe.profiling import current_profile
+
+# dtypes of well-known flattened fields; nullable variants are used when a field is
+# missing from some of the records
+COLUMN_DTYPES = {
+    "gid": ("int64", "Int64"),
+    "weight": ("float64", "float64"),
+    "merged": ("bool", "boolean"),
+    "textured": ("bool", "boolean"),
+}
+CATEGORICAL_COLUMNS = ("unit", "food_type", "nutrition_subgroup")
+
+# marks values missing from a record, `None` can't be used since it is a valid value
+MISSING = object()
+
+
+class ColumnarBuilder:
+    """Accumulates flattened metadata records column by column.
+
+    Records are flattened the same way as `analysis.flatten_property_dict`: values of
+    nested tables are hoisted to the top level, everything else is kept as is.
+    """
+
+    def __init__(self):
+        self._columns: Dict[str, List[Any]] = {}
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def _set(self, name: str, value: Any):
+        column = self._columns.get(name)
+        if column is None:
+            column = self._columns[name] = [MISSING] * self._length
+        if len(column) > self._length:
+            # a later section redefines the field, which overwrites it when flattening
+            column[-1] = value
+        else:
+            column.append(value)
+
+    def append(self, record: Dict[str, Any]):
+        """Appends a single (nested) metadata record.
+
+        Args:
+            record (Dict[str, Any]): contents of a metadata file
+        """
+        for property_name, value in record.items():
+            if isinstance(value, dict):
+                for subproperty, subvalue in value.items():
+                    self._set(subproperty, subvalue)
+            else:
+                self._set(property_name, value)
+
+        self._length += 1
+        for column in self._columns.values():
+            if len(column) < self._length:
+                column.append(MISSING)
+
+    def extend(self, records: Iterable[Dict[str, Any]]):
+        for record in records:
+            self.append(record)
+
+    def build(self) -> pd.DataFrame:
+        """Builds the DataFrame out of the accumulated columns.
+
+        Returns:
+            pd.DataFrame: one row per record, columns in order of first appearance
+        """
+        return frame_from_columns(self._columns, self._length)
+
+
+def frame_from_columns(columns: Dict[str, List[Any]], length: int) -> pd.DataFrame:
+    """Builds a flattened DataFrame out of per-column lists, with the dtypes of the known fields.
+
+    Args:
+        columns (Dict[str, List[Any]]): values of every column, `MISSING` where a record
+            lacks the field; the lists are modified in place
+        length (int): number of rows
+
+    Returns:
+        pd.DataFrame: one row per record, columns in the order of `columns`
+    """
+    data = {}
+    for name, column in columns.items():
+        has_missing = False
+        for i, value in enumerate(column):
+            if value is MISSING:
+                column[i] = np.nan
+                has_missing = True
+        data[name] = _to_series(name, column, has_missing)
+    return pd.DataFrame(data, index=pd.RangeIndex(length))
+
+
+def _to_series(name: str, column: List[Any], has_missing: bool) -> pd.Series:
+    if name in COLUMN_DTYPES:
+        dtype = COLUMN_DTYPES[name][1 if has_missing else 0]
+        try:
+            return pd.Series(column, dtype=dtype)
+        except (TypeError, ValueError):
+            # unvalidated data may not fit the expected dtype, fall back to inference
+            pass
+    elif name in CATEGORICAL_COLUMNS:
+        return pd.Series(column, dtype="category")
+    return pd.Series(column)
+
+
+def build_flattened_frame(records: Iterable[Dict[str, Any]]) -> pd.DataFrame:
+    """Flattens metadata records and builds a DataFrame out of them in a single pass.
+
+    Args:
+        records (Iterable[Dict[str, Any]]): contents of the metadata files
+
+    Returns:
+        pd.DataFrame: DataFrame containing flattened data
+    """
+    builder = ColumnarBuilder()
+    profile = current_profile()
+    if profile is None:
+        builder.extend(records)
+        return builder.build()
+
+    # flattening is timed per record, so the time spent producing the records isn't counted
+    for record in records:
+        start = time.perf_counter()
+        builder.append(record)
+        profile.add_time("flatten", time.perf_counter() - start)
+    with profile.stage("dataframe"):
+        return builder.build()
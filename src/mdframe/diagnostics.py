@@ -0,0 +1,140 @@
+"""Collect-all validation of the metadata files of an archive.
+
+Loading stops at the first file which can't be decoded or violates the schema, so
+cleaning up an archive that way takes one full load per broken file. `validate_archive`
+checks every file instead, in parallel, and reports every problem of every file: read
+and TOML decode errors with their line and column, and all schema violations (not just
+the first) with their JSON path and the line defining the offending value. The report is
+printed as a table (`ValidationReport.print`) or written as JSON (`ValidationReport.save`).
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from mdframe.reader import (Config, discover_metadata_files, get_toml_backend, load_metadata_file,
+                            split_into_chunks)
+from mdframe.validation import MetadataValidator, ValidationIssue, issue_from_error
+
+# maximum number of files checked by one task of a worker process
+CHECK_CHUNK_SIZE = 64
+
+
+@dataclass
+class ValidationReport:
+    """Problems found in the metadata files of an archive, ordered by file and line."""
+    files: int
+    issues: List[ValidationIssue] = field(default_factory=list)
+
+    @property
+    def invalid_files(self) -> List[str]:
+        """Names of the files with at least one problem, in the order of the report."""
+        return list(dict.fromkeys(issue.file for issue in self.issues))
+
+    @property
+    def ok(self) -> bool:
+        return not self.issues
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"files": self.files, "invalid_files": len(self.invalid_files),
+                "issues": [issue.to_dict() for issue in self.issues]}
+
+    def save(self, report_path: Path):
+        """Writes the report as JSON."""
+        with open(report_path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def print(self, console: Any = None):
+        """Prints the problems as a table with `rich`, followed by a summary.
+
+        Args:
+            console (Optional[rich.console.Console]): console to print to, stdout by default
+        """
+        from rich.console import Console
+        from rich.table import Table
+
+        if console is None:
+            console = Console()
+        if self.issues:
+            table = Table("File", "Line", "JSON path", "Kind", "Problem", title="Invalid metadata files")
+            for issue in self.issues:
+                line = "" if issue.line is None else str(issue.line) if issue.column is None else f"{issue.line}:{issue.column}"
+                table.add_row(issue.file, line, issue.json_path, issue.kind, issue.message)
+            console.print(table)
+        console.print(f"Checked {self.files} metadata files: {len(self.issues)} problems"
+                      f" in {len(self.invalid_files)} files")
+
+
+def check_metadata_file(metadata_file_path: Path,
+                        validator: MetadataValidator,
+                        name: Optional[str] = None) -> List[ValidationIssue]:
+    """Lists every problem of a single metadata file.
+
+    Args:
+        metadata_file_path (Path): path to the metadata file
+        validator (MetadataValidator): validator of the schema the file must conform to
+        name (Optional[str]): name of the file in the issues, its path by default
+
+    Returns:
+        List[ValidationIssue]: the problems, ordered by line; empty if the file is valid
+    """
+    name = os.fspath(metadata_file_path) if name is None else name
+    try:
+        # reads and decodes the file exactly like a load, but leaves the validation to `iter_errors`
+        contents = load_metadata_file(metadata_file_path, validator.schema, MetadataValidator(validator.schema, "off"))
+    except Exception as error:
+        return [issue_from_error(name, error)]
+    errors = list(validator.iter_errors(contents))
+    if not errors:
+        return []
+    text = metadata_file_path.read_text(encoding="utf-8")
+    issues = [issue_from_error(name, error, text) for error in errors]
+    issues.sort(key=lambda issue: (issue.line is None, issue.line or 0))
+    return issues
+
+
+# validator of a worker process, set once per worker by `_init_worker`
+_worker_validator: Optional[MetadataValidator] = None
+
+
+def _init_worker(validator: MetadataValidator):
+    global _worker_validator
+    _worker_validator = validator
+
+
+def _check_chunk(chunk: List[Tuple[str, Path]]) -> List[List[ValidationIssue]]:
+    return [check_metadata_file(path, _worker_validator, name) for name, path in chunk]
+
+
+def validate_archive(config: Config, workers: Optional[int] = None) -> ValidationReport:
+    """Checks every metadata file described by `config`, without stopping at the first problem.
+
+    Files are validated in the mode of `config.validation`.
+
+    Args:
+        config (Config): reader configuration
+        workers (Optional[int]): number of worker processes, one per CPU if not given
+
+    Returns:
+        ValidationReport: the problems of all files; files are named by their keys, see
+        `reader.discover_metadata_files`
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError(f"Number of workers must be a positive integer, got {workers}")
+    validator = config.validator
+    files = [(metadata_file.key, metadata_file.path) for metadata_file in discover_metadata_files(config)]
+    # the backend is chosen (and a missing one reported) before any worker starts
+    get_toml_backend()
+
+    if workers == 1 or len(files) < 2:
+        results = [check_metadata_file(path, validator, name) for name, path in files]
+    else:
+        chunks = split_into_chunks(files, workers, CHECK_CHUNK_SIZE)
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), initializer=_init_worker,
+                                 initargs=(validator,)) as executor:
+            results = [issues for chunk_issues in executor.map(_check_chunk, chunks) for issues in chunk_issues]
+    return ValidationReport(len(files), [issue for issues in results for issue in issues])
@@ -0,0 +1,154 @@
+"""Discovery of metadata files in archives sharded across directories.
+
+An archive may span several roots (e.g. mounted volumes), each holding any number of
+capture-session directories. Every directory which directly contains metadata files is
+a shard. Directories are listed with `os.scandir` by a pool of threads, so slow network
+mounts are listed concurrently, and every shard gets a fingerprint built from the names,
+sizes and modification times of its files, which lets unchanged shards be skipped.
+
+Records of a sharded archive are ordered by `gid` and `uid`: each shard is sorted on its
+own and the shards are merged with `heapq.merge`, instead of sorting one list of all
+paths up front.
+"""
+
+import hashlib
+import heapq
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Sequence, Tuple
+
+# threads listing directories concurrently, listing is I/O bound
+DEFAULT_DISCOVERY_THREADS = 8
+
+# (file name, st_mtime_ns, st_size)
+FileEntry = Tuple[str, int, int]
+
+
+class MetadataFile(NamedTuple):
+    """A metadata file found by `discover_shards`, see `metadata_file_key` for its `key`."""
+    key: str
+    path: Path
+    mtime_ns: int
+    size: int
+
+
+@dataclass(frozen=True)
+class Shard:
+    """A directory directly containing metadata files.
+
+    Args:
+        root (Path): the root the directory was found under
+        path (Path): the directory
+        entries (Tuple[FileEntry, ...]): its metadata files, sorted by name
+    """
+    root: Path
+    path: Path
+    entries: Tuple[FileEntry, ...]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def paths(self) -> List[Path]:
+        return [self.path / name for name, _, _ in self.entries]
+
+    @property
+    def fingerprint(self) -> str:
+        """Changes whenever a file of the shard is added, removed, renamed or modified."""
+        digest = hashlib.sha1()
+        for name, mtime_ns, size in self.entries:
+            digest.update(f"{name}\0{mtime_ns}\0{size}\n".encode("utf-8"))
+        return digest.hexdigest()
+
+
+def _scan_directory(directory: Path, suffix: str, recursive: bool) -> Tuple[List[FileEntry], List[Path]]:
+    entries, subdirectories = [], []
+    with os.scandir(directory) as iterator:
+        for entry in iterator:
+            if entry.name.endswith(suffix) and entry.is_file():
+                stat = entry.stat()
+                entries.append((entry.name, stat.st_mtime_ns, stat.st_size))
+            elif recursive and not entry.name.startswith(".") and entry.is_dir(follow_symlinks=False):
+                subdirectories.append(Path(entry.path))
+    entries.sort()
+    return entries, subdirectories
+
+
+def discover_shards(roots: Sequence[Path],
+                    metadata_file_extension: str,
+                    recursive: bool = False,
+                    threads: int = DEFAULT_DISCOVERY_THREADS) -> List[Shard]:
+    """Lists the shards of an archive.
+
+    Hidden directories (e.g. `.git` or a cache directory) are skipped and symlinked
+    directories are not followed while recursing; the roots themselves may be symlinks.
+
+    Args:
+        roots (Sequence[Path]): directories the archive is stored in
+        metadata_file_extension (str): extension of the metadata files
+        recursive (bool): also look for shards in all subdirectories of the roots
+        threads (int): number of directories listed concurrently
+
+    Returns:
+        List[Shard]: shards with at least one metadata file, in order of their roots and then paths
+    """
+    suffix = f".{metadata_file_extension}"
+    roots = [Path(root) for root in roots]
+    for root in roots:
+        if not root.is_dir():
+            raise FileNotFoundError(f"Path {root} does not seem to point to a valid directory")
+
+    shards: Dict[Tuple[int, Path], Shard] = {}
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as executor:
+        pending = {executor.submit(_scan_directory, root, suffix, recursive): (index, root, root)
+                   for index, root in enumerate(roots)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, root, directory = pending.pop(future)
+                entries, subdirectories = future.result()
+                if entries:
+                    shards[(index, directory)] = Shard(root, directory, tuple(entries))
+                for subdirectory in subdirectories:
+                    pending[executor.submit(_scan_directory, subdirectory, suffix, recursive)] = \
+                        (index, root, subdirectory)
+    return [shards[key] for key in sorted(shards)]
+
+
+def record_sort_key(record: Dict[str, Any]) -> Tuple:
+    """Orders records by `gid` and then `uid`; records without an integer `gid` go last."""
+    gid, uid = record.get("gid"), record.get("uid")
+    if isinstance(gid, int) and not isinstance(gid, bool):
+        return (0, gid, str(uid))
+    return (1, str(gid), str(uid))
+
+
+def merge_shards(shard_records: Iterable[List[Dict[str, Any]]]) -> Iterator[Dict[str, Any]]:
+    """Merges the sorted records of every shard into one stream ordered by `record_sort_key`.
+
+    Records with equal keys (e.g. several views of one capture) keep the order of their
+    shards, and file name order within a shard.
+    """
+    return heapq.merge(*shard_records, key=record_sort_key)
+
+
+def metadata_file_key(roots: Sequence[Path], root: Path, path: Path) -> str:
+    """Identifies a metadata file across the roots of an archive.
+
+    Paths are relative to their root when there is a single root, which keeps the keys of
+    flat, single-directory archives unchanged, and absolute otherwise.
+    """
+    if len(roots) == 1:
+        return Path(path).relative_to(root).as_posix()
+    return Path(os.path.abspath(path)).as_posix()
+
+
+def iter_shard_files(shards: Iterable[Shard], roots: Sequence[Path]) -> Iterator[MetadataFile]:
+    """Yields the metadata files of `shards` in order, keyed by `metadata_file_key`."""
+    roots = [Path(root) for root in roots]
+    for shard in shards:
+        for name, mtime_ns, size in shard.entries:
+            path = shard.path / name
+            yield MetadataFile(metadata_file_key(roots, shard.root, path), path, mtime_ns, size)
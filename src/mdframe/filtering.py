@@ -1,7 +1,15 @@
+from collections.abc import Hashable
 from pathlib import Path
-from mdframe.reader import run, Config
+from typing import Any, Dict, Iterable, Set
+from mdframe.reader import run, Config, data_version, iter_records, metadata_file_to_df
+from mdframe.cache import ResultCache
+from mdframe.query import compile_query, validate_query
+from mdframe.index import ListIndex
+from mdframe.records import flattened_row
 import pandas as pd
 
+DEFAULT_SCHEMA_PATH = Path(__file__).parent / "schema.json"
+
 def check_df(df: pd.DataFrame, query: str, contain_list: list[str]) -> bool:
     """Checks if the dataframe satisfies the given parameters
     
@@ -28,44 +36,111 @@ def check_df(df: pd.DataFrame, query: str, contain_list: list[str]) -> bool:
     df = df.transpose()
 
     if query != "":
-        if not df.query(query).empty:
+        if compile_query(query).evaluate(df).any():
             satisfied = True
 
     return satisfied
 
-def filter_files(data_path: str, file_type: str, query: str="", contain_list: list[str]=[]) -> list[str]:
+def _contains_any(record: Dict[str, Any], contain_set: Set[str]) -> bool:
+    for value in record.values():
+        values = value.values() if isinstance(value, dict) else (value,)
+        for subvalue in values:
+            if isinstance(subvalue, list):
+                for item in subvalue:
+                    if isinstance(item, Hashable) and item in contain_set:
+                        return True
+    return False
+
+
+def filter_records(records: Iterable[Dict[str, Any] | pd.Series],
+                   query: str="",
+                   contain_list: list[str]=[]) -> list[int]:
+    """Filters already loaded records based on the given parameters
+
+    A record is satisfied if any of its list fields contains an item of `contain_list`
+    or if `query` matches it. The query is evaluated on the typed, flattened values of
+    every record, like `analysis.filter_data` evaluates it on the flattened table, so
+    `weight > 100` compares numbers and `food_type == "apple"` strings.
+
+    Args:
+        records (Iterable[Dict[str, Any] | pd.Series]): the metadata records, consumed
+            one at a time, e.g. `reader.iter_records(config)`; records returned by
+            `reader.run(config, output="records")` are accepted too
+        query (str): The query to filter the dataframe
+        contain_list (list[str]): The list of strings that the dataframe should contain
+    Return:
+        list[int]: The sorted list of distinct `gid`s of the satisfied records
+    """
+    compiled_query = compile_query(query) if query != "" else None
+    contain_set = set(contain_list)
+
+    gids = set()
+    for record in records:
+        if not isinstance(record, dict):
+            record = record.to_dict()
+        if contain_set and _contains_any(record, contain_set):
+            gids.add(record["gid"])
+        elif compiled_query is not None and compiled_query.matches(flattened_row(record, compiled_query.columns)):
+            gids.add(record["gid"])
+    return sorted(gids)
+
+
+def filter_files(data_path: str,
+                 file_type: str,
+                 query: str="",
+                 contain_list: list[str]=[],
+                 schema_loc: Path | str=DEFAULT_SCHEMA_PATH,
+                 index: ListIndex | None=None,
+                 index_path: Path | None=None,
+                 cache: ResultCache | None=None) -> list[int]:
     
     """Filters the dataframes based on the given parameters
-    
+
+    The query is evaluated on the typed values of every record, see `filter_records`.
+
     Args:
         data_path (str): The data directory path
         file_type (str): The file type
         query (str): The query to filter the dataframe
         contain_list (list[str]): The list of strings that the dataframe should contain
+        schema_loc (Path | str): URL or Path to the schema file for validating the metadata
+        index (ListIndex | None): an index over the list fields; when there is no `query`,
+            `contain_list` is answered from the index after refreshing the changed files
+        index_path (Path | None): location of a persisted index to use (and update) instead
+        cache (ResultCache | None): cache of results, keyed by the normalized query,
+            `contain_list` and the version of the data (see `reader.data_version`), so that
+            repeated queries against an unchanged archive don't load it again, e.g. the
+            shared `cache.result_cache`; no caching by default
     Return:
-        list[str]: The list of satisfied files
+        list[int]: The list of satisfied files
     """
 
-    config = Config(data_path, file_type)
-    df_list = run(config)
-    satisfied_files = []
-    
-    for df in df_list:
-        if check_df(df, query, contain_list):
-            satisfied_files.append(df.iloc[0,0])
-    
-    return sorted(satisfied_files)
+    config = Config(Path(data_path), file_type, schema_loc)
+
+    def compute() -> list[int]:
+        if query == "" and (index is not None or index_path is not None):
+            if index is None:
+                return ListIndex.open(config, index_path).lookup(contain_list)
+            index.refresh(config)
+            return index.lookup(contain_list)
+        return filter_records(iter_records(config), query, contain_list)
+
+    if cache is None:
+        return compute()
+    normalized_query = validate_query(query).normalized if query != "" else ""
+    key = ("filter_files", normalized_query, frozenset(contain_list), data_version(config))
+    return list(cache.get_or_compute(key, compute))
 
 
 if __name__ == "__main__":
     data_path = Path(__file__).parent.parent / "sample toml files"
     file_type = "toml"
 
-    print(filter_files(data_path, file_type, query='weight == "321"') == [51])
-    print(filter_files(data_path, file_type, query='started=="test" and weight == "321"') == [])
-    print(filter_files(data_path, file_type, query='started=="test" or weight == "321"') == [51])
-    print(filter_files(data_path, file_type, query="started == '15:02:33' and weight == '22'") == [52])
-    print(filter_files(data_path, file_type, query="started == '15:02:33' and weight == '22'", contain_list=["IMG_4166"])==[52, 53])
+    print(filter_files(data_path, file_type, query='weight == 321') == [51])
+    print(filter_files(data_path, file_type, query='started=="test" and weight == 321') == [])
+    print(filter_files(data_path, file_type, query='started=="test" or weight == 321') == [51])
+    print(filter_files(data_path, file_type, query="started == '15:02:33' and weight == 22") == [52])
+    print(filter_files(data_path, file_type, query="started == '15:02:33' and weight == 22", contain_list=["IMG_4166"])==[52, 53])
     
     
     
\ No newline at end of file
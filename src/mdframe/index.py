@@ -0,0 +1,278 @@
+"""Inverted index over the list-valued fields of metadata records.
+
+The index maps every item of fields such as `rgbd_file_names`, `nutrition_facts_sources`,
+`texture_sources` and `ingredients` to the records containing it, so looking up e.g. which
+records reference `IMG_4166` doesn't require scanning every record. It is keyed by metadata
+file, can be persisted in the user's cache directory and is refreshed incrementally: only files whose
+fingerprint changed are parsed again. `FileIndex` implements the refreshing and
+persistence for other indexes too, such as the full-text index of `mdframe.search`.
+"""
+
+import abc
+import hashlib
+import os
+import pickle
+from collections.abc import Hashable
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from mdframe.cache import Fingerprint, schema_hash
+from mdframe.reader import Config, discover_metadata_files, load_metadata_files
+
+INDEX_FORMAT_VERSION = 2
+DEFAULT_INDEX_FILE_NAME = ".mdframe-list-index.pickle"
+# persisted indexes of every archive, in a subdirectory per archive; data directories may be
+# read-only or part of an installed package
+DEFAULT_INDEX_DIR = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "mdframe" / "indexes"
+
+
+def _list_fields(record: Dict[str, Any]) -> Iterable[Tuple[str, List[Any]]]:
+    for property_name, value in record.items():
+        if isinstance(value, dict):
+            for subproperty, subvalue in value.items():
+                if isinstance(subvalue, list):
+                    yield subproperty, subvalue
+        elif isinstance(value, list):
+            yield property_name, value
+
+
+class FileIndex(abc.ABC):
+    """Base class of indexes keyed by metadata file, see `ListIndex` and `search.TextIndex`.
+
+    Subclasses implement `add` and `remove`, filling `_postings` and `_files`, whose
+    entries start with the fingerprint and the `gid` of the indexed file; refreshing and
+    persisting the index is shared.
+
+    Args:
+        fields (Optional[Iterable[str]]): names of the fields to index
+    """
+    default_file_name: str
+
+    def __init__(self, fields: Optional[Iterable[str]] = None):
+        self.fields = frozenset(fields) if fields is not None else None
+        self.schema_digest: Optional[str] = None
+        self._postings: Dict[str, Dict[Hashable, Any]] = {}
+        # metadata file key -> (fingerprint, gid, ...)
+        self._files: Dict[str, Tuple[Any, ...]] = {}
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._files
+
+    @abc.abstractmethod
+    def add(self, key: str, record: Dict[str, Any], fingerprint: Optional[Fingerprint] = None):
+        """Indexes a record, replacing any previous record stored under `key`."""
+
+    @abc.abstractmethod
+    def remove(self, key: str):
+        """Drops the record stored under `key`, if any."""
+
+    def refresh(self, config: Config) -> bool:
+        """Brings the index up to date with the metadata files described by `config`.
+
+        Only new files and files whose fingerprint changed are parsed; files that no
+        longer exist are dropped. A schema change re-indexes everything.
+
+        Args:
+            config (Config): reader configuration
+
+        Returns:
+            bool: True if the index changed
+        """
+        digest = schema_hash(config.schema)
+        if digest != self.schema_digest:
+            self._postings = {}
+            self._files = {}
+            self.schema_digest = digest
+            self._dirty = True
+
+        changed = False
+        metadata_files = discover_metadata_files(config)
+        keys = [metadata_file.key for metadata_file in metadata_files]
+        stale = []
+        for key, path, mtime_ns, size in metadata_files:
+            fingerprint = (mtime_ns, size, digest)
+            entry = self._files.get(key)
+            if entry is None or entry[0] != fingerprint:
+                stale.append((key, path, fingerprint))
+
+        records = load_metadata_files([path for _, path, _ in stale], config.schema,
+                                      config.workers, config.validator)
+        for (key, _, fingerprint), record in zip(stale, records):
+            self.add(key, record, fingerprint)
+            changed = True
+
+        for key in set(self._files) - set(keys):
+            self.remove(key)
+            changed = True
+        return changed
+
+    @classmethod
+    def build(cls, config: Config, fields: Optional[Iterable[str]] = None) -> "FileIndex":
+        """Builds an index over all metadata files described by `config`."""
+        index = cls(fields)
+        index.refresh(config)
+        return index
+
+    def save(self, index_path: Path):
+        """Writes the index to `index_path` if it changed since it was loaded or saved."""
+        if not self._dirty and Path(index_path).exists():
+            return
+        state = (INDEX_FORMAT_VERSION, type(self).__name__, self.fields, self.schema_digest, self._postings, self._files)
+        tmp_path = Path(index_path).with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, index_path)
+        self._dirty = False
+
+    @classmethod
+    def default_path(cls, config: Config, index_dir: Path = DEFAULT_INDEX_DIR) -> Path:
+        """Location of the persisted index of `config`'s archive in `index_dir`.
+
+        Every archive, identified by its resolved data directories, gets its own subdirectory.
+        """
+        archive = "\0".join([os.fspath(path.resolve()) for path in config.data_paths]
+                            + [str(config.metadata_file_extension), str(config.recursive)])
+        return Path(index_dir) / hashlib.sha256(archive.encode("utf-8")).hexdigest()[:16] / cls.default_file_name
+
+    @classmethod
+    def load(cls, index_path: Path) -> "FileIndex":
+        """Reads an index written by `save`. Only load index files you trust, they are unpickled."""
+        with open(index_path, "rb") as f:
+            state = pickle.load(f)
+        if not isinstance(state, tuple) or state[0] != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported index format in {index_path}")
+        _, kind, fields, schema_digest, postings, files = state
+        if kind != cls.__name__:
+            raise ValueError(f"{index_path} holds a {kind}, not a {cls.__name__}")
+        index = cls(fields)
+        index.schema_digest = schema_digest
+        index._postings = postings
+        index._files = files
+        return index
+
+    @classmethod
+    def open(cls,
+             config: Config,
+             index_path: Optional[Path] = None,
+             fields: Optional[Iterable[str]] = None) -> "FileIndex":
+        """Loads the persisted index of `config`'s data directory, refreshes it and saves it back.
+
+        An index which can't be written (e.g. on a read-only file system) is used without
+        being persisted.
+
+        Args:
+            config (Config): reader configuration
+            index_path (Optional[Path]): location of the index, `default_path(config)` by default
+            fields (Optional[Iterable[str]]): fields to index when creating a new index
+
+        Returns:
+            FileIndex: an up-to-date index
+        """
+        if index_path is None:
+            index_path = cls.default_path(config)
+        index = None
+        if Path(index_path).exists():
+            try:
+                index = cls.load(index_path)
+            except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+                index = None
+        if index is None or (fields is not None and index.fields != frozenset(fields)):
+            index = cls(fields)
+        index.refresh(config)
+        try:
+            Path(index_path).parent.mkdir(parents=True, exist_ok=True)
+            index.save(index_path)
+        except OSError:
+            pass
+        return index
+
+
+class ListIndex(FileIndex):
+    """Maps items of list-valued fields to the `gid`s of the records containing them.
+
+    Only hashable items (e.g. file names and ingredient names given as strings) are
+    indexed; tables nested in lists, such as `qa` entries, are skipped.
+
+    Args:
+        fields (Optional[Iterable[str]]): names of the (flattened) fields to index;
+            all list-valued fields are indexed if not given
+    """
+
+    default_file_name = DEFAULT_INDEX_FILE_NAME
+
+    def __init__(self, fields: Optional[Iterable[str]] = None):
+        super().__init__(fields)
+        # field -> item -> keys of the metadata files containing the item
+        self._postings: Dict[str, Dict[Hashable, Set[str]]] = {}
+        # metadata file key -> (fingerprint, gid, indexed items per field)
+        self._files: Dict[str, Tuple[Optional[Fingerprint], Any, Dict[str, Tuple[Hashable, ...]]]] = {}
+
+    def add(self, key: str, record: Dict[str, Any], fingerprint: Optional[Fingerprint] = None):
+        """Indexes a record, replacing any previous record stored under `key`.
+
+        Args:
+            key (str): identifier of the metadata file, e.g. its path relative to the data directory
+            record (Dict[str, Any]): contents of the metadata file
+            fingerprint (Optional[Fingerprint]): fingerprint of the file, used by `refresh`
+        """
+        self.remove(key)
+        items = {}
+        for field, values in _list_fields(record):
+            if self.fields is not None and field not in self.fields:
+                continue
+            field_items = tuple(dict.fromkeys(value for value in values if isinstance(value, Hashable)))
+            if not field_items:
+                continue
+            items[field] = field_items
+            postings = self._postings.setdefault(field, {})
+            for item in field_items:
+                postings.setdefault(item, set()).add(key)
+        self._files[key] = (fingerprint, record.get("gid"), items)
+        self._dirty = True
+
+    def remove(self, key: str):
+        entry = self._files.pop(key, None)
+        if entry is None:
+            return
+        for field, field_items in entry[2].items():
+            postings = self._postings[field]
+            for item in field_items:
+                keys = postings[item]
+                keys.discard(key)
+                if not keys:
+                    del postings[item]
+        self._dirty = True
+
+    def lookup_keys(self, items: Iterable[Hashable], fields: Optional[Iterable[str]] = None) -> Set[str]:
+        """Finds the metadata files containing any of `items`.
+
+        Args:
+            items (Iterable[Hashable]): the items to look up
+            fields (Optional[Iterable[str]]): restricts the lookup to these fields
+
+        Returns:
+            Set[str]: keys of the matching metadata files
+        """
+        field_names = self._postings.keys() if fields is None else fields
+        keys = set()
+        for item in items:
+            if not isinstance(item, Hashable):
+                continue
+            for field in field_names:
+                keys |= self._postings.get(field, {}).get(item, set())
+        return keys
+
+    def lookup(self, items: Iterable[Hashable], fields: Optional[Iterable[str]] = None) -> List[Any]:
+        """Finds the records containing any of `items`.
+
+        Args:
+            items (Iterable[Hashable]): the items to look up, e.g. `["IMG_4166"]`
+            fields (Optional[Iterable[str]]): restricts the lookup to these fields
+
+        Returns:
+            List[Any]: sorted `gid`s of the matching records
+        """
+        return sorted(self._files[key][1] for key in self.lookup_keys(items, fields))
@@ -1,34 +1,51 @@
 import argparse
-import pandas as pd
 from pathlib import Path
-from rich.console import Console
-from mdframe.reader import Config, run, SUPPORTED_METADATA_FILE_EXTENSIONS
-from mdframe.timing import calc_time_and_rate_from_a_generic_df
+from mdframe.reader import Config, iter_records, SUPPORTED_METADATA_FILE_EXTENSIONS
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('-d', '--directory',
                         help='Path to the directory containing metadata files',
-                        default='test/data_dir')
+                        default=Path(__file__).parent.parent / "data")
     parser.add_argument('-m', '--metadata-ext',
                         choices=SUPPORTED_METADATA_FILE_EXTENSIONS,
                         default='toml')
     parser.add_argument('-s', '--schema',
                         help='URL or Path to the schema file for validating the metadata',
                         default=Path(__file__).parent.parent / "schema.json")
+    parser.add_argument('-g', '--group-by',
+                        help='Field to break the timing down by, e.g. food_type or project_name',
+                        default=None)
     args = parser.parse_args()
+
+    # imported after parsing the arguments, `--help` doesn't need them
+    import pandas as pd
+    from rich.console import Console
+    from rich.table import Table
+    from mdframe.timing import calc_timing
+
     console = Console()
 
     config = Config(
-        data_dir_path=Path(args.directory),
+        data_path=Path(args.directory),
         metadata_file_extension=args.metadata_ext,
-        schema_url=Path(args.schema)
+        schema_loc=Path(args.schema)
     )
-    dfs = run(config)
-    total_time, rate = calc_time_and_rate_from_a_generic_df(dfs, start_key="started", end_key="finished")
-    console.print(f"[blue]Total time invested: {total_time}[/blue]")
-    console.print(f"[blue]Rate: {rate}[/blue]")
+    summary = calc_timing(iter_records(config), start_key="started", end_key="finished", group_by=args.group_by)
+    console.print(f"[blue]Total time invested: {pd.Timedelta(seconds=summary.total_time)}[/blue]")
+    console.print(f"[blue]Rate: {summary.rate}[/blue]")
+    if summary.skipped:
+        console.print(f"[yellow]Samples without valid timing: {summary.skipped}[/yellow]")
+
+    if summary.groups is not None:
+        table = Table(args.group_by, "Total time", "Samples", "Rate")
+        for group, row in summary.groups.iterrows():
+            table.add_row(str(group),
+                          str(pd.Timedelta(seconds=row["total_time"])),
+                          str(int(row["count"])),
+                          f"{row['rate']:.6f}")
+        console.print(table)
 
 
 if __name__ == "__main__":
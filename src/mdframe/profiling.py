@@ -0,0 +1,175 @@
+"""Opt-in instrumentation of the ingestion pipeline.
+
+While a `Profile` is active (see `activate`), the reader records how long every stage
+takes (globbing, file I/O, TOML decoding, validation, flattening and DataFrame
+construction), counts files, bytes read and cache hits, and keeps the slowest files.
+When no profile is active the hot paths only pay for a `None` check.
+
+Stage times of files loaded in worker processes are measured in the workers and summed,
+so with `workers > 1` they can add up to more than the wall time in `total`.
+"""
+
+import heapq
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+DEFAULT_TOP_N = 10
+STAGES = ("total", "glob", "read", "decode", "validate", "flatten", "dataframe")
+
+T = TypeVar("T")
+
+_active: Optional["Profile"] = None
+
+
+class Profile:
+    """Per-stage timers, counters and the slowest files of one or more loads.
+
+    Args:
+        top_n (int): number of slowest files to keep
+    """
+
+    def __init__(self, top_n: int = DEFAULT_TOP_N):
+        self.top_n = top_n
+        # stage -> [seconds, calls]
+        self.stages: Dict[str, List[float]] = {}
+        self.counters: Counter = Counter()
+        # min-heap of (seconds, path, bytes), the fastest of the kept files is popped first
+        self._slowest: List[Tuple[float, str, int]] = []
+
+    def add_time(self, stage: str, seconds: float, calls: int = 1):
+        totals = self.stages.setdefault(stage, [0.0, 0])
+        totals[0] += seconds
+        totals[1] += calls
+
+    @contextmanager
+    def stage(self, name: str):
+        """Times the enclosed block as one call of stage `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] += n
+
+    def record_file(self, path: Path, seconds: float, n_bytes: int):
+        """Records the total time spent loading one file."""
+        self.counters["files"] += 1
+        self.counters["bytes_read"] += n_bytes
+        entry = (seconds, str(path), n_bytes)
+        if len(self._slowest) < self.top_n:
+            heapq.heappush(self._slowest, entry)
+        elif entry > self._slowest[0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    @property
+    def slowest_files(self) -> List[Tuple[float, str, int]]:
+        """The slowest files as (seconds, path, bytes), slowest first."""
+        return sorted(self._slowest, reverse=True)
+
+    def merge(self, other: "Profile"):
+        """Adds the measurements of `other`, e.g. of a worker process, to this profile."""
+        for stage, (seconds, calls) in other.stages.items():
+            self.add_time(stage, seconds, calls)
+        self.counters.update(other.counters)
+        for entry in other._slowest:
+            if len(self._slowest) < self.top_n:
+                heapq.heappush(self._slowest, entry)
+            elif entry > self._slowest[0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def reset(self):
+        self.stages.clear()
+        self.counters.clear()
+        self._slowest.clear()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the machine-readable report."""
+        order = {stage: position for position, stage in enumerate(STAGES)}
+        return {
+            "stages": {stage: {"seconds": seconds, "calls": calls}
+                       for stage, (seconds, calls) in sorted(self.stages.items(),
+                                                              key=lambda item: order.get(item[0], len(order)))},
+            "counters": dict(sorted(self.counters.items())),
+            "slowest_files": [{"path": path, "seconds": seconds, "bytes": n_bytes}
+                              for seconds, path, n_bytes in self.slowest_files],
+        }
+
+    def save(self, report_path: Path):
+        """Writes the report returned by `to_dict` as JSON."""
+        with open(report_path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def print(self, console: Any = None):
+        """Prints the summary tables with `rich`.
+
+        Args:
+            console (Optional[rich.console.Console]): console to print to, stderr by default
+        """
+        from rich.console import Console
+        from rich.table import Table
+
+        if console is None:
+            console = Console(stderr=True)
+        report = self.to_dict()
+        total = report["stages"].get("total", {}).get("seconds")
+
+        stages = Table("Stage", "Time [s]", "Calls", "Share of total", title="mdframe profile")
+        for stage, totals in report["stages"].items():
+            share = f"{totals['seconds'] / total:.1%}" if total and stage != "total" else ""
+            stages.add_row(stage, f"{totals['seconds']:.4f}", str(totals["calls"]), share)
+        console.print(stages)
+
+        counters = Table("Counter", "Value")
+        for name, value in report["counters"].items():
+            counters.add_row(name, str(value))
+        console.print(counters)
+
+        if report["slowest_files"]:
+            slowest = Table("File", "Time [ms]", "Bytes", title=f"Slowest {len(report['slowest_files'])} files")
+            for entry in report["slowest_files"]:
+                slowest.add_row(entry["path"], f"{entry['seconds'] * 1e3:.3f}", str(entry["bytes"]))
+            console.print(slowest)
+
+
+def current_profile() -> Optional[Profile]:
+    """Returns the active profile, `None` when profiling is off."""
+    return _active
+
+
+@contextmanager
+def activate(profile: Optional[Profile]):
+    """Makes `profile` the active profile for the enclosed block; `None` leaves profiling as it is."""
+    global _active
+    if profile is None:
+        yield None
+        return
+    previous = _active
+    _active = profile
+    try:
+        yield profile
+    finally:
+        _active = previous
+
+
+def profiled(iterator: Iterator[T], profile: Optional[Profile]) -> Iterator[T]:
+    """Activates `profile` only while `iterator` produces its items.
+
+    Lazily consumed generators must not leave their profile active between items, or the
+    caller's own work would be attributed to the pipeline.
+    """
+    if profile is None:
+        yield from iterator
+        return
+    while True:
+        with activate(profile):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
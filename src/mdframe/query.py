@@ -0,0 +1,476 @@
+"""A small, safe query language for filtering flattened metadata tables.
+
+Queries are parsed once into a plan which is then evaluated column-wise over a
+DataFrame, or record by record while loading (`Query.matches`), without ever handing
+user input to `eval`. Supported syntax:
+
+* comparisons: `quality >= 2`, `food_type == "apple"`, `weight != 0`
+* boolean logic: `and`, `or`, `not` (or `&`, `|`, `~`) and parentheses
+* value lists: `food_type in ["apple", "banana"]`, `gid not in (1, 2)`
+* list membership: `"IMG_4166" in rgbd_file_names`
+* substring matching: `description contains "porous"`
+* truthiness of a column: `nutrition_facts_sources` (non-empty lists and strings)
+
+Columns are referenced by bare names or, for compatibility with the queries that used
+to be passed to `eval`, as `df["name"]`.
+"""
+
+import operator
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Mapping, Tuple
+import pandas as pd
+
+
+class QueryError(ValueError):
+    """Raised when a query can't be parsed or refers to unknown columns."""
+
+
+_TOKEN_REGEX = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<number>-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)
+  | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<op>==|!=|<=|>=|<|>|&|\||~|\(|\)|\[|\]|,)
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+""", re.VERBOSE)
+
+_KEYWORDS = {"and", "or", "not", "in", "contains", "true", "false", "True", "False"}
+
+_COMPARISONS: Dict[str, Callable[[Any, Any], Any]] = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+Token = Tuple[str, Any]
+
+
+def _tokenize(query: str) -> List[Token]:
+    tokens = []
+    position = 0
+    while position < len(query):
+        match = _TOKEN_REGEX.match(query, position)
+        if match is None:
+            raise QueryError(f"Unexpected character {query[position]!r} at position {position} in query {query!r}")
+        position = match.end()
+        kind = match.lastgroup
+        text = match.group()
+        if kind == "ws":
+            continue
+        if kind == "number":
+            tokens.append(("literal", float(text) if any(c in text for c in ".eE") else int(text)))
+        elif kind == "string":
+            tokens.append(("literal", _unescape(text[1:-1])))
+        elif kind == "name" and text in _KEYWORDS:
+            if text in ("true", "True"):
+                tokens.append(("literal", True))
+            elif text in ("false", "False"):
+                tokens.append(("literal", False))
+            else:
+                tokens.append(("keyword", text))
+        else:
+            tokens.append((kind, text))
+    tokens.append(("end", None))
+    return tokens
+
+
+def _unescape(text: str) -> str:
+    return re.sub(r"\\(.)", r"\1", text)
+
+
+# --- plan nodes ------------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class Column:
+    name: str
+
+
+@dataclass(frozen=True)
+class Literal:
+    value: Any
+
+
+@dataclass(frozen=True)
+class Compare:
+    op: str
+    left: Any
+    right: Any
+
+
+@dataclass(frozen=True)
+class Membership:
+    """`needle in haystack`; either side may be a column."""
+    needle: Any
+    haystack: Any
+
+
+@dataclass(frozen=True)
+class Contains:
+    column: Any
+    needle: Any
+
+
+@dataclass(frozen=True)
+class Truthy:
+    column: Column
+
+
+@dataclass(frozen=True)
+class BoolOp:
+    op: str
+    operands: Tuple[Any, ...]
+
+
+@dataclass(frozen=True)
+class Not:
+    operand: Any
+
+
+class _Parser:
+
+    def __init__(self, query: str):
+        self.query = query
+        self.tokens = _tokenize(query)
+        self.position = 0
+
+    def peek(self) -> Token:
+        return self.tokens[self.position]
+
+    def advance(self) -> Token:
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def accept(self, kind: str, value: Any = None) -> bool:
+        token = self.peek()
+        if token[0] == kind and (value is None or token[1] == value):
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, kind: str, value: Any = None) -> Token:
+        token = self.peek()
+        if token[0] != kind or (value is not None and token[1] != value):
+            raise self.error(f"expected {value or kind}")
+        return self.advance()
+
+    def error(self, message: str) -> QueryError:
+        token = self.peek()
+        found = "end of query" if token[0] == "end" else repr(token[1])
+        return QueryError(f"Invalid query {self.query!r}: {message}, found {found}")
+
+    def parse(self):
+        node = self.parse_or()
+        if self.peek()[0] != "end":
+            raise self.error("unexpected token")
+        return node
+
+    def parse_or(self):
+        operands = [self.parse_and()]
+        while self.accept("keyword", "or") or self.accept("op", "|"):
+            operands.append(self.parse_and())
+        return operands[0] if len(operands) == 1 else BoolOp("or", tuple(operands))
+
+    def parse_and(self):
+        operands = [self.parse_not()]
+        while self.accept("keyword", "and") or self.accept("op", "&"):
+            operands.append(self.parse_not())
+        return operands[0] if len(operands) == 1 else BoolOp("and", tuple(operands))
+
+    def parse_not(self):
+        if self.accept("keyword", "not") or self.accept("op", "~"):
+            return Not(self.parse_not())
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        left = self.parse_operand()
+        token = self.peek()
+        if token[0] == "op" and token[1] in _COMPARISONS:
+            self.advance()
+            return Compare(token[1], left, self.parse_operand())
+        if self.accept("keyword", "in"):
+            return Membership(left, self.parse_operand())
+        if token == ("keyword", "not") and self.tokens[self.position + 1] == ("keyword", "in"):
+            self.position += 2
+            return Not(Membership(left, self.parse_operand()))
+        if self.accept("keyword", "contains"):
+            return Contains(left, self.parse_operand())
+        if isinstance(left, Column):
+            return Truthy(left)
+        if isinstance(left, (Compare, Membership, Contains, Truthy, BoolOp, Not)):
+            return left
+        raise self.error("expected a comparison")
+
+    def parse_operand(self):
+        token = self.peek()
+        if token[0] == "literal":
+            self.advance()
+            return Literal(token[1])
+        if token[0] == "name":
+            self.advance()
+            if token[1] == "df" and self.accept("op", "["):
+                name = self.expect("literal")[1]
+                if not isinstance(name, str):
+                    raise self.error("expected a column name")
+                self.expect("op", "]")
+                return Column(name)
+            return Column(token[1])
+        if self.accept("op", "["):
+            return Literal(tuple(self.parse_literal_list("]")))
+        if self.accept("op", "("):
+            # either a parenthesised expression or a tuple of literals
+            if self.peek()[0] == "literal" and self.tokens[self.position + 1] == ("op", ","):
+                return Literal(tuple(self.parse_literal_list(")")))
+            node = self.parse_or()
+            self.expect("op", ")")
+            return node
+        raise self.error("expected a column, a value or a list of values")
+
+    def parse_literal_list(self, closing: str) -> List[Any]:
+        values = []
+        while not self.accept("op", closing):
+            values.append(self.expect("literal")[1])
+            if not self.accept("op", ","):
+                self.expect("op", closing)
+                break
+        return values
+
+
+# --- evaluation ------------------------------------------------------------------------------
+
+_NAN = float("nan")
+
+
+def _is_missing(value: Any) -> bool:
+    return value is None or (isinstance(value, float) and value != value) or value is pd.NA
+
+
+def _contains(cell: Any, needle: Any) -> bool:
+    if isinstance(cell, (list, tuple)):
+        return needle in cell
+    if isinstance(cell, str) and isinstance(needle, str):
+        return needle in cell
+    return False
+
+
+def _truthy(cell: Any) -> bool:
+    if _is_missing(cell):
+        return False
+    return bool(cell)
+
+
+def _as_mask(values: Any, index: pd.Index) -> pd.Series:
+    if isinstance(values, pd.Series):
+        return values.fillna(False).astype(bool)
+    return pd.Series(bool(values), index=index)
+
+
+class Query:
+    """A compiled query.
+
+    Args:
+        text (str): the query, see the module documentation for the syntax
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.plan = _Parser(text).parse()
+        self.columns = frozenset(self._collect_columns(self.plan))
+
+    def __repr__(self) -> str:
+        return f"Query({self.text!r})"
+
+    @property
+    def normalized(self) -> str:
+        """A canonical form of the query, equal for queries differing only in spelling.
+
+        Whitespace, quoting, `df["name"]` references and the symbolic operators
+        (`&`, `|`, `~`) don't change it, e.g. for `df['quality']==1` and `quality == 1`.
+        """
+        return repr(self.plan)
+
+    @classmethod
+    def _collect_columns(cls, node) -> List[str]:
+        if isinstance(node, Column):
+            return [node.name]
+        if isinstance(node, BoolOp):
+            return [name for operand in node.operands for name in cls._collect_columns(operand)]
+        if isinstance(node, (Literal, str)):
+            return []
+        children = [getattr(node, field) for field in node.__dataclass_fields__]
+        return [name for child in children for name in cls._collect_columns(child)]
+
+    def evaluate(self, df: pd.DataFrame) -> pd.Series:
+        """Evaluates the query over every row of `df`.
+
+        Args:
+            df (pd.DataFrame): a flattened metadata table
+
+        Returns:
+            pd.Series: boolean mask aligned with `df`, missing values never match
+
+        Raises:
+            QueryError: if the query refers to columns missing from `df`
+        """
+        missing_columns = sorted(name for name in self.columns if name not in df.columns)
+        if missing_columns:
+            raise QueryError(f"Query {self.text!r} refers to unknown columns {missing_columns}")
+        return _as_mask(self._evaluate(self.plan, df), df.index)
+
+    def matches(self, row: Mapping[str, Any]) -> bool:
+        """Evaluates the query for a single flattened record, e.g. while it is being loaded.
+
+        Gives the same result as `evaluate` would for the record's row; columns missing
+        from `row` hold missing values.
+
+        Args:
+            row (Mapping[str, Any]): flattened fields of the record, at least `columns`
+
+        Returns:
+            bool: whether the record matches
+        """
+        return _truthy(self._evaluate_row(self.plan, row))
+
+    def _row_value(self, node, row: Mapping[str, Any]):
+        if isinstance(node, Column):
+            return row.get(node.name, _NAN)
+        if isinstance(node, Literal):
+            return node.value
+        return self._evaluate_row(node, row)
+
+    def _evaluate_row(self, node, row: Mapping[str, Any]):
+        if isinstance(node, BoolOp):
+            results = (_truthy(self._evaluate_row(operand, row)) for operand in node.operands)
+            return all(results) if node.op == "and" else any(results)
+        if isinstance(node, Not):
+            return not _truthy(self._evaluate_row(node.operand, row))
+        if isinstance(node, Truthy):
+            return _truthy(self._row_value(node.column, row))
+        if isinstance(node, Compare):
+            left, right = self._row_value(node.left, row), self._row_value(node.right, row)
+            try:
+                # missing values are NaN, as in a DataFrame: only `!=` holds for them
+                return bool(_COMPARISONS[node.op](left, right))
+            except (TypeError, ValueError):
+                return False
+        if isinstance(node, Membership):
+            needle = self._row_value(node.needle, row)
+            haystack = self._row_value(node.haystack, row)
+            if isinstance(node.haystack, Column):
+                return _contains(haystack, needle)
+            if not isinstance(haystack, tuple):
+                raise QueryError(f"Right-hand side of 'in' must be a column or a list in query {self.text!r}")
+            return not _is_missing(needle) and needle in haystack
+        if isinstance(node, Contains):
+            return _contains(self._row_value(node.column, row), self._row_value(node.needle, row))
+        if isinstance(node, (Column, Literal)):
+            return self._row_value(node, row)
+        raise QueryError(f"Unsupported expression in query {self.text!r}")
+
+    def _value(self, node, df: pd.DataFrame):
+        if isinstance(node, Column):
+            column = df[node.name]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                column = column.astype(object)
+            return column
+        if isinstance(node, Literal):
+            return node.value
+        return self._evaluate(node, df)
+
+    def _evaluate(self, node, df: pd.DataFrame):
+        if isinstance(node, BoolOp):
+            masks = [_as_mask(self._evaluate(operand, df), df.index) for operand in node.operands]
+            result = masks[0]
+            for mask in masks[1:]:
+                result = (result & mask) if node.op == "and" else (result | mask)
+            return result
+        if isinstance(node, Not):
+            return ~_as_mask(self._evaluate(node.operand, df), df.index)
+        if isinstance(node, Truthy):
+            return self._value(node.column, df).map(_truthy)
+        if isinstance(node, Compare):
+            return self._compare(node.op, self._value(node.left, df), self._value(node.right, df))
+        if isinstance(node, Membership):
+            needle = self._value(node.needle, df)
+            haystack = self._value(node.haystack, df)
+            if isinstance(haystack, pd.Series):
+                if isinstance(needle, pd.Series):
+                    return pd.Series([_contains(cell, value) for cell, value in zip(haystack, needle)],
+                                     index=haystack.index)
+                return haystack.map(lambda cell: _contains(cell, needle))
+            if not isinstance(haystack, tuple):
+                raise QueryError(f"Right-hand side of 'in' must be a column or a list in query {self.text!r}")
+            if isinstance(needle, pd.Series):
+                return needle.map(lambda cell: not _is_missing(cell) and cell in haystack)
+            return needle in haystack
+        if isinstance(node, Contains):
+            haystack = self._value(node.column, df)
+            needle = self._value(node.needle, df)
+            if not isinstance(haystack, pd.Series):
+                return _contains(haystack, needle)
+            return haystack.map(lambda cell: _contains(cell, needle))
+        if isinstance(node, (Column, Literal)):
+            return self._value(node, df)
+        raise QueryError(f"Unsupported expression in query {self.text!r}")
+
+    @staticmethod
+    def _compare(op: str, left: Any, right: Any):
+        compare = _COMPARISONS[op]
+        if not isinstance(left, pd.Series) and not isinstance(right, pd.Series):
+            return compare(left, right)
+        try:
+            result = compare(left, right)
+            if isinstance(result, pd.Series):
+                return result
+        except (TypeError, ValueError):
+            pass
+
+        # mixed-type object columns can't be compared in one go, compare cell by cell instead
+        def safe_compare(a: Any, b: Any) -> bool:
+            if _is_missing(a) or _is_missing(b):
+                return False
+            try:
+                return bool(compare(a, b))
+            except TypeError:
+                return False
+
+        if isinstance(left, pd.Series) and isinstance(right, pd.Series):
+            return pd.Series([safe_compare(a, b) for a, b in zip(left, right)], index=left.index)
+        if isinstance(left, pd.Series):
+            return left.map(lambda cell: safe_compare(cell, right))
+        return right.map(lambda cell: safe_compare(left, cell))
+
+
+@lru_cache(maxsize=256)
+def compile_query(text: str) -> Query:
+    """Parses `text` into a reusable `Query`; repeated queries are compiled only once.
+
+    Args:
+        text (str): the query
+
+    Returns:
+        Query: the compiled query
+
+    Raises:
+        QueryError: if the query is not valid
+    """
+    return Query(text)
+
+
+def validate_query(text: str) -> Query:
+    """Compiles `text` before any data is read, so that a malformed query fails early.
+
+    Args:
+        text (str): the query
+
+    Returns:
+        Query: the compiled query, shared with later `compile_query(text)` calls
+
+    Raises:
+        QueryError: if the query is not valid
+    """
+    return compile_query(text)
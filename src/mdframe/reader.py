@@ -1,15 +1,34 @@
+from __future__ import annotations
+
 import argparse
+import hashlib
 import json
-from dataclasses import dataclass
-from jsonschema import validate, ValidationError, SchemaError
-import pandas as pd
-import toml
-from toml.decoder import TomlDecodeError
-from typing import Dict, Any, Tuple, Optional, Literal, get_args, List
+import os
+import re
+import sys
+import time
+from datetime import datetime
+from collections import deque
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Any, Tuple, Optional, Literal, get_args, List, Iterator, Sequence
 from pathlib import Path
-import urllib3
+from typing import TYPE_CHECKING
 from urllib.parse import urlparse
-from urllib3.exceptions import HTTPError
+from mdframe.cache import ParseCache, ShardCache, schema_hash
+from mdframe.discovery import (MetadataFile, Shard, discover_shards, iter_shard_files, merge_shards,
+                               record_sort_key)
+from mdframe.profiling import Profile, activate, current_profile, profiled
+from mdframe.schemas import DEFAULT_SCHEMA_CACHE_DIR, DEFAULT_SCHEMA_TTL, fetch_schema
+from mdframe.validation import (MetadataValidator, OnError, SUPPORTED_ON_ERROR_MODES,
+                                SUPPORTED_VALIDATION_MODES, Validation, ValidationIssue,
+                                issue_from_error)
+
+# pandas, numpy, jsonschema, toml and urllib3 are imported where they are first needed,
+# so that e.g. `mdfr --help` doesn't pay for importing them
+if TYPE_CHECKING:
+    import pandas as pd
+    from toml.decoder import TomlDecodeError
 
 DataFileExtension = Literal["txt", "jpg"]
 SUPPORTED_DATA_FILE_EXTENSIONS = get_args(DataFileExtension)
@@ -17,36 +36,207 @@ SUPPORTED_DATA_FILE_EXTENSIONS = get_args(DataFileExtension)
 MetadataFileExtension = Literal["toml"]
 SUPPORTED_METADATA_FILE_EXTENSIONS = get_args(MetadataFileExtension)
 
+RunOutput = Literal["series", "records"]
+SUPPORTED_RUN_OUTPUTS = get_args(RunOutput)
+
+TomlBackendName = Literal["tomllib", "tomli", "toml"]
+SUPPORTED_TOML_BACKENDS = get_args(TomlBackendName)
+# overrides the automatic choice of TOML parser, inherited by worker processes
+TOML_BACKEND_ENV_VAR = "MDFRAME_TOML_BACKEND"
+
+# upper bound on the number of files sent to a worker process at once
+MAX_CHUNK_SIZE = 256
+
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_METADATA_KEY = b"mdframe"
+
+
+def _is_url(location: str) -> bool:
+    return urlparse(location).scheme in ['http', 'https']
+
+
+@dataclass(frozen=True)
+class TomlBackend:
+    """A TOML parser: `loads` parses a document, `decode_error` is the exception it raises."""
+    name: TomlBackendName
+    loads: Callable[[str], Dict[str, Any]]
+    decode_error: type
+
+
+def _import_toml_backend(name: TomlBackendName) -> TomlBackend:
+    if name == "tomllib":
+        if sys.version_info < (3, 11):
+            raise ImportError("tomllib requires Python 3.11 or newer")
+        import tomllib
+        return TomlBackend("tomllib", tomllib.loads, tomllib.TOMLDecodeError)
+    if name == "tomli":
+        import tomli
+        return TomlBackend("tomli", tomli.loads, tomli.TOMLDecodeError)
+    if name == "toml":
+        import toml
+        return TomlBackend("toml", toml.loads, toml.TomlDecodeError)
+    raise ValueError(f"Unsupported TOML backend {name}, choose one of {SUPPORTED_TOML_BACKENDS}")
+
+
+_toml_backends: Dict[Optional[str], TomlBackend] = {}
+
+
+def get_toml_backend(name: Optional[TomlBackendName] = None) -> TomlBackend:
+    """Returns the TOML parser used to read metadata files.
+
+    Without a `name` the `MDFRAME_TOML_BACKEND` environment variable is honoured, otherwise
+    the fastest available parser is picked: the stdlib `tomllib` (Python 3.11+), then
+    `tomli`, then the pure-Python `toml`.
+
+    Args:
+        name (Optional[TomlBackendName]): backend to use
+
+    Returns:
+        TomlBackend: the parser
+
+    Raises:
+        ImportError: if the requested backend is not installed
+    """
+    if name is None:
+        name = os.environ.get(TOML_BACKEND_ENV_VAR) or None
+    if name is not None:
+        if name not in _toml_backends:
+            _toml_backends[name] = _import_toml_backend(name)
+        return _toml_backends[name]
+
+    if None not in _toml_backends:
+        for candidate in SUPPORTED_TOML_BACKENDS:
+            try:
+                _toml_backends[None] = _import_toml_backend(candidate)
+                break
+            except ImportError:
+                continue
+    return _toml_backends[None]
+
+
+_TOML_ERROR_LOCATION = re.compile(r"\s*\(at (?:line (\d+), column (\d+)|end of document)\)$")
+
+
+def _to_toml_decode_error(toml_error: Exception, doc: str, file_name: str) -> TomlDecodeError:
+    """Rewrites a parser error as a `TomlDecodeError` naming the offending file."""
+    from toml.decoder import TomlDecodeError
+
+    if isinstance(toml_error, TomlDecodeError):
+        message, pos = toml_error.msg, toml_error.pos
+    else:
+        # tomllib/tomli report the location only as part of the message
+        message = str(toml_error)
+        pos = len(doc)
+        location = _TOML_ERROR_LOCATION.search(message)
+        if location is not None:
+            message = message[:location.start()]
+            if location.group(1) is not None:
+                lines = doc.splitlines(keepends=True)
+                line, column = int(location.group(1)), int(location.group(2))
+                pos = min(sum(len(text) for text in lines[:line - 1]) + column - 1, len(doc))
+    return TomlDecodeError(f"Crashed when processing metadata file {file_name}; {message}",
+                           doc=doc, pos=pos)
+
+
 @dataclass
 class Config:
-    data_path: Path
+    # a directory, or several directories (e.g. mounted volumes) making up one archive
+    data_path: Path | Sequence[Path]
     metadata_file_extension: Optional[MetadataFileExtension]
     # data_file_extensions: List[DataFileExtension]
     schema_loc: Path | str
     __schema: Dict | None = None
+    workers: int | None = 1
+    cache_dir: Path | None = None
+    validation: Validation = "full"
+    schema_cache_dir: Path | None = DEFAULT_SCHEMA_CACHE_DIR
+    schema_ttl: float = DEFAULT_SCHEMA_TTL
+    profile: bool = False
+    # also load metadata files from all subdirectories of `data_path`
+    recursive: bool = False
+    # flattened fields (e.g. `weight`) or whole sections (e.g. `time`) to keep, all by default
+    columns: Sequence[str] | None = None
+    # query records must match to be kept, see `mdframe.query`
+    where: str | None = None
+    # files failing to load abort the load (`raise`), are left out (`skip`) or are left out
+    # with their problems kept in `errors` (`collect`)
+    on_error: OnError = "raise"
+    _errors: List[ValidationIssue] = field(default_factory=list,
+                                           init=False, repr=False, compare=False)
+    _validator: MetadataValidator | None = field(default=None,
+                                                 init=False, repr=False, compare=False)
+    _profiler: Profile | None = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def data_paths(self) -> List[Path]:
+        """The roots of the archive, `data_path` as a list."""
+        if isinstance(self.data_path, (str, os.PathLike)):
+            return [Path(self.data_path)]
+        return [Path(path) for path in self.data_path]
+
+    @property
+    def sharded(self) -> bool:
+        """Whether the archive spans several directories, ordering its records by `gid`/`uid`."""
+        return self.recursive or len(self.data_paths) > 1
+
+    @property
+    def profiler(self) -> Profile | None:
+        """Measurements of every load done with this configuration, `None` without `profile`."""
+        if not self.profile:
+            return None
+        if self._profiler is None:
+            self._profiler = Profile()
+        return self._profiler
+
+    @property
+    def errors(self) -> List[ValidationIssue]:
+        """Problems of the files left out of the last load, collected if `on_error` is `collect`."""
+        return self._errors
+
+    @property
+    def validator(self) -> MetadataValidator:
+        """Validator built once from `schema`; the schema itself is checked only here."""
+        if self._validator is None or self._validator.mode != self.validation:
+            self._validator = MetadataValidator(self.schema, self.validation)
+        return self._validator
 
     @property
     def schema(self):
         if self.__schema is None:
-            if isinstance(self.schema_loc, Path):
-                if not self.schema_loc.exists():
+            if isinstance(self.schema_loc, str) and _is_url(self.schema_loc):
+                self.__schema = fetch_schema(self.schema_loc, self.schema_cache_dir,
+                                             self.schema_ttl)
+            elif isinstance(self.schema_loc, (str, Path)):
+                schema_path = Path(self.schema_loc)
+                if not schema_path.exists():
                     raise ValueError(f"Path {self.schema_loc} does not seem to point to a valid JSON schema file")
 
-                with open(self.schema_loc, "r") as f:
+                with open(schema_path, "r") as f:
                     self.__schema = json.loads(f.read())
-            elif urlparse(self.schema_loc).scheme in ['http', 'https']: # schema_url is a string (representing a URL)
-                http = urllib3.PoolManager()
-                response = http.request('GET', self.schema_loc)
-
-                if response.status == 200:
-                   self.__schema = json.loads(response.data.decode('utf-8'))
-                else:
-                    raise HTTPError(f"Failed to fetch schema from URL {self.schema_loc}")
             else:
-                raise ValueError(f"Passed schema location is not a path or a URL")
+                raise ValueError(f"Specified schema location {self.schema_loc} is neither a URL nor Path")
         return self.__schema
 
-def load_metadata_file(metadata_file_path: Path, schema: Dict) -> Dict[str, Any]:
+
+def load_metadata_file(metadata_file_path: Path,
+                       schema: Dict,
+                       validator: Optional[MetadataValidator] = None,
+                       toml_backend: Optional[TomlBackend] = None) -> Dict[str, Any]:
+    """Loads a single metadata file and validates it.
+
+    Args:
+        metadata_file_path (Path): path to the metadata file
+        schema (Dict): JSON schema used to validate the file
+        validator (Optional[MetadataValidator]): prebuilt validator for `schema`; pass one
+            when loading many files, otherwise a new validator is built for every call
+        toml_backend (Optional[TomlBackend]): TOML parser, see `get_toml_backend` for the default
+
+    Returns:
+        Dict[str, Any]: contents of the metadata file
+    """
+    specific_file_name = str(metadata_file_path)
+    specific_file_name = specific_file_name[specific_file_name.rfind('/')+1:]
+
     # starting this indexing at 1 to shave off the '.' to get the actual extension
     filename_suffix = metadata_file_path.suffix[1:]
     if filename_suffix not in SUPPORTED_METADATA_FILE_EXTENSIONS:
@@ -55,97 +245,920 @@ def load_metadata_file(metadata_file_path: Path, schema: Dict) -> Dict[str, Any]
     if not metadata_file_path.exists():
         raise FileNotFoundError(f"Path {metadata_file_path} does not seem to point to a valid file")
 
-    specific_file_name = str(metadata_file_path)
-    specific_file_name = specific_file_name[specific_file_name.rfind('/')+1:]
-
+    if toml_backend is None:
+        toml_backend = get_toml_backend()
+    profile = current_profile()
+    start = time.perf_counter() if profile is not None else 0.0
+    # read as bytes and decode once, TOML documents are always UTF-8
+    with open(metadata_file_path, "rb") as f:
+        metadata_file_bytes = f.read()
+    metadata_file_text = metadata_file_bytes.decode("utf-8")
+    if "\r" in metadata_file_text:
+        # same universal newlines as a text-mode read,
+        # multi-line strings must not depend on the backend
+        metadata_file_text = metadata_file_text.replace("\r\n", "\n").replace("\r", "\n")
+    if profile is not None:
+        read_end = time.perf_counter()
+        profile.add_time("read", read_end - start)
     try:
-        with open(metadata_file_path, "r") as f:
-            metadata_file_contents = toml.load(f)
-    except toml.decoder.TomlDecodeError as toml_error:
-        raise TomlDecodeError(f"Crashed when processing metadata file {specific_file_name}; {toml_error}", doc=toml_error.doc, pos=toml_error.pos) from toml_error
+        metadata_file_contents = toml_backend.loads(metadata_file_text)
+    except toml_backend.decode_error as toml_error:
+        raise _to_toml_decode_error(toml_error, metadata_file_text,
+                                    specific_file_name) from toml_error
+    if profile is not None:
+        decode_end = time.perf_counter()
+        profile.add_time("decode", decode_end - read_end)
 
     try:
+        if validator is None:
+            validator = MetadataValidator(schema)
         # validates JSON according to schema located in schema.json
-        validate(instance = metadata_file_contents, schema = schema)
-    except SchemaError as schema_error:
-        raise SchemaError(f"Crashed when processing metadata file {specific_file_name}; {schema_error.message}") from schema_error
-    except ValidationError as validation_error:
-        raise ValidationError( f"Crashed when processing metadata file {specific_file_name}; {validation_error.message}") from validation_error
+        validator(metadata_file_contents)
+    except Exception as error:
+        # jsonschema is imported by the validator, only needed here once validation failed
+        from jsonschema import ValidationError, SchemaError
 
+        if isinstance(error, SchemaError):
+            raise SchemaError(f"Crashed when processing metadata file {specific_file_name};"
+                              f" {error.message}") from error
+        if isinstance(error, ValidationError):
+            raise ValidationError(f"Crashed when processing metadata file {specific_file_name};"
+                                  f" {error.message}") from error
+        raise
+
+    if profile is not None:
+        end = time.perf_counter()
+        profile.add_time("validate", end - decode_end)
+        profile.record_file(metadata_file_path, end - start, len(metadata_file_bytes))
     return metadata_file_contents
 
 
 def metadata_file_to_df(metadata_file_contents):
+    import pandas as pd
     return pd.DataFrame(metadata_file_contents)
 
 
-def data_to_dataframes(data_path: Path,
-                           metadata_file_extension: MetadataFileExtension,
-                           schema: Dict) -> List[pd.DataFrame]:
-    metadata_file_paths = sorted(data_path.glob(f"*.{metadata_file_extension}"))
-    metadata_file_contents = [load_metadata_file(path, schema) for path in metadata_file_paths]
-    
+def _to_builtin(value: Any) -> Any:
+    # `toml` represents inline tables with a dict subclass local to the decoder,
+    # which can't be pickled
+    if isinstance(value, dict):
+        return {key: _to_builtin(subvalue) for key, subvalue in value.items()}
+    if isinstance(value, list):
+        return [_to_builtin(item) for item in value]
+    return value
+
+
+# schema, validator and whether to profile of a worker process,
+# set once per worker by `_init_worker`
+_worker_state: Tuple[Dict, MetadataValidator, bool] | None = None
+
+
+def _init_worker(schema: Dict, validator: MetadataValidator, profile: bool = False):
+    global _worker_state
+    _worker_state = (schema, validator, profile)
+
+
+def _load_metadata_chunk_in_worker(
+        metadata_file_paths: List[Path]) -> Tuple[List[Dict[str, Any] | None], Profile | None]:
+    """Worker-side wrapper around `load_metadata_file` loading a chunk of files.
+
+    Some of the exceptions raised by `load_metadata_file` (e.g. `TomlDecodeError`) cannot
+    be pickled back to the parent process, so failures are signalled with `None` and the
+    parent re-loads the offending file to raise the original error. When the parent is
+    profiling, the measurements of the chunk are sent back along with the contents.
+    """
+    schema, validator, profile_chunk = _worker_state
+    profile = Profile() if profile_chunk else None
+    toml_backend = get_toml_backend()
+    # only `toml` returns dict subclasses, the other backends return plain builtins
+    convert = _to_builtin if toml_backend.name == "toml" else (lambda value: value)
+    metadata_file_contents = []
+    with activate(profile):
+        for metadata_file_path in metadata_file_paths:
+            try:
+                contents = load_metadata_file(metadata_file_path, schema, validator, toml_backend)
+                metadata_file_contents.append(convert(contents))
+            except Exception:
+                metadata_file_contents.append(None)
+    return metadata_file_contents, profile
+
+
+def split_into_chunks(items: Sequence[Any],
+                      workers: int,
+                      max_chunk_size: int = MAX_CHUNK_SIZE) -> List[Sequence[Any]]:
+    """Splits `items` into the chunks handed to a pool of `workers` processes, one task per chunk.
+
+    A few chunks per worker keep the pool balanced without paying the IPC cost per item.
+
+    Args:
+        items (Sequence[Any]): e.g. paths of metadata files
+        workers (int): number of worker processes
+        max_chunk_size (int): upper bound on the number of items per chunk
+
+    Returns:
+        List[Sequence[Any]]: consecutive slices of `items`
+    """
+    chunksize = max(1, min(len(items) // (workers * 4), max_chunk_size))
+    return [items[i:i + chunksize] for i in range(0, len(items), chunksize)]
+
+
+def _load_or_skip(metadata_file_path: Path,
+                  schema: Dict,
+                  validator: MetadataValidator,
+                  on_error: OnError,
+                  errors: List[ValidationIssue] | None) -> Dict[str, Any] | None:
+    """Loads a metadata file, returning `None` instead of raising unless `on_error` is `raise`."""
+    try:
+        return load_metadata_file(metadata_file_path, schema, validator)
+    except Exception as error:
+        from jsonschema import SchemaError
+
+        # an invalid schema breaks every file, it is never skipped
+        if on_error == "raise" or isinstance(error, SchemaError):
+            raise
+        profile = current_profile()
+        if profile is not None:
+            profile.count("files_skipped")
+        if on_error == "collect" and errors is not None:
+            try:
+                text = metadata_file_path.read_text(encoding="utf-8", errors="replace")
+            except OSError:
+                text = None
+            errors.append(issue_from_error(os.fspath(metadata_file_path), error, text))
+        return None
+
+
+def iter_metadata_files(metadata_file_paths: List[Path],
+                        schema: Dict,
+                        workers: int | None = 1,
+                        validator: Optional[MetadataValidator] = None,
+                        on_error: OnError = "raise",
+                        errors: List[ValidationIssue] | None = None
+                        ) -> Iterator[Dict[str, Any] | None]:
+    """Lazily loads and validates metadata files, optionally spreading the work across processes.
+
+    Files are submitted to the worker pool in chunks, with only a few chunks in flight
+    per worker, so memory use stays bounded however slowly the results are consumed.
+
+    Args:
+        metadata_file_paths (List[Path]): paths of the metadata files to load
+        schema (Dict): JSON schema used to validate every file
+        workers (int | None): number of worker processes; `1` loads the files in the
+            current process, `None` uses one worker per CPU
+        validator (Optional[MetadataValidator]): validator shared by all files, built
+            from `schema` if not given
+        on_error (OnError): `raise` raises the error of the first file failing to load,
+            `skip` and `collect` yield `None` in its place instead
+        errors (List[ValidationIssue] | None): list the problems of the failing files are
+            appended to if `on_error` is `collect`
+
+    Yields:
+        Dict[str, Any] | None: contents of the metadata files, in the order of `metadata_file_paths`
+    """
+    if on_error not in SUPPORTED_ON_ERROR_MODES:
+        raise ValueError(f"on_error must be one of {SUPPORTED_ON_ERROR_MODES}, got {on_error}")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError(f"Number of workers must be a positive integer, got {workers}")
+
+    if validator is None:
+        validator = MetadataValidator(schema)
+
+    if workers == 1 or len(metadata_file_paths) < 2:
+        for path in metadata_file_paths:
+            yield _load_or_skip(path, schema, validator, on_error, errors)
+        return
+
+    workers = min(workers, len(metadata_file_paths))
+    chunks = split_into_chunks(metadata_file_paths, workers)
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    profile = current_profile()
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(schema, validator, profile is not None))
+    try:
+        pending = deque()
+        next_chunk = 0
+        while pending or next_chunk < len(chunks):
+            while next_chunk < len(chunks) and len(pending) < 2 * workers:
+                chunk = chunks[next_chunk]
+                pending.append((chunk, executor.submit(_load_metadata_chunk_in_worker, chunk)))
+                next_chunk += 1
+
+            chunk, future = pending.popleft()
+            chunk_contents, chunk_profile = future.result()
+            if profile is not None and chunk_profile is not None:
+                profile.merge(chunk_profile)
+            for path, contents in zip(chunk, chunk_contents):
+                if contents is None:
+                    # re-raises (or skips) the exact error the serial path would have raised
+                    # for this file
+                    contents = _load_or_skip(path, schema, validator, on_error, errors)
+                yield contents
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def load_metadata_files(metadata_file_paths: List[Path],
+                        schema: Dict,
+                        workers: int | None = 1,
+                        validator: Optional[MetadataValidator] = None) -> List[Dict[str, Any]]:
+    """Loads and validates metadata files, optionally spreading the work across processes.
+
+    See `iter_metadata_files` for the description of the arguments.
+
+    Returns:
+        List[Dict[str, Any]]: contents of the metadata files, in the order of `metadata_file_paths`
+    """
+    return list(iter_metadata_files(metadata_file_paths, schema, workers, validator))
+
+
+def iter_metadata_files_cached(metadata_file_paths: List[Path],
+                               schema: Dict,
+                               cache: ParseCache,
+                               workers: int | None = 1,
+                               validator: Optional[MetadataValidator] = None,
+                               on_error: OnError = "raise",
+                               errors: List[ValidationIssue] | None = None
+                               ) -> Iterator[Dict[str, Any] | None]:
+    """Lazily loads metadata files, re-parsing only the files which changed since they were cached.
+
+    Once all files are consumed, entries of files missing from `metadata_file_paths`
+    are dropped from the cache and the cache is written back to disk.
+
+    Args:
+        metadata_file_paths (List[Path]): paths of the metadata files to load
+        schema (Dict): JSON schema used to validate every file
+        cache (ParseCache): cache of previously parsed files
+        workers (int | None): number of worker processes used for the changed files
+        validator (Optional[MetadataValidator]): validator shared by all files
+        on_error (OnError): what to do with files failing to load, see `iter_metadata_files`;
+            skipped files aren't cached
+        errors (List[ValidationIssue] | None): list collecting the problems of skipped files
+
+    Yields:
+        Dict[str, Any] | None: contents of the metadata files, in the order of `metadata_file_paths`
+    """
+    fingerprints = [cache.fingerprint(path) for path in metadata_file_paths]
+    cached_contents = [cache.get(path, fingerprint)
+                       for path, fingerprint in zip(metadata_file_paths, fingerprints)]
+
+    stale_paths = [path for path, contents in zip(metadata_file_paths, cached_contents)
+                   if contents is None]
+    profile = current_profile()
+    if profile is not None:
+        profile.count("cache_hits", len(metadata_file_paths) - len(stale_paths))
+        profile.count("cache_misses", len(stale_paths))
+    fresh_contents = iter_metadata_files(stale_paths, schema, workers, validator, on_error, errors)
+    for path, fingerprint, contents in zip(metadata_file_paths, fingerprints, cached_contents):
+        if contents is None:
+            contents = next(fresh_contents)
+            if contents is None:
+                yield None
+                continue
+            contents = _to_builtin(contents)
+            cache.put(path, fingerprint, contents)
+        yield contents
+
+    cache.prune(metadata_file_paths)
+    cache.save()
+
+
+def load_metadata_files_cached(metadata_file_paths: List[Path],
+                               schema: Dict,
+                               cache: ParseCache,
+                               workers: int | None = 1,
+                               validator: Optional[MetadataValidator] = None
+                               ) -> List[Dict[str, Any]]:
+    """Loads metadata files, re-parsing only the files which changed since they were cached.
+
+    See `iter_metadata_files_cached` for the description of the arguments.
+
+    Returns:
+        List[Dict[str, Any]]: contents of the metadata files, in the order of `metadata_file_paths`
+    """
+    return list(iter_metadata_files_cached(metadata_file_paths, schema, cache, workers, validator))
+
+
+def list_metadata_files(data_path: Path,
+                        metadata_file_extension: MetadataFileExtension) -> List[Path]:
+    """Lists the metadata files in `data_path`, sorted by file name."""
+    profile = current_profile()
+    if profile is None:
+        return sorted(data_path.glob(f"*.{metadata_file_extension}"))
+    with profile.stage("glob"):
+        return sorted(data_path.glob(f"*.{metadata_file_extension}"))
+
+
+def _iter_data_path(data_path: Path,
+                    metadata_file_extension: MetadataFileExtension,
+                    schema: Dict,
+                    workers: int | None = 1,
+                    cache_dir: Path | None = None,
+                    validator: Optional[MetadataValidator] = None,
+                    metadata_file_paths: List[Path] | None = None,
+                    on_error: OnError = "raise",
+                    errors: List[ValidationIssue] | None = None) -> Iterator[Dict[str, Any] | None]:
+    if metadata_file_paths is None:
+        metadata_file_paths = list_metadata_files(data_path, metadata_file_extension)
+    if validator is None:
+        validator = MetadataValidator(schema)
+    if cache_dir is None:
+        return iter_metadata_files(metadata_file_paths, schema, workers, validator,
+                                   on_error, errors)
+    cache = ParseCache(cache_dir, data_path, schema, validator.mode, get_toml_backend().name)
+    return iter_metadata_files_cached(metadata_file_paths, schema, cache, workers, validator,
+                                      on_error, errors)
+
+
+def discover_config_shards(config: Config) -> List[Shard]:
+    """Lists the shards of the archive described by `config`, see `discovery.discover_shards`."""
+    profile = current_profile()
+    with profile.stage("glob") if profile is not None else nullcontext():
+        return discover_shards(config.data_paths, config.metadata_file_extension, config.recursive)
+
+
+def discover_metadata_files(config: Config) -> List[MetadataFile]:
+    """Lists the metadata files described by `config`, with keys, modification times and sizes.
+
+    Files are listed shard by shard and by file name within a shard. Keys are file names
+    for a flat, single-directory archive.
+    """
+    return list(iter_shard_files(discover_config_shards(config), config.data_paths))
+
+
+def data_version(config: Config) -> str:
+    """Fingerprints the records `config` loads without reading the metadata files.
+
+    The version changes whenever a metadata file is added, removed or modified, or the
+    schema, validation mode, `on_error`, `columns` or `where` change. It only costs
+    listing the data directories.
+
+    Returns:
+        str: hex digest identifying the current version of the data
+    """
+    description = {
+        "data_paths": [os.fspath(Path(path).resolve()) for path in config.data_paths],
+        "extension": config.metadata_file_extension,
+        "recursive": config.recursive,
+        "schema_hash": schema_hash(config.schema),
+        "validation": config.validation,
+        "on_error": config.on_error,
+        "columns": list(config.columns) if config.columns is not None else None,
+        "where": config.where,
+        "files": _snapshot_fingerprints(discover_metadata_files(config)),
+    }
+    return hashlib.sha1(json.dumps(description, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def iter_sharded_records(shards: List[Shard],
+                         schema: Dict,
+                         workers: int | None = 1,
+                         cache_dir: Path | None = None,
+                         validator: Optional[MetadataValidator] = None,
+                         on_error: OnError = "raise",
+                         errors: List[ValidationIssue] | None = None) -> Iterator[Dict[str, Any]]:
+    """Loads the records of a sharded archive, ordered by `gid` and then `uid`.
+
+    The files of all shards that have to be parsed are loaded as one batch, so `workers`
+    parallelize across shards too. Every shard is sorted on its own and the shards are
+    merged lazily. With a `cache_dir`, shards whose file listing is unchanged are read back
+    from the cache as a whole.
+
+    Args:
+        shards (List[Shard]): shards of the archive, see `discover_config_shards`
+        schema (Dict): JSON schema used to validate every file
+        workers (int | None): number of worker processes used to parse the files
+        cache_dir (Path | None): directory holding the per-shard cache
+        validator (Optional[MetadataValidator]): validator shared by all files
+        on_error (OnError): what to do with files failing to load, see `iter_metadata_files`;
+            skipped files are left out and their shards aren't cached
+        errors (List[ValidationIssue] | None): list collecting the problems of skipped files
+
+    Returns:
+        Iterator[Dict[str, Any]]: contents of the metadata files, ordered by `gid` and `uid`
+    """
+    if validator is None:
+        validator = MetadataValidator(schema)
+    cache = None
+    shard_records: List[List[Dict[str, Any]] | None] = [None] * len(shards)
+    if cache_dir is not None:
+        cache = ShardCache(cache_dir, schema, validator.mode, get_toml_backend().name)
+        shard_records = [cache.get(shard.path, shard.fingerprint) for shard in shards]
+
+    stale = [index for index, records in enumerate(shard_records) if records is None]
+    profile = current_profile()
+    if profile is not None and cache is not None:
+        profile.count("shard_cache_hits", len(shards) - len(stale))
+        profile.count("shard_cache_misses", len(stale))
+    contents = iter_metadata_files([path for index in stale for path in shards[index].paths],
+                                   schema, workers, validator, on_error, errors)
+    for index in stale:
+        shard = shards[index]
+        records = [next(contents) for _ in range(len(shard))]
+        complete = None not in records
+        records = [record for record in records if record is not None]
+        if cache is not None:
+            records = [_to_builtin(record) for record in records]
+        records.sort(key=record_sort_key)
+        if cache is not None and complete:
+            cache.put(shard.path, shard.fingerprint, records)
+        shard_records[index] = records
+    return merge_shards(shard_records)
+
+
+def project_record(record: Dict[str, Any], columns: frozenset) -> Dict[str, Any]:
+    """Keeps the properties of a record named in `columns`.
+
+    A name keeps either a top-level property with all its contents (e.g. `time`) or a
+    field of a section (e.g. `weight` out of `metrics`), like the columns of
+    `analysis.load_flattened_data`. Sections left empty are dropped.
+    """
+    projected = {}
+    for property_name, value in record.items():
+        if property_name in columns:
+            projected[property_name] = value
+        elif isinstance(value, dict):
+            kept = {subproperty: subvalue for subproperty, subvalue in value.items()
+                    if subproperty in columns}
+            if kept:
+                projected[property_name] = kept
+    return projected
+
+
+def push_down(records: Iterator[Dict[str, Any]],
+              columns: Sequence[str] | None = None,
+              where: str | None = None) -> Iterator[Dict[str, Any]]:
+    """Drops the records not matching `where` and the fields not in `columns`, record by record.
+
+    The query is evaluated on the full record, so it may refer to fields that aren't kept.
+
+    Args:
+        records (Iterator[Dict[str, Any]]): contents of metadata files
+        columns (Sequence[str] | None): fields to keep, see `project_record`
+        where (str | None): query the records must match, see `mdframe.query`
+
+    Yields:
+        Dict[str, Any]: the matching, projected records
+    """
+    query = None
+    if where is not None:
+        # imported here, pandas is only needed once a query is given
+        from mdframe.query import compile_query
+        from mdframe.records import flattened_row
+
+        query = compile_query(where)
+    columns = frozenset(columns) if columns is not None else None
+    profile = current_profile()
+    for record in records:
+        if query is not None:
+            if not query.matches(flattened_row(record, query.columns)):
+                if profile is not None:
+                    profile.count("records_filtered")
+                continue
+        yield record if columns is None else project_record(record, columns)
+
+
+def _iter_config(config: Config,
+                 workers: int | None = None,
+                 shards: List[Shard] | None = None,
+                 metadata_file_paths: List[Path] | None = None) -> Iterator[Dict[str, Any]]:
+    workers = config.workers if workers is None else workers
+    if config.on_error not in SUPPORTED_ON_ERROR_MODES:
+        raise ValueError(f"on_error must be one of {SUPPORTED_ON_ERROR_MODES},"
+                         f" got {config.on_error}")
+    config.errors.clear()
+    if config.where is not None:
+        from mdframe.query import validate_query
+
+        validate_query(config.where)
+    if config.sharded:
+        if shards is None:
+            shards = discover_config_shards(config)
+        records = iter_sharded_records(shards, config.schema, workers, config.cache_dir,
+                                       config.validator, config.on_error, config.errors)
+    else:
+        records = _iter_data_path(
+            data_path=config.data_paths[0],
+            metadata_file_extension=config.metadata_file_extension,
+            schema=config.schema,
+            workers=workers,
+            cache_dir=config.cache_dir,
+            validator=config.validator,
+            metadata_file_paths=metadata_file_paths,
+            on_error=config.on_error,
+            errors=config.errors
+        )
+        if config.on_error != "raise":
+            records = (record for record in records if record is not None)
+    if config.columns is None and config.where is None:
+        return records
+    return push_down(records, config.columns, config.where)
+
+
+def _records_to_series(metadata_file_contents: Iterator[Dict[str, Any]]) -> List[pd.Series]:
+    import pandas as pd
+
+    profile = current_profile()
     metadata_records = []
     for text in metadata_file_contents:
-        metadata_records.append(pd.Series(text))
+        if profile is None:
+            metadata_records.append(pd.Series(text))
+        else:
+            with profile.stage("dataframe"):
+                metadata_records.append(pd.Series(text))
 
     return metadata_records
-    
-@dataclass
-class Config:
-    data_path: Path
-    metadata_file_extension: Optional[MetadataFileExtension]
-    # data_file_extensions: List[DataFileExtension]
-    schema_loc: Path | str
-    __schema: Dict | None = None
 
-    @property
-    def schema(self):
-        if self.__schema is None:
-            if isinstance(self.schema_loc, Path):
-                if not self.schema_loc.exists():
-                    raise ValueError(f"Path {self.schema_loc} does not seem to point to a valid JSON schema file")
 
-                with open(self.schema_loc, "r") as f:
-                    self.__schema = json.loads(f.read())
-            elif isinstance(self.schema_loc, str): # schema_url is a string (representing a URL)
-                http = urllib3.PoolManager()
-                response = http.request('GET', self.schema_loc)
-
-                if response.status == 200:
-                   self.__schema = json.loads(response.data.decode('utf-8'))
-                else:
-                    raise HTTPError(f"Failed to fetch schema from URL {self.schema_loc}")
-            else:
-                raise ValueError(f"Specified schema location {self.schema_loc} is neither a URL nor Path")
-        return self.__schema
+def data_to_dataframes(data_path: Path,
+                           metadata_file_extension: MetadataFileExtension,
+                           schema: Dict,
+                           workers: int | None = 1,
+                           cache_dir: Path | None = None,
+                           validator: Optional[MetadataValidator] = None) -> List[pd.DataFrame]:
+    metadata_file_contents = _iter_data_path(data_path, metadata_file_extension, schema,
+                                             workers, cache_dir, validator)
+    return _records_to_series(metadata_file_contents)
 
 
-def run(config: Config):
-    return data_to_dataframes(
-        data_path=config.data_path, 
-        metadata_file_extension=config.metadata_file_extension, 
-        schema=config.schema
-    )
+def iter_records(config: Config, workers: int | None = None) -> Iterator[Dict[str, Any]]:
+    """Lazily loads and validates the metadata files described by `config`.
+
+    Args:
+        config (Config): reader configuration
+        workers (int | None): overrides `config.workers` when given
+
+    Yields:
+        Dict[str, Any]: contents of each metadata file, sorted by file name, or by `gid` and
+        `uid` for a sharded archive (see `Config.sharded`)
+    """
+    profile = config.profiler
+    with activate(profile):
+        # resolving the schema and globbing happen here, before the first record is produced
+        records = _iter_config(config, workers)
+    yield from profiled(records, profile)
+
+
+def run(config: Config,
+        workers: int | None = None,
+        stream: bool = False,
+        output: RunOutput = "series"):
+    """Loads all metadata files described by `config`.
+
+    Args:
+        config (Config): reader configuration
+        workers (int | None): overrides `config.workers` when given
+        stream (bool): yield the series lazily instead of loading all files up front
+        output (RunOutput): `"series"` for one `pd.Series` per file, `"records"` for the
+            much smaller records generated from the schema (see `mdframe.records`), which
+            `records.records_to_dataframe` turns into the flattened table
+
+    Returns:
+        List[pd.Series] | Iterator[pd.Series] | List[MetadataRecord] | Iterator[MetadataRecord]:
+        one series or record per metadata file, in the order of `iter_records`
+    """
+    if output not in SUPPORTED_RUN_OUTPUTS:
+        raise ValueError(f"Unsupported output {output}, choose one of {SUPPORTED_RUN_OUTPUTS}")
+    if output == "records":
+        from mdframe.records import to_records
+
+        if stream:
+            return to_records(iter_records(config, workers), config.schema)
+        profile = config.profiler
+        with activate(profile), (profile.stage("total") if profile is not None else nullcontext()):
+            return list(to_records(_iter_config(config, workers), config.schema))
+
+    import pandas as pd
+
+    if stream:
+        return (pd.Series(record) for record in iter_records(config, workers))
+    profile = config.profiler
+    with activate(profile), (profile.stage("total") if profile is not None else nullcontext()):
+        return _records_to_series(_iter_config(config, workers))
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+    except ImportError as import_error:
+        raise ImportError("Snapshots require the optional `pyarrow` package of the"
+                          " `snapshot` extra, install it with `pip install mdframe[snapshot]`"
+                          " or `poetry install --extras snapshot`") from import_error
+    return pyarrow
+
+
+def _is_missing(value: Any) -> bool:
+    return isinstance(value, float) and value != value
+
+
+def _drop_nulls(value: Any) -> Any:
+    # TOML has no null, null struct fields only come from Arrow unifying tables with different keys
+    if isinstance(value, dict):
+        return {key: _drop_nulls(subvalue) for key, subvalue in value.items()
+                if subvalue is not None}
+    if isinstance(value, list):
+        return [_drop_nulls(item) for item in value]
+    return value
+
+
+def _snapshot_fingerprints(metadata_files: List[MetadataFile]) -> Dict[str, List[int]]:
+    return {metadata_file.key: [metadata_file.mtime_ns, metadata_file.size]
+            for metadata_file in metadata_files}
+
+
+def save_snapshot(config: Config, snapshot_path: Path) -> pd.DataFrame:
+    """Loads the metadata described by `config` and writes the flattened table to a binary snapshot.
+
+    Files with a `.parquet` suffix are written as Parquet, anything else as an uncompressed
+    Feather (Arrow IPC) file, which `load_snapshot` reads through a memory map. Nested fields
+    such as `qa`, `ingredients` and `texture_sources` are stored as list/struct columns. The
+    schema hash and the fingerprints of the source files are stored in the snapshot metadata.
+
+    Args:
+        config (Config): reader configuration
+        snapshot_path (Path): destination of the snapshot
+
+    Returns:
+        pd.DataFrame: the flattened table that was written
+    """
+    import pandas as pd
+    from mdframe.columnar import build_flattened_frame
+
+    pa = _import_pyarrow()
+    with activate(config.profiler):
+        shards = discover_config_shards(config)
+        metadata_files = list(iter_shard_files(shards, config.data_paths))
+        # fingerprints are taken before parsing so that files changing mid-load show up as stale
+        manifest = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "schema_hash": schema_hash(config.schema),
+            "files": _snapshot_fingerprints(metadata_files),
+            "columns": list(config.columns) if config.columns is not None else None,
+            "where": config.where,
+        }
+        metadata_file_paths = [file.path for file in metadata_files]
+        df = build_flattened_frame(_iter_config(config, shards=shards,
+                                                metadata_file_paths=metadata_file_paths))
+
+    # columns mixing tables and scalars (e.g. `ingredients`) have no Arrow type,
+    # they are stored as JSON
+    columns = {}
+    for name, column in df.items():
+        if column.dtype == object:
+            try:
+                pa.array(column, from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                manifest.setdefault("json_columns", []).append(name)
+                column = column.map(lambda value: None if _is_missing(value) else json.dumps(value))
+        columns[name] = column
+
+    table = pa.Table.from_pandas(pd.DataFrame(columns), preserve_index=False)
+    manifest_bytes = json.dumps(manifest).encode("utf-8")
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                           SNAPSHOT_METADATA_KEY: manifest_bytes})
+    snapshot_path = Path(snapshot_path)
+    if snapshot_path.suffix == ".parquet":
+        pa.parquet.write_table(table, snapshot_path)
+    else:
+        pa.feather.write_feather(table, snapshot_path, compression="uncompressed")
+    return df
+
+
+def _read_snapshot_schema(snapshot_path: Path):
+    pa = _import_pyarrow()
+    if Path(snapshot_path).suffix == ".parquet":
+        return pa.parquet.read_schema(snapshot_path)
+    return pa.ipc.open_file(pa.memory_map(str(snapshot_path))).schema
+
+
+def read_snapshot_manifest(snapshot_path: Path) -> Dict[str, Any]:
+    """Reads the schema hash and source file fingerprints of a snapshot without loading its data.
+
+    Args:
+        snapshot_path (Path): path to the snapshot
+
+    Returns:
+        Dict[str, Any]: the snapshot manifest
+    """
+    metadata = _read_snapshot_schema(snapshot_path).metadata or {}
+    if SNAPSHOT_METADATA_KEY not in metadata:
+        raise ValueError(f"{snapshot_path} is not an mdframe snapshot")
+    return json.loads(metadata[SNAPSHOT_METADATA_KEY])
+
+
+def load_snapshot(snapshot_path: Path, memory_map: bool = True) -> pd.DataFrame:
+    """Loads a flattened table written by `save_snapshot`.
+
+    Args:
+        snapshot_path (Path): path to the snapshot
+        memory_map (bool): read the snapshot through a memory map instead of buffered reads;
+            the columns are still converted into (and copied to) pandas memory
+
+    Returns:
+        pd.DataFrame: the flattened table; its manifest is available under `df.attrs["mdframe"]`
+    """
+    import pandas as pd
+
+    pa = _import_pyarrow()
+    if Path(snapshot_path).suffix == ".parquet":
+        table = pa.parquet.read_table(snapshot_path, memory_map=memory_map)
+    else:
+        source = pa.memory_map(str(snapshot_path)) if memory_map else pa.OSFile(str(snapshot_path))
+        table = pa.ipc.open_file(source).read_all()
+
+    metadata = table.schema.metadata or {}
+    if SNAPSHOT_METADATA_KEY not in metadata:
+        raise ValueError(f"{snapshot_path} is not an mdframe snapshot")
+    manifest = json.loads(metadata[SNAPSHOT_METADATA_KEY])
+    # one block per column, so pandas doesn't consolidate (and copy) the columns once more
+    df = table.to_pandas(split_blocks=True)
+    for name, column in zip(table.column_names, table.columns):
+        if pa.types.is_list(column.type):
+            # Arrow hands lists back as NumPy arrays, keep them as lists like the reader does
+            df[name] = pd.Series([_drop_nulls(value) if value is not None else float("nan")
+                                  for value in column.to_pylist()], dtype=object)
+    for name in manifest.get("json_columns", []):
+        df[name] = df[name].map(lambda value: json.loads(value) if isinstance(value, str)
+                                else float("nan")).astype(object)
+    df.attrs["mdframe"] = manifest
+    return df
+
+
+def is_snapshot_stale(snapshot_path: Path, config: Config) -> bool:
+    """Checks whether a snapshot is out of date with respect to the schema and the metadata files.
+
+    Args:
+        snapshot_path (Path): path to the snapshot
+        config (Config): reader configuration the snapshot was created from
+
+    Returns:
+        bool: True if the schema, `columns` or `where` changed or any metadata file was added,
+        removed or modified
+    """
+    manifest = read_snapshot_manifest(snapshot_path)
+    if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        return True
+    if manifest["schema_hash"] != schema_hash(config.schema):
+        return True
+    columns = list(config.columns) if config.columns is not None else None
+    if (manifest.get("columns"), manifest.get("where")) != (columns, config.where):
+        return True
+    return manifest["files"] != _snapshot_fingerprints(discover_metadata_files(config))
+
 
 def get_appropriate_schema(schema_data: str):
     # parse schema url to determine whether Url or Path passed
-    parsed_schema = urlparse(schema_data)
-
-    if len(parsed_schema.scheme) == 0 or (parsed_schema.scheme not in ['http', 'https']):
+    if _is_url(schema_data):
         return schema_data
     elif Path(schema_data).exists():
         return Path(schema_data)
 
-    raise ValueError(f"Specified schema location {parsed_schema} is neither a URL nor Path")
+    raise ValueError(f"Specified schema location {schema_data} is neither a URL nor Path")
 
 
-def main():
+def watch(config: Config, interval: float = 1.0):
+    """Prints the live table of `config`'s data directory, then every change until interrupted.
+
+    Args:
+        config (Config): reader configuration
+        interval (float): polling interval in seconds
+    """
+    import pandas as pd
+    # imported here, `mdframe.watch` builds on this module
+    from mdframe.watch import LiveTable
+
+    def report(table, changes):
+        aggregates = table.aggregates
+        print(f"[{datetime.now():%H:%M:%S}]"
+              f" +{len(changes.added)} ~{len(changes.modified)} -{len(changes.removed)}"
+              f" | records: {aggregates.count}, food types: {len(aggregates.food_types)},"
+              f" capture time: {pd.Timedelta(seconds=round(aggregates.total_time))}", flush=True)
+        for name, error in changes.errors.items():
+            print(f"  {name}: {error}", flush=True)
+
+    table = LiveTable(config)
+    report(table, table.refresh())
+    print(table.to_dataframe(), flush=True)
+    try:
+        table.watch(report, interval)
+    except KeyboardInterrupt:
+        pass
+
+
+def verify(config: Config, threads: int = 32) -> bool:
+    """Prints the metadata files whose assets are missing or empty, one line per file.
+
+    Args:
+        config (Config): reader configuration
+        threads (int): number of threads checking the assets
+
+    Returns:
+        bool: True if all assets were found
+    """
+    # imported here, `mdframe.verify` builds on this module
+    from mdframe.verify import format_report, verify_assets
+
+    reports = verify_assets(config, threads)
+    failed = [report for report in reports if not report.ok]
+    for report in failed:
+        print(format_report(report))
+    missing = sum(len(report.missing) for report in reports)
+    empty = sum(len(report.empty) for report in reports)
+    print(f"Checked {sum(report.assets for report in reports)} assets of {len(reports)} records:"
+          f" {missing} missing, {empty} empty, {len(failed)} records with problems")
+    return not failed
+
+
+def validate(config: Config, workers: int | None = None, report_path: Path | None = None) -> bool:
+    """Prints every problem of every metadata file, see `mdframe.diagnostics`.
+
+    Args:
+        config (Config): reader configuration
+        workers (int | None): number of worker processes, one per CPU if not given
+        report_path (Path | None): also write the report as JSON to this path
+
+    Returns:
+        bool: True if all metadata files are valid
+    """
+    # imported here, `mdframe.diagnostics` builds on this module
+    from mdframe.diagnostics import validate_archive
+
+    report = validate_archive(config, workers)
+    report.print()
+    if report_path is not None:
+        report.save(report_path)
+    return report.ok
+
+
+def search(config: Config, text: str, limit: int = 20):
+    """Prints the records best matching `text` in their free-text fields, see `mdframe.search`.
+
+    The full-text index is kept in the user cache directory and updated with the changed
+    files first.
+
+    Args:
+        config (Config): reader configuration
+        text (str): the words to search for
+        limit (int): maximum number of records printed
+    """
+    # imported here, `mdframe.search` builds on this module
+    from mdframe.search import TextIndex
+
+    hits = TextIndex.open(config).search(text)
+    for hit in hits[:limit]:
+        print(f"{hit.score:8.3f}  gid {hit.gid}  {hit.key}  ({', '.join(hit.fields)})")
+    print(f"{len(hits)} records found")
+
+
+def _cmd_run(args: argparse.Namespace, config: Config):
+    if args.watch:
+        watch(config, args.interval)
+    else:
+        dfs = run(config)
+        print(dfs)
+
+
+def _cmd_snapshot(args: argparse.Namespace, config: Config):
+    df = save_snapshot(config, Path(args.output))
+    print(f"Wrote {len(df)} records to {args.output}")
+
+
+def _cmd_verify(args: argparse.Namespace, config: Config):
+    if not verify(config, args.threads):
+        sys.exit(1)
+
+
+def _cmd_validate(args: argparse.Namespace, config: Config):
+    output = Path(args.output) if args.output is not None else None
+    if not validate(config, config.workers, output):
+        sys.exit(1)
+
+
+def _cmd_search(args: argparse.Namespace, config: Config):
+    search(config, args.text, args.limit)
+
+
+def _cmd_serve(args: argparse.Namespace, config: Config):
+    # imported here, `mdframe.server` builds on this module
+    from mdframe.server import serve
+    serve(config, args.host, args.port, args.threads, args.interval)
+
+
+def _build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser('mdframe', 'Prints metadatafiles in a neat dataframe')
     parser.add_argument('-d', '--directory',
                         type=str,
-                        help="Path to the directory containing the data and the metadata",
-                        default=Path(__file__).parent / "data")
+                        nargs='+',
+                        help="Path to the directory containing the data and the metadata;"
+                             " several directories are loaded as one archive ordered by gid",
+                        default=[Path(__file__).parent / "data"])
+    parser.add_argument('-r', '--recursive',
+                        action='store_true',
+                        help="Also load the metadata files in all subdirectories")
     parser.add_argument('-m', '--metadata-ext',
                         help="Extension of the metadata files",
                         choices=SUPPORTED_METADATA_FILE_EXTENSIONS,
@@ -154,20 +1167,139 @@ def main():
                         type=str,
                         help="URL or Path to the schema file for validating the metadata",
                         default=Path(__file__).parent / "schema.json")
-    args = parser.parse_args()
+    parser.add_argument('-j', '--jobs',
+                        type=int,
+                        help="Number of worker processes used to parse and validate the metadata"
+                             " (0 uses all CPUs)",
+                        default=1)
+    parser.add_argument('-c', '--cache-dir',
+                        type=str,
+                        help="Directory for caching parsed metadata files between runs",
+                        default=None)
+    parser.add_argument('--columns',
+                        type=str,
+                        nargs='+',
+                        help="Fields (e.g. weight) or sections (e.g. time) to keep, all by default",
+                        default=None)
+    parser.add_argument('--where',
+                        type=str,
+                        help="Query the records must match,"
+                             " e.g. 'quality >= 2 and food_type == \"apple\"'",
+                        default=None)
+    parser.add_argument('--on-error',
+                        help="What to do with metadata files failing to load: abort, skip them,"
+                             " or skip them and list their problems",
+                        choices=SUPPORTED_ON_ERROR_MODES,
+                        default="raise")
+    parser.add_argument('--validation',
+                        help="Validation mode: full JSON schema validation,"
+                             " fast required-key and type checks, or none",
+                        choices=SUPPORTED_VALIDATION_MODES,
+                        default="full")
+    parser.add_argument('-w', '--watch',
+                        action='store_true',
+                        help="Load the metadata once, then keep following changes to the directory")
+    parser.add_argument('--interval',
+                        type=float,
+                        help="Polling interval in seconds for --watch and serve",
+                        default=1.0)
+    parser.add_argument('--profile',
+                        action='store_true',
+                        help="Print how long each stage of the load took, with the slowest files")
+    parser.add_argument('--profile-report',
+                        type=str,
+                        help="Write the profile as JSON to this path (implies --profile)",
+                        default=None)
+    parser.set_defaults(func=_cmd_run)
+    subparsers = parser.add_subparsers(dest="command")
+
+    snapshot_parser = subparsers.add_parser(
+        'snapshot',
+        help="Writes the flattened metadata table to a binary snapshot")
+    snapshot_parser.add_argument('output',
+                                 type=str,
+                                 help="Path of the snapshot; `.parquet` files are written"
+                                      " as Parquet, anything else as Feather")
+    snapshot_parser.set_defaults(func=_cmd_snapshot)
+
+    verify_parser = subparsers.add_parser(
+        'verify',
+        help="Checks that the assets referenced by the metadata exist and aren't empty")
+    verify_parser.add_argument('-t', '--threads',
+                               type=int,
+                               help="Number of threads checking the assets",
+                               default=32)
+    verify_parser.set_defaults(func=_cmd_verify)
+
+    serve_parser = subparsers.add_parser(
+        'serve',
+        help="Keeps the metadata in memory and answers JSON queries over HTTP,"
+             " reloading changed files every --interval seconds")
+    serve_parser.add_argument('--host',
+                              type=str,
+                              help="Interface to listen on",
+                              default="127.0.0.1")
+    serve_parser.add_argument('-p', '--port',
+                              type=int,
+                              help="Port to listen on",
+                              default=8765)
+    serve_parser.add_argument('-t', '--threads',
+                              type=int,
+                              help="Number of requests handled concurrently",
+                              default=8)
+    serve_parser.set_defaults(func=_cmd_serve)
+
+    validate_parser = subparsers.add_parser(
+        'validate',
+        help="Checks every metadata file and reports all decode and schema errors,"
+             " with file, JSON path and line, in --jobs processes")
+    validate_parser.add_argument('-o', '--output',
+                                 type=str,
+                                 help="Also write the report as JSON to this path",
+                                 default=None)
+    validate_parser.set_defaults(func=_cmd_validate)
+
+    search_parser = subparsers.add_parser(
+        'search',
+        help="Searches descriptions, quality comments and QA comments, best matches first")
+    search_parser.add_argument('text',
+                               type=str,
+                               help="Words to search for;"
+                                    " words also match as prefixes, e.g. 'poro'")
+    search_parser.add_argument('-n', '--limit',
+                               type=int,
+                               help="Maximum number of records printed",
+                               default=20)
+    search_parser.set_defaults(func=_cmd_search)
+    return parser
+
+
+def main():
+    args = _build_parser().parse_args()
 
     schema = args.schema
     if args.schema != Path(__file__).parent / "schema.json":
         schema = get_appropriate_schema(args.schema)
     
     config = Config(
-        data_path=Path(args.directory),
+        data_path=[Path(directory) for directory in args.directory],
+        recursive=args.recursive,
+        columns=args.columns,
+        where=args.where,
         metadata_file_extension=args.metadata_ext,
         schema_loc=schema,
+        workers=args.jobs if args.jobs > 0 else None,
+        cache_dir=Path(args.cache_dir) if args.cache_dir is not None else None,
+        validation=args.validation,
+        on_error=args.on_error,
+        profile=args.profile or args.profile_report is not None,
     )
-    dfs = run(config)
-    print(dfs)
+    args.func(args, config)
 
+    if config.profile:
+        config.profiler.print()
+        if args.profile_report is not None:
+            config.profiler.save(Path(args.profile_report))
 
 if __name__ == "__main__":
     main()
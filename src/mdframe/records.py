@@ -0,0 +1,343 @@
+"""Compact metadata records generated from the JSON schema.
+
+A `pd.Series` per metadata file costs several kilobytes of index and object-dtype
+overhead for about twenty scalar fields. `record_class` generates a class from the
+schema instead: every property of the schema gets a `__slots__` attribute, named by its
+flattened name (e.g. `weight` for `metrics.weight`), so a record is little more than one
+pointer per field. The `qa` entries are stored as tuples of values, with the tuple of
+keys shared by all entries with the same keys, and properties missing from the schema
+are kept in a small dictionary.
+
+Records convert back to the nested dictionaries read from the metadata files with
+`to_dict`, and a list of records converts to the flattened table of
+`analysis.load_flattened_data` with `records_to_dataframe`, column by column.
+"""
+
+import keyword
+import sys
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# (section, name) of every slot, section is None for top-level properties
+FieldSpec = Tuple[Tuple[Optional[str], str], ...]
+# keys and values of a single `qa` entry
+QaEntry = Tuple[Tuple[str, ...], Tuple[Any, ...]]
+
+QA_FIELD = "qa"
+# short strings such as food types, units and times repeat across records, they are interned
+INTERN_MAX_LENGTH = 64
+
+_JSON_TYPES = {"integer": int, "number": float, "string": str, "boolean": bool, "array": list, "object": dict}
+
+
+class MetadataRecord:
+    """Base class of the record classes generated by `record_class`.
+
+    Missing properties are stored as `None`, which TOML can't express. Properties are
+    read as attributes or by their flattened names, like the columns of
+    `analysis.load_flattened_data`: `record.weight`, `record["weight"]`.
+    """
+    __slots__ = ("_qa", "_extra")
+    _fields: FieldSpec = ()
+    _slots: Tuple[str, ...] = ()
+    # keys of `qa` entries, shared by all records of the class
+    _qa_keys: Dict[Tuple[str, ...], Tuple[str, ...]]
+
+    @classmethod
+    def from_dict(cls, record: Dict[str, Any]) -> "MetadataRecord":
+        """Builds a record from the contents of a metadata file."""
+        self = cls.__new__(cls)
+        slots = cls._slot_index
+        values = [None] * len(cls._slots)
+        extra = None
+        qa = None
+        for property_name, value in record.items():
+            if property_name == QA_FIELD and isinstance(value, list) and all(isinstance(entry, dict) for entry in value):
+                qa = tuple(self._compact_qa_entry(entry) for entry in value)
+            elif isinstance(value, dict) and property_name in cls._sections:
+                for subproperty, subvalue in value.items():
+                    index = slots.get((property_name, subproperty))
+                    if index is None:
+                        extra = extra or {}
+                        extra[(property_name, subproperty)] = subvalue
+                    else:
+                        values[index] = _intern(subvalue)
+            else:
+                index = slots.get((None, property_name))
+                if index is None:
+                    extra = extra or {}
+                    extra[(None, property_name)] = value
+                else:
+                    values[index] = _intern(value)
+        for name, value in zip(cls._slots, values):
+            setattr(self, name, value)
+        self._qa = qa
+        self._extra = extra
+        return self
+
+    @classmethod
+    def _compact_qa_entry(cls, entry: Dict[str, Any]) -> QaEntry:
+        keys = tuple(entry)
+        return cls._qa_keys.setdefault(keys, keys), tuple(_intern(value) for value in entry.values())
+
+    @property
+    def qa(self) -> Optional[List[Dict[str, Any]]]:
+        """The `qa` entries as dictionaries, `None` if the record has none."""
+        if self._qa is None:
+            return None
+        return [dict(zip(keys, values)) for keys, values in self._qa]
+
+    @property
+    def qa_tuples(self) -> Tuple[QaEntry, ...]:
+        """The `qa` entries as stored, `(keys, values)` tuples."""
+        return self._qa or ()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the record as the nested dictionary it was built from.
+
+        Properties are ordered as in the schema, followed by the properties missing from it.
+        """
+        record: Dict[str, Any] = {}
+        for (section, name), slot in zip(self._fields, self._slots):
+            value = getattr(self, slot)
+            if value is None:
+                continue
+            if section is None:
+                record[name] = value
+            else:
+                record.setdefault(section, {})[name] = value
+        for (section, name), value in (self._extra or {}).items():
+            if section is None:
+                record[name] = value
+            else:
+                record.setdefault(section, {})[name] = value
+        if self._qa is not None:
+            record[QA_FIELD] = self.qa
+        return record
+
+    def to_series(self) -> "pd.Series":
+        """Returns the record as the `pd.Series` produced by `reader.run`."""
+        import pandas as pd
+        return pd.Series(self.to_dict())
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """Looks up a property by its flattened name, see `analysis.flatten_property_dict`."""
+        if name == QA_FIELD:
+            return self.qa if self._qa is not None else default
+        value = None
+        if self._extra:
+            # properties missing from the schema may shadow the ones defined by it
+            for (_, extra_name), extra_value in self._extra.items():
+                if extra_name == name:
+                    value = extra_value
+        if value is None and name in self._slot_names:
+            value = getattr(self, name)
+        return default if value is None else value
+
+    def __getitem__(self, name: str) -> Any:
+        value = self.get(name, _MISSING)
+        if value is _MISSING:
+            raise KeyError(name)
+        return value
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name, _MISSING) is not _MISSING
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, MetadataRecord):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{slot}={getattr(self, slot)!r}" for slot in self._slots[:4])
+        return f"{type(self).__name__}({fields}, ...)"
+
+    def __reduce__(self):
+        # generated classes can't be looked up by name, they are rebuilt from their fields
+        state = (tuple(getattr(self, slot) for slot in self._slots), self._qa, self._extra)
+        return _restore_record, (type(self).__name__, self._fields, state)
+
+
+_MISSING = object()
+
+
+def lookup_flattened(record: Dict[str, Any], property_name: str, default: Any = None) -> Any:
+    """Looks up a property by its flattened name, e.g. `weight` for `record["metrics"]["weight"]`.
+
+    Follows `analysis.flatten_property_dict`: properties are looked up at the top level
+    and one table deep, and the last occurrence wins.
+    """
+    for name, value in reversed(record.items()):
+        if isinstance(value, dict):
+            if property_name in value:
+                return value[property_name]
+        elif name == property_name:
+            return value
+    return default
+
+
+def flattened_row(record: Dict[str, Any], property_names: Iterable[str]) -> Dict[str, Any]:
+    """Looks up the flattened properties of a record which a query refers to.
+
+    Properties missing from the record are left out, so queries see them as missing values.
+    """
+    row = {}
+    for name in property_names:
+        value = lookup_flattened(record, name, _MISSING)
+        if value is not _MISSING:
+            row[name] = value
+    return row
+
+
+def _intern(value: Any) -> Any:
+    if type(value) is str and len(value) <= INTERN_MAX_LENGTH:
+        return sys.intern(value)
+    if type(value) is list:
+        return [_intern(item) for item in value]
+    return value
+
+
+_record_classes: Dict[Tuple[str, FieldSpec], type] = {}
+
+
+def schema_fields(schema: Dict) -> FieldSpec:
+    """Lists the properties of a metadata schema as `(section, name)` pairs.
+
+    Properties of nested objects, such as `metrics.weight`, are listed with their section,
+    all others with a section of `None`. A top-level `qa` property is left out, `qa`
+    entries are always stored as tuples.
+    """
+    fields = []
+    for property_name, definition in schema.get("properties", {}).items():
+        if property_name == QA_FIELD:
+            continue
+        if isinstance(definition, dict) and definition.get("type") == "object" and "properties" in definition:
+            fields.extend((property_name, subproperty) for subproperty in definition["properties"])
+        else:
+            fields.append((None, property_name))
+    return tuple(fields)
+
+
+def _field_types(schema: Dict) -> Dict[str, type]:
+    types = {}
+    for section, name in schema_fields(schema):
+        properties = schema["properties"] if section is None else schema["properties"][section]["properties"]
+        json_type = properties[name].get("type") if isinstance(properties[name], dict) else None
+        types[name] = _JSON_TYPES.get(json_type, Any) if isinstance(json_type, str) else Any
+    return types
+
+
+def record_class_from_fields(name: str, fields: FieldSpec) -> type:
+    """Generates (or returns the already generated) record class with the given fields.
+
+    Raises:
+        ValueError: if two fields share a flattened name or a name isn't a valid identifier
+    """
+    key = (name, fields)
+    if key in _record_classes:
+        return _record_classes[key]
+
+    slots = tuple(field_name for _, field_name in fields)
+    for slot in slots:
+        if not slot.isidentifier() or keyword.iskeyword(slot) or hasattr(MetadataRecord, slot):
+            raise ValueError(f"Schema property {slot} can't be used as a record attribute")
+    if len(set(slots)) != len(slots):
+        duplicates = sorted({slot for slot in slots if slots.count(slot) > 1})
+        raise ValueError(f"Schema properties {duplicates} appear in several sections, records need unique flattened names")
+
+    namespace = {
+        "__slots__": slots,
+        "_fields": fields,
+        "_slots": slots,
+        "_slot_names": frozenset(slots),
+        "_slot_index": {field: index for index, field in enumerate(fields)},
+        "_sections": frozenset(section for section, _ in fields if section is not None),
+        "_qa_keys": {},
+        "__module__": __name__,
+    }
+    cls = type(name, (MetadataRecord,), namespace)
+    _record_classes[key] = cls
+    return cls
+
+
+def record_class(schema: Dict, name: str = "MetadataRecord") -> type:
+    """Generates the record class of a metadata schema, see `schema_fields`.
+
+    Args:
+        schema (Dict): JSON schema of the metadata files
+        name (str): name of the generated class
+
+    Returns:
+        type: a `MetadataRecord` subclass with one slot per schema property; its
+        `__annotations__` hold the types declared by the schema
+    """
+    cls = record_class_from_fields(name, schema_fields(schema))
+    cls.__annotations__ = _field_types(schema)
+    return cls
+
+
+def _restore_record(name: str, fields: FieldSpec, state: Tuple) -> MetadataRecord:
+    cls = record_class_from_fields(name, fields)
+    values, qa, extra = state
+    self = cls.__new__(cls)
+    for slot, value in zip(cls._slots, values):
+        setattr(self, slot, value)
+    if qa is not None:
+        qa = tuple((cls._qa_keys.setdefault(keys, keys), entry_values) for keys, entry_values in qa)
+    self._qa = qa
+    self._extra = extra
+    return self
+
+
+def to_records(records: Iterable[Dict[str, Any]], schema: Dict) -> Iterator[MetadataRecord]:
+    """Converts the contents of metadata files to records of the class generated from `schema`."""
+    from_dict = record_class(schema).from_dict
+    for record in records:
+        yield from_dict(record)
+
+
+def records_to_dataframe(records: Sequence[MetadataRecord]) -> "pd.DataFrame":
+    """Builds the flattened table of `analysis.load_flattened_data` out of records.
+
+    Schema properties are copied column by column; only the properties missing from the
+    schema and the `qa` entries are flattened record by record.
+
+    Args:
+        records (Sequence[MetadataRecord]): records of a single record class
+
+    Returns:
+        pd.DataFrame: one row per record, schema properties first, then the others in
+        order of first appearance, then `qa`
+    """
+    from mdframe.columnar import MISSING, frame_from_columns
+
+    records = list(records)
+    if not records:
+        return frame_from_columns({}, 0)
+    classes = {type(record) for record in records}
+    if len(classes) > 1:
+        raise ValueError("Records of different record classes can't be put into one table")
+    cls = classes.pop()
+
+    columns: Dict[str, List[Any]] = {}
+    for slot in cls._slots:
+        column = [getattr(record, slot) for record in records]
+        if any(value is not None for value in column):
+            columns[slot] = [MISSING if value is None else value for value in column]
+
+    if any(record._extra for record in records):
+        for row, record in enumerate(records):
+            for (_, name), value in (record._extra or {}).items():
+                column = columns.get(name)
+                if column is None:
+                    column = columns[name] = [MISSING] * len(records)
+                # properties missing from the schema win, like the last occurrence when flattening
+                column[row] = value
+    if any(record._qa is not None for record in records):
+        columns[QA_FIELD] = [MISSING if record._qa is None else record.qa for record in records]
+    return frame_from_columns(columns, len(records))
+
@@ -0,0 +1,148 @@
+"""Fetching and caching of JSON schemas served over HTTP(S).
+
+All fetches share one pooled `urllib3` client with timeouts and retries. Fetched schemas
+are kept in memory for the lifetime of the process and, unless disabled, in an on-disk
+cache. Within `ttl` seconds a cached schema is used without any request; after that it
+is revalidated with `If-None-Match` / `If-Modified-Since`. If the server can't be reached,
+the last good copy is used instead. `urllib3` is imported only when a schema is fetched.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+import warnings
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+if TYPE_CHECKING:
+    import urllib3
+
+DEFAULT_SCHEMA_CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "mdframe" / "schemas"
+DEFAULT_SCHEMA_TTL = 60.0 * 60.0
+# seconds
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 15.0
+DEFAULT_RETRIES = 3
+
+_http_pool: Optional[urllib3.PoolManager] = None
+_lock = threading.Lock()
+# URL -> cache entry, shared by every `Config` of the process
+_memory_cache: Dict[str, Dict[str, Any]] = {}
+
+
+def get_http_pool() -> urllib3.PoolManager:
+    """Returns the process-wide connection pool used for fetching schemas."""
+    global _http_pool
+    with _lock:
+        if _http_pool is None:
+            import urllib3
+            _http_pool = urllib3.PoolManager(
+                timeout=urllib3.Timeout(connect=DEFAULT_CONNECT_TIMEOUT, read=DEFAULT_READ_TIMEOUT),
+                retries=urllib3.Retry(total=DEFAULT_RETRIES, backoff_factor=0.5,
+                                      status_forcelist=(429, 500, 502, 503, 504)))
+        return _http_pool
+
+
+def clear_memory_cache():
+    """Forgets the schemas cached in memory, the on-disk cache is left untouched."""
+    with _lock:
+        _memory_cache.clear()
+
+
+def _cache_file(cache_dir: Path, url: str) -> Path:
+    return Path(cache_dir) / f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json"
+
+
+def _read_entry(url: str, cache_dir: Optional[Path]) -> Optional[Dict[str, Any]]:
+    with _lock:
+        entry = _memory_cache.get(url)
+    if entry is not None or cache_dir is None:
+        return entry
+    try:
+        with open(_cache_file(cache_dir, url), "r") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return entry if entry.get("url") == url else None
+
+
+def _write_entry(url: str, entry: Dict[str, Any], cache_dir: Optional[Path]):
+    with _lock:
+        _memory_cache[url] = entry
+    if cache_dir is None:
+        return
+    try:
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+        cache_file = _cache_file(cache_dir, url)
+        tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_file, cache_file)
+    except OSError as os_error:
+        warnings.warn(f"Could not write schema cache for {url}: {os_error}")
+
+
+def fetch_schema(url: str,
+                 cache_dir: Optional[Path] = DEFAULT_SCHEMA_CACHE_DIR,
+                 ttl: float = DEFAULT_SCHEMA_TTL,
+                 pool: Optional[urllib3.PoolManager] = None) -> Dict:
+    """Fetches a JSON schema from `url`, using the cached copy whenever possible.
+
+    Args:
+        url (str): URL of the schema
+        cache_dir (Optional[Path]): directory of the on-disk cache, `None` keeps the cache in memory only
+        ttl (float): number of seconds a cached schema is used without revalidation
+        pool (Optional[urllib3.PoolManager]): client to use instead of the shared pool
+
+    Returns:
+        Dict: the schema
+
+    Raises:
+        HTTPError: if the schema can't be fetched and no cached copy exists
+    """
+    from urllib3.exceptions import HTTPError
+
+    entry = _read_entry(url, cache_dir)
+    now = time.time()
+    if entry is not None and now - entry["fetched_at"] < ttl:
+        return entry["schema"]
+
+    headers = {}
+    if entry is not None:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    try:
+        response = (pool or get_http_pool()).request('GET', url, headers=headers)
+    except HTTPError as http_error:
+        if entry is None:
+            raise HTTPError(f"Failed to fetch schema from URL {url}: {http_error}") from http_error
+        warnings.warn(f"Failed to fetch schema from URL {url}, using the copy cached at "
+                      f"{time.ctime(entry['fetched_at'])}: {http_error}")
+        return entry["schema"]
+
+    if response.status == 304 and entry is not None:
+        entry = {**entry, "fetched_at": now}
+    elif response.status == 200:
+        entry = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": now,
+            "schema": json.loads(response.data.decode('utf-8')),
+        }
+    elif entry is not None:
+        warnings.warn(f"Failed to fetch schema from URL {url} (HTTP {response.status}), "
+                      f"using the copy cached at {time.ctime(entry['fetched_at'])}")
+        return entry["schema"]
+    else:
+        raise HTTPError(f"Failed to fetch schema from URL {url}")
+
+    _write_entry(url, entry, cache_dir)
+    return entry["schema"]
@@ -0,0 +1,185 @@
+"""Full-text search over the free-text fields of metadata records.
+
+`TextIndex` tokenizes `item.description`, `model.quality_comments` and the `comments` of
+every `qa` entry into an inverted index from terms to the metadata files containing them.
+Searches rank the matching records with BM25, weighting matches in each field by a boost,
+and match the terms of the query as prefixes, so that `poro` finds `porous`. Like
+`index.ListIndex`, the index is keyed by metadata file, persisted in the user's cache
+directory and refreshed incrementally.
+"""
+
+import math
+import re
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+from mdframe.cache import Fingerprint
+from mdframe.index import FileIndex
+from mdframe.records import lookup_flattened
+
+DEFAULT_TEXT_INDEX_FILE_NAME = ".mdframe-text-index.pickle"
+# fields are named like flattened columns, `section.name` refers to `name` in every entry of a list of tables
+DEFAULT_FIELD_BOOSTS: Dict[str, float] = {"description": 2.0, "quality_comments": 1.5, "qa.comments": 1.0}
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# weight of a term which only matches as a prefix, relative to an exact match
+PREFIX_WEIGHT = 0.5
+
+_TOKEN_REGEX = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Splits `text` into case-folded words, e.g. `["unable", "to", "merge"]`."""
+    return _TOKEN_REGEX.findall(text.casefold())
+
+
+def field_text(record: Dict[str, Any], field: str) -> str:
+    """Returns the text of a field of a record, empty if it has none.
+
+    Args:
+        record (Dict[str, Any]): contents of a metadata file
+        field (str): flattened field name (e.g. `description`), or `section.name` for a
+            field of a list of tables (e.g. `qa.comments`)
+    """
+    section, _, name = field.rpartition(".")
+    if not section:
+        value = lookup_flattened(record, name)
+        return value if isinstance(value, str) else ""
+    value = record.get(section)
+    entries = value if isinstance(value, list) else [value]
+    return "\n".join(entry[name] for entry in entries if isinstance(entry, dict) and isinstance(entry.get(name), str))
+
+
+class SearchHit(NamedTuple):
+    key: str
+    gid: Any
+    score: float
+    # fields in which any term of the query was found
+    fields: Tuple[str, ...]
+
+
+class TextIndex(FileIndex):
+    """Inverted index from the terms of free-text fields to the metadata files containing them.
+
+    Args:
+        fields (Optional[Iterable[str]]): fields to index, see `field_text`; the fields of
+            `DEFAULT_FIELD_BOOSTS` if not given
+    """
+
+    default_file_name = DEFAULT_TEXT_INDEX_FILE_NAME
+
+    def __init__(self, fields: Optional[Iterable[str]] = None):
+        super().__init__(fields if fields is not None else DEFAULT_FIELD_BOOSTS)
+        # field -> term -> key of a metadata file containing the term -> number of occurrences
+        self._postings: Dict[str, Dict[str, Dict[str, int]]] = {}
+        # metadata file key -> (fingerprint, gid, number of terms and distinct terms per field)
+        self._files: Dict[str, Tuple[Optional[Fingerprint], Any, Dict[str, Tuple[int, Tuple[str, ...]]]]] = {}
+        # sorted terms and average length of every field, rebuilt after a change
+        self._vocabularies: Dict[str, List[str]] = {}
+        self._average_lengths: Optional[Dict[str, float]] = None
+
+    def add(self, key: str, record: Dict[str, Any], fingerprint: Optional[Fingerprint] = None):
+        """Indexes a record, replacing any previous record stored under `key`."""
+        self.remove(key)
+        terms_per_field = {}
+        for field in self.fields:
+            terms = tokenize(field_text(record, field))
+            if not terms:
+                continue
+            counts = Counter(terms)
+            terms_per_field[field] = (len(terms), tuple(counts))
+            postings = self._postings.setdefault(field, {})
+            for term, count in counts.items():
+                postings.setdefault(term, {})[key] = count
+        self._files[key] = (fingerprint, record.get("gid"), terms_per_field)
+        self._changed()
+
+    def remove(self, key: str):
+        entry = self._files.pop(key, None)
+        if entry is None:
+            return
+        for field, (_, terms) in entry[2].items():
+            postings = self._postings[field]
+            for term in terms:
+                keys = postings[term]
+                del keys[key]
+                if not keys:
+                    del postings[term]
+        self._changed()
+
+    def _changed(self):
+        self._dirty = True
+        self._vocabularies = {}
+        self._average_lengths = None
+
+    def _expand(self, field: str, term: str, prefix: bool) -> List[Tuple[str, float]]:
+        """Lists the indexed terms of `field` matching `term`, with the weight of the match."""
+        postings = self._postings.get(field, {})
+        if not prefix:
+            return [(term, 1.0)] if term in postings else []
+        vocabulary = self._vocabularies.get(field)
+        if vocabulary is None:
+            vocabulary = self._vocabularies[field] = sorted(postings)
+        matches = []
+        for candidate in vocabulary[bisect_left(vocabulary, term):]:
+            if not candidate.startswith(term):
+                break
+            matches.append((candidate, 1.0 if candidate == term else PREFIX_WEIGHT))
+        return matches
+
+    def search(self,
+               text: str,
+               boosts: Optional[Mapping[str, float]] = None,
+               prefix: bool = True,
+               limit: Optional[int] = None) -> List[SearchHit]:
+        """Finds the records containing every term of `text`, best matches first.
+
+        Args:
+            text (str): the words to search for, e.g. `unable to merge`
+            boosts (Optional[Mapping[str, float]]): weight of matches in each field; fields
+                missing from `boosts` aren't searched. `DEFAULT_FIELD_BOOSTS` if not given
+            prefix (bool): also match indexed terms starting with a term of `text`
+            limit (Optional[int]): maximum number of hits
+
+        Returns:
+            List[SearchHit]: the matching records, ordered by descending score and then by key
+        """
+        boosts = {field: boost for field, boost in (boosts or DEFAULT_FIELD_BOOSTS).items() if field in self.fields}
+        terms = list(dict.fromkeys(tokenize(text)))
+        if not terms or not self._files:
+            return []
+        if self._average_lengths is None:
+            totals = {}
+            for _, _, terms_per_field in self._files.values():
+                for field, (length, _) in terms_per_field.items():
+                    totals[field] = totals.get(field, 0) + length
+            self._average_lengths = {field: total / len(self._files) for field, total in totals.items()}
+
+        scores: Optional[Dict[str, float]] = None
+        matched_fields: Dict[str, set] = {}
+        for term in terms:
+            term_scores: Dict[str, float] = {}
+            for field, boost in boosts.items():
+                postings = self._postings.get(field, {})
+                average_length = self._average_lengths.get(field, 0.0)
+                for match, weight in self._expand(field, term, prefix):
+                    keys = postings[match]
+                    idf = math.log(1 + (len(self._files) - len(keys) + 0.5) / (len(keys) + 0.5))
+                    for key, count in keys.items():
+                        length = self._files[key][2][field][0]
+                        saturation = count * (K1 + 1) / (count + K1 * (1 - B + B * length / average_length))
+                        term_scores[key] = term_scores.get(key, 0.0) + boost * weight * idf * saturation
+                        matched_fields.setdefault(key, set()).add(field)
+            # every term has to match
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {key: score + term_scores[key] for key, score in scores.items() if key in term_scores}
+            if not scores:
+                return []
+
+        hits = [SearchHit(key, self._files[key][1], score, tuple(field for field in boosts if field in matched_fields[key]))
+                for key, score in scores.items()]
+        hits.sort(key=lambda hit: (-hit.score, hit.key))
+        return hits[:limit]
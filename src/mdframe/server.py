@@ -0,0 +1,381 @@
+"""Long-running local query server over an in-memory metadata table.
+
+`mdfr serve` loads the archive once into a `watch.LiveTable` and keeps the flattened
+table, `gid`/`uid` lookups, a `index.ListIndex` and a `search.TextIndex` resident, so tools query it over HTTP
+instead of reloading the archive in every process. A background thread polls the archive
+and re-parses only the changed files; every refresh which changed something publishes a
+new immutable `TableSnapshot`, so requests never see a half-updated table and never wait
+for a reload. Requests are handled by a fixed pool of threads.
+
+All endpoints answer `GET` requests with JSON; missing values are `null`:
+
+* `/status`: number of records, version and time of the last reload, files failing to load
+* `/filter?query=...&contains=...`: sorted `gid`s matching the query or containing any of
+  the `contains` items in a list field, the same as `filtering.filter_files`
+* `/records?where=...&columns=...&limit=...`: flattened records matching a query
+* `/gid/<gid>`, `/uid/<uid>`: the (nested) records with the given `gid` or `uid`
+* `/search?text=...&limit=...`: records matching free text, best first, see `search.TextIndex`
+* `/histogram?property=...&type=discrete|continuous&bins=...&where=...`: see `aggregation.aggregate`
+* `/timing?group_by=...&where=...`: see `timing.calc_timing`
+
+Queries use the language of `mdframe.query`. The server has no authentication and is
+meant to listen on the loopback interface only.
+"""
+
+import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as time_of_day
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+import numpy as np
+import pandas as pd
+from mdframe.aggregation import ContinuousAggregate, aggregate
+from mdframe.analysis import flatten_property_dict
+from mdframe.columnar import build_flattened_frame
+from mdframe.filtering import filter_records
+from mdframe.index import ListIndex
+from mdframe.query import QueryError, compile_query
+from mdframe.reader import Config
+from mdframe.search import TextIndex
+from mdframe.timing import calc_timing
+from mdframe.watch import Changes, LiveTable
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_SERVER_THREADS = 8
+DEFAULT_RELOAD_INTERVAL = 5.0
+
+
+@dataclass(frozen=True)
+class TableSnapshot:
+    """The records of the table at one point in time, with everything derived from them.
+
+    `frame` holds one row per record, in the order of `records`; `by_gid` and `by_uid`
+    map to row positions.
+    """
+    version: int
+    loaded_at: float
+    records: List[Dict[str, Any]]
+    frame: pd.DataFrame
+    by_gid: Dict[Any, List[int]]
+    by_uid: Dict[Any, List[int]]
+    errors: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, table: LiveTable, version: int, errors: Dict[str, str]) -> "TableSnapshot":
+        records = table.ordered_records()
+        by_gid, by_uid = {}, {}
+        for position, record in enumerate(records):
+            by_gid.setdefault(record.get("gid"), []).append(position)
+            by_uid.setdefault(record.get("uid"), []).append(position)
+        return cls(version, time.time(), records, build_flattened_frame(records), by_gid, by_uid, dict(errors))
+
+    def select(self, where: Optional[str]) -> List[int]:
+        """Row positions of the records matching `where`, all of them without a query."""
+        if not where:
+            return list(range(len(self.records)))
+        query = compile_query(where)
+        if not len(self.frame):
+            return []
+        missing_columns = query.columns - set(self.frame.columns)
+        frame = self.frame.assign(**{name: np.nan for name in missing_columns}) if missing_columns else self.frame
+        return np.flatnonzero(query.evaluate(frame).to_numpy()).tolist()
+
+
+class MetadataService:
+    """The resident table of a server and the queries answered from it.
+
+    Args:
+        config (Config): reader configuration of the archive
+    """
+
+    def __init__(self, config: Config):
+        self.config = config
+        self.table = LiveTable(config)
+        self.index = ListIndex()
+        self.text_index = TextIndex()
+        # guards `index` and `text_index`, which are updated in place by reloads
+        self._index_lock = threading.Lock()
+        # reloads may be triggered while the background thread polls
+        self._reload_lock = threading.Lock()
+        self._errors: Dict[str, str] = {}
+        self._version = 0
+        self.snapshot: TableSnapshot = None
+        self.reload()
+
+    def reload(self) -> Changes:
+        """Re-parses the changed files and publishes a new snapshot if anything changed."""
+        with self._reload_lock:
+            return self._reload()
+
+    def _reload(self) -> Changes:
+        changes = self.table.refresh()
+        # a valid file which broke is both removed and failing, its error must survive
+        for name in changes.added + changes.modified + changes.removed:
+            self._errors.pop(name, None)
+        self._errors.update(changes.errors)
+        if changes or self.snapshot is None:
+            with self._index_lock:
+                for name in changes.removed:
+                    self.index.remove(name)
+                    self.text_index.remove(name)
+                for name in changes.added + changes.modified:
+                    self.index.add(name, self.table.records[name])
+                    self.text_index.add(name, self.table.records[name])
+            self._version += 1
+            # a single assignment, requests keep using the snapshot they started with
+            self.snapshot = TableSnapshot.build(self.table, self._version, self._errors)
+        return changes
+
+    def status(self) -> Dict[str, Any]:
+        snapshot = self.snapshot
+        return {"records": len(snapshot.records), "version": snapshot.version,
+                "loaded_at": datetime.fromtimestamp(snapshot.loaded_at).isoformat(timespec="seconds"),
+                "errors": snapshot.errors}
+
+    def filter(self, query: str = "", contains: Tuple[str, ...] = ()) -> List[Any]:
+        """Answers like `filtering.filter_files`, see `filtering.filter_records` for the query semantics."""
+        snapshot = self.snapshot
+        gids = set()
+        if query:
+            gids.update(filter_records(snapshot.records, query))
+        if contains:
+            with self._index_lock:
+                gids.update(self.index.lookup(contains))
+        return sorted(gids, key=lambda gid: (not isinstance(gid, int), gid if isinstance(gid, int) else str(gid)))
+
+    def search(self, text: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._index_lock:
+            hits = self.text_index.search(text, limit=limit)
+        return [hit._asdict() for hit in hits]
+
+    def records(self, where: Optional[str] = None, columns: Optional[List[str]] = None,
+                limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        snapshot = self.snapshot
+        positions = snapshot.select(where)[:limit]
+        rows = [flatten_property_dict(snapshot.records[position]) for position in positions]
+        if columns:
+            rows = [{name: row[name] for name in columns if name in row} for row in rows]
+        return rows
+
+    def lookup(self, key: str, value: Any) -> List[Dict[str, Any]]:
+        snapshot = self.snapshot
+        positions = (snapshot.by_gid if key == "gid" else snapshot.by_uid).get(value, [])
+        return [snapshot.records[position] for position in positions]
+
+    def histogram(self, property_name: str, data_type: str = "discrete", bins: Any = "auto",
+                  where: Optional[str] = None) -> Dict[str, Any]:
+        snapshot = self.snapshot
+        records = (snapshot.records[position] for position in snapshot.select(where))
+        if data_type == "discrete":
+            result = aggregate(records, discrete=[property_name])[property_name]
+            return {"property": property_name, "type": data_type, "missing": result.missing,
+                    "values": [value for value, _ in result.items()],
+                    "counts": [count for _, count in result.items()]}
+        if data_type != "continuous":
+            raise ValueError(f"Unsupported histogram type {data_type}, choose discrete or continuous")
+        result: ContinuousAggregate = aggregate(records, continuous={property_name: bins})[property_name]
+        if not result.count:
+            raise ValueError(f"No numeric values of {property_name} found")
+        return {"property": property_name, "type": data_type, "edges": result.edges.tolist(),
+                "counts": result.counts.tolist(), "count": result.count, "missing": result.missing,
+                "invalid": result.invalid, "underflow": result.underflow, "overflow": result.overflow,
+                "minimum": result.minimum, "maximum": result.maximum, "mean": result.mean}
+
+    def timing(self, group_by: Optional[List[str]] = None, where: Optional[str] = None) -> Dict[str, Any]:
+        snapshot = self.snapshot
+        frame = snapshot.frame.iloc[snapshot.select(where)]
+        for name in ("started", "finished", *(group_by or [])):
+            if name not in frame.columns:
+                frame = frame.assign(**{name: np.nan})
+        summary = calc_timing(frame, group_by=group_by or None)
+        result = {"total_time": summary.total_time, "count": summary.count, "rate": summary.rate,
+                  "skipped": summary.skipped}
+        if summary.groups is not None:
+            groups = summary.groups.reset_index()
+            result["groups"] = groups.astype(object).where(groups.notna(), None).to_dict(orient="records")
+        return result
+
+
+def to_json(value: Any) -> Any:
+    """Converts a response to JSON-compatible values, with missing values as `None`."""
+    if isinstance(value, dict):
+        return {str(key): to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json(item) for item in value]
+    if isinstance(value, np.generic):
+        return to_json(value.item())
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, (datetime, date, time_of_day)):
+        return value.isoformat()
+    if value is pd.NA:
+        return None
+    return value
+
+
+def _parse_bins(text: Optional[str]) -> Any:
+    if text is None or text == "":
+        return "auto"
+    if "," in text:
+        return [float(edge) for edge in text.split(",")]
+    return int(text) if text.isdigit() else text
+
+
+def _parse_lookup_value(key: str, text: str) -> Any:
+    if key == "gid":
+        try:
+            return int(text)
+        except ValueError:
+            return text
+    return text
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """Routes `GET` requests to the `MetadataService` of the server."""
+    server: "MetadataServer"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parameters = parse_qs(url.query)
+
+        def single(name: str, default: Optional[str] = None) -> Optional[str]:
+            values = parameters.get(name)
+            return values[-1] if values else default
+
+        def multiple(name: str) -> List[str]:
+            return [item for value in parameters.get(name, []) for item in value.split(",") if item]
+
+        service = self.server.service
+        parts = [unquote(part) for part in url.path.strip("/").split("/") if part]
+        try:
+            if parts == ["status"]:
+                body = service.status()
+            elif parts == ["filter"]:
+                body = {"gids": service.filter(single("query", ""), tuple(multiple("contains")))}
+            elif parts == ["records"]:
+                limit = single("limit")
+                body = {"records": service.records(single("where"), multiple("columns") or None,
+                                                   int(limit) if limit is not None else None)}
+            elif len(parts) == 2 and parts[0] in ("gid", "uid"):
+                records = service.lookup(parts[0], _parse_lookup_value(parts[0], parts[1]))
+                if not records:
+                    return self.respond(HTTPStatus.NOT_FOUND, {"error": f"No record with {parts[0]} {parts[1]}"})
+                body = {"records": records}
+            elif parts == ["search"]:
+                limit = single("limit")
+                body = {"hits": service.search(single("text", ""), int(limit) if limit is not None else None)}
+            elif parts == ["histogram"]:
+                property_name = single("property")
+                if property_name is None:
+                    raise ValueError("Missing parameter property")
+                body = service.histogram(property_name, single("type", "discrete"), _parse_bins(single("bins")),
+                                         single("where"))
+            elif parts == ["timing"]:
+                body = service.timing(multiple("group_by") or None, single("where"))
+            else:
+                return self.respond(HTTPStatus.NOT_FOUND, {"error": f"Unknown endpoint {url.path}"})
+        except (QueryError, ValueError) as error:
+            return self.respond(HTTPStatus.BAD_REQUEST, {"error": str(error)})
+        self.respond(HTTPStatus.OK, body)
+
+    def respond(self, status: HTTPStatus, body: Dict[str, Any]):
+        payload = json.dumps(to_json(body)).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format: str, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class MetadataServer(HTTPServer):
+    """HTTP server answering requests from a pool of threads and reloading the archive in the background.
+
+    Args:
+        config (Config): reader configuration of the archive
+        host (str): interface to listen on
+        port (int): port to listen on, `0` picks a free one
+        threads (int): number of requests handled concurrently
+        interval (float): seconds between two polls of the archive
+        quiet (bool): don't log every request to stderr
+    """
+
+    def __init__(self,
+                 config: Config,
+                 host: str = DEFAULT_HOST,
+                 port: int = DEFAULT_PORT,
+                 threads: int = DEFAULT_SERVER_THREADS,
+                 interval: float = DEFAULT_RELOAD_INTERVAL,
+                 quiet: bool = False):
+        # the archive is loaded before the port is opened, so the first request is answered right away
+        self.service = MetadataService(config)
+        self.interval = interval
+        self.quiet = quiet
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="mdfr-serve")
+        self._stopped = threading.Event()
+        self._reloader = threading.Thread(target=self._reload_loop, name="mdfr-reload", daemon=True)
+        super().__init__((host, port), RequestHandler)
+
+    def _reload_loop(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.service.reload()
+            except Exception as error:
+                # e.g. the archive is unmounted for a moment, keep serving the last snapshot
+                if not self.quiet:
+                    print(f"Reloading failed: {error}", flush=True)
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._process_request_in_pool, request, client_address)
+
+    def _process_request_in_pool(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def serve_forever(self, poll_interval: float = 0.5):
+        if not self._reloader.is_alive():
+            self._reloader.start()
+        super().serve_forever(poll_interval)
+
+    def server_close(self):
+        self._stopped.set()
+        super().server_close()
+        self._pool.shutdown(wait=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def serve(config: Config,
+          host: str = DEFAULT_HOST,
+          port: int = DEFAULT_PORT,
+          threads: int = DEFAULT_SERVER_THREADS,
+          interval: float = DEFAULT_RELOAD_INTERVAL):
+    """Loads the archive described by `config` and answers queries until interrupted.
+
+    See `MetadataServer` for the description of the arguments.
+    """
+    server = MetadataServer(config, host, port, threads, interval)
+    print(f"Serving {len(server.service.snapshot.records)} records on {server.url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -2,9 +2,12 @@
 for data capture processes.
 """
 
+import itertools
 import time
+from dataclasses import dataclass
+import numpy as np
 import pandas as pd
-from typing import Callable, Tuple, Any, Iterable
+from typing import Callable, Tuple, Any, Iterable, Dict, List, Optional
 
 
 def calc_time(start: time.time, end: time.time) -> float:
@@ -67,35 +70,205 @@ def calc_time_row(row: pd.Series,
     return time_delta
 
 
-def calc_time_and_rate_from_a_generic_df(df: pd.DataFrame | Iterable[pd.DataFrame],
+# time-of-day strings such as `18:11:39` or `18:11`, used when only the clock time of a capture was recorded
+TIME_OF_DAY_PATTERN = r"\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?"
+# longest run taken to cross midnight, about twice the longest capture in the bundled data;
+# a longer wrap is a placeholder end such as `00:00:00`
+MAX_WRAPPED_DURATION_SECONDS = 4 * 60 * 60
+NANOSECONDS_PER_DAY = 24 * 60 * 60 * 10**9
+NANOSECONDS_PER_SECOND = 10**9
+
+
+@dataclass
+class TimingSummary:
+    """Aggregated timing of a set of samples.
+
+    Attributes:
+        total_time (float): total time taken, in seconds
+        count (int): number of samples with a valid start and end time
+        rate (float): samples per second
+        skipped (int): number of samples without a valid start or end time
+        groups (Optional[pd.DataFrame]): per-group `total_time`, `count` and `rate`,
+            indexed by the values of the grouping field
+    """
+    total_time: float
+    count: int
+    rate: float
+    skipped: int = 0
+    groups: Optional[pd.DataFrame] = None
+
+
+def _lookup(record: Any, key: str) -> Any:
+    # flattened records and series carry the key at the top level, nested records in one of their tables
+    if key in record:
+        return record[key]
+    for value in (record.values() if isinstance(record, dict) else record.to_numpy()):
+        if isinstance(value, dict) and key in value:
+            return value[key]
+    return None
+
+
+def _to_nanoseconds(values: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """Parses timestamps or times of day in one vectorized pass.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: nanoseconds since the epoch (or since midnight for
+            times of day), with `NaT` for unparsable values, and the mask of times of day
+    """
+    strings = values.astype("string")
+    time_of_day = strings.str.fullmatch(TIME_OF_DAY_PATTERN).fillna(False).to_numpy(bool)
+
+    nanoseconds = np.full(len(strings), np.iinfo(np.int64).min, dtype=np.int64)
+    if time_of_day.any():
+        # `HH:MM` lacks the seconds `to_timedelta` requires
+        clock_times = strings[time_of_day].str.replace(r"^(\d{1,2}:\d{2})$", r"\1:00", regex=True)
+        nanoseconds[time_of_day] = pd.to_timedelta(clock_times, errors="coerce") \
+            .astype("timedelta64[ns]").to_numpy().view(np.int64)
+    if (~time_of_day).any():
+        nanoseconds[~time_of_day] = pd.to_datetime(strings[~time_of_day], errors="coerce", format="mixed") \
+            .astype("datetime64[ns]").to_numpy().view(np.int64)
+    return nanoseconds, time_of_day
+
+
+def calc_durations(starts: Iterable[Any], ends: Iterable[Any]) -> np.ndarray:
+    """Calculates the durations between start and end times in a single vectorized pass.
+
+    Values may be full timestamps (`2022-01-01 00:00:10`) or times of day (`18:11:39`).
+    A time-of-day end earlier than its start is taken to be on the next day, so runs
+    crossing midnight get a positive duration, as long as that duration is at most
+    `MAX_WRAPPED_DURATION_SECONDS`.
+
+    Args:
+        starts (Iterable[Any]): start times
+        ends (Iterable[Any]): end times
+
+    Returns:
+        np.ndarray: durations in seconds, `NaN` where a start or end is missing or
+            unparsable, where a timestamp is paired with a time of day, or where a
+            time-of-day run would wrap past midnight for longer than the limit
+    """
+    start_ns, start_is_time_of_day = _to_nanoseconds(pd.Series(list(starts), dtype=object))
+    end_ns, end_is_time_of_day = _to_nanoseconds(pd.Series(list(ends), dtype=object))
+
+    nat = np.iinfo(np.int64).min
+    valid = (start_ns != nat) & (end_ns != nat) & (start_is_time_of_day == end_is_time_of_day)
+    deltas = np.where(valid, end_ns - start_ns, 0)
+    wrapped = valid & start_is_time_of_day & (deltas < 0)
+    deltas = np.where(wrapped, deltas + NANOSECONDS_PER_DAY, deltas)
+    valid &= ~wrapped | (deltas <= MAX_WRAPPED_DURATION_SECONDS * NANOSECONDS_PER_SECOND)
+    return np.where(valid, deltas / NANOSECONDS_PER_SECOND, np.nan)
+
+
+def calc_timing(records: pd.DataFrame | Iterable[pd.Series | Dict],
+                start_key: str = "started",
+                end_key: str = "finished",
+                time_column_name: str = "time",
+                group_by: Optional[str | List[str]] = None) -> TimingSummary:
+    """Calculates total time, rate and optional per-group breakdowns in a single call.
+
+    All start and end times are collected in one pass over `records` and parsed
+    vectorized, see `calc_durations`.
+
+    Args:
+        records (pd.DataFrame | Iterable[pd.Series | Dict]): either a flattened dataframe
+            (e.g. from `analysis.load_flattened_data`) with `start_key` and `end_key` columns
+            or a `time_column_name` column of start/end dictionaries, or an iterable of
+            (nested or flattened) records such as `reader.iter_records(config)`
+        start_key (str): name of the start time field
+        end_key (str): name of the end time field
+        time_column_name (str): name of the table holding the start and end times
+        group_by (Optional[str | List[str]]): field(s) to break the timing down by,
+            e.g. `food_type` or `project_name`
+
+    Returns:
+        TimingSummary: the aggregated timing
+    """
+    group_keys = [group_by] if isinstance(group_by, str) else list(group_by or [])
+
+    if isinstance(records, pd.DataFrame):
+        if start_key in records.columns and end_key in records.columns:
+            starts, ends = records[start_key], records[end_key]
+        else:
+            times = records[time_column_name]
+            starts = times.map(lambda x: x.get(start_key) if isinstance(x, dict) else None)
+            ends = times.map(lambda x: x.get(end_key) if isinstance(x, dict) else None)
+        groups = {key: records[key].astype(object).tolist() for key in group_keys}
+    else:
+        starts, ends = [], []
+        groups = {key: [] for key in group_keys}
+        for record in records:
+            times = record[time_column_name] if time_column_name in record else None
+            if isinstance(times, dict):
+                starts.append(times.get(start_key))
+                ends.append(times.get(end_key))
+            else:
+                starts.append(_lookup(record, start_key))
+                ends.append(_lookup(record, end_key))
+            for key in group_keys:
+                groups[key].append(_lookup(record, key))
+
+    durations = calc_durations(starts, ends)
+    valid = ~np.isnan(durations)
+    total_time = float(durations[valid].sum())
+    count = int(valid.sum())
+    rate = calc_rate(total_time, count) if total_time > 0 else float("nan")
+
+    group_summary = None
+    if group_keys:
+        frame = pd.DataFrame({**groups, "total_time": durations})[valid]
+        group_summary = frame.groupby(group_keys, dropna=False, observed=True)["total_time"] \
+            .agg(["sum", "count"]).rename(columns={"sum": "total_time"})
+        group_summary["rate"] = group_summary["count"] / group_summary["total_time"]
+
+    return TimingSummary(total_time=total_time,
+                         count=count,
+                         rate=rate,
+                         skipped=len(durations) - count,
+                         groups=group_summary)
+
+
+def calc_time_and_rate_from_a_generic_df(df: pd.DataFrame | Iterable[pd.DataFrame | pd.Series | Dict],
                                          time_column_name: str = "time",
                                          start_key: str = "start",
-                                         end_key: str = "end") -> (float, float):
+                                         end_key: str = "end",
+                                         skip_invalid: bool = False) -> (float, float):
     """Caclulates time and rate from a dataframe containing a `time` column
     with `start` and `end` sub-keys.
 
+    Samples whose start or end is missing or unparsable raise a `ValueError`, unless
+    `skip_invalid` is set; `calc_timing` reports how many samples were skipped.
+
     Args:
         df (pd.DataFrame): a generic dataframe with a `time` column containing
-            start and end sub-keys
+            start and end sub-keys, an iterable of such dataframes, or an iterable of
+            records (e.g. the output of `reader.iter_records`) which is consumed one
+            record at a time
         scale (str): [NumPy datetime64 unit](https://numpy.org/doc/stable/reference/arrays.datetime.html#datetime-units)
+        skip_invalid (bool): leave samples without a valid start or end time out of the
+            total and the rate instead of raising
 
     Returns:
-        (float, float): total time taken and rate per second
+        (float, float): total time taken and rate per second; the total is a
+            `pd.Timedelta` for dataframes and seconds for iterables
     """
     if isinstance(df, pd.DataFrame):
-        starts = df[time_column_name].map(lambda x: x[start_key]).astype('datetime64[ns]')
-        ends = df[time_column_name].map(lambda x: x[end_key]).astype('datetime64[ns]')
-        deltas = ends - starts
-        return deltas.sum(), calc_rate(deltas.sum().total_seconds(), len(deltas))
+        records = df
     elif isinstance(df, Iterable):
-        total_time = 0
-        total_count = 0
-        for d in df:
-            starts = pd.Series(d[time_column_name][start_key]).astype('datetime64[ns]')
-            ends = pd.Series(d[time_column_name][end_key]).astype('datetime64[ns]')
-            deltas = ends - starts
-            total_time += deltas.sum().total_seconds()
-            total_count += len(deltas)
-        return total_time, calc_rate(total_time, total_count)
+        records = iter(df)
+        first = next(records, None)
+        if isinstance(first, pd.DataFrame):
+            records = pd.concat([first, *records], ignore_index=True)
+        elif first is not None:
+            records = itertools.chain([first], records)
+        else:
+            records = []
     else:
         raise ValueError("df must be a pandas DataFrame or an iterable of DataFrames")
+
+    summary = calc_timing(records, start_key=start_key, end_key=end_key, time_column_name=time_column_name)
+    if summary.skipped and not skip_invalid:
+        raise ValueError(f"{summary.skipped} samples have a missing or unparsable {start_key} or {end_key} time,"
+                         f" pass skip_invalid=True to leave them out")
+    if isinstance(df, pd.DataFrame):
+        return pd.Timedelta(seconds=summary.total_time), summary.rate
+    return summary.total_time, summary.rate
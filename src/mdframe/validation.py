@@ -0,0 +1,242 @@
+"""Reusable validators for metadata files.
+
+Building a `jsonschema` validator and checking the schema itself is far more expensive
+than validating a single small metadata file, so `MetadataValidator` does both once and
+is then reused for every file. `jsonschema` itself is only imported once a full
+validator is built or a validation error is raised.
+
+Problems found in a metadata file are described by `ValidationIssue`s, which locate
+them in the file by JSON path and line.
+"""
+
+import itertools
+import re
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, List, Literal, Optional, Sequence, Tuple, get_args
+
+Validation = Literal["full", "fast", "off"]
+SUPPORTED_VALIDATION_MODES = get_args(Validation)
+# what loading does with a file that can't be read, decoded or validated, see `reader.Config`
+OnError = Literal["raise", "skip", "collect"]
+SUPPORTED_ON_ERROR_MODES = get_args(OnError)
+
+# JSON schema type names mapped onto the Python types produced by TOML parsers
+JSON_TYPES = {
+    "object": (dict,),
+    "array": (list,),
+    "string": (str,),
+    "integer": (int,),
+    "number": (int, float),
+    "boolean": (bool,),
+}
+
+
+class _FastNode:
+    """Precompiled subset of an object schema: required keys and property types."""
+
+    __slots__ = ("required", "properties")
+
+    def __init__(self, schema: Dict):
+        self.required: Tuple[str, ...] = tuple(schema.get("required", ()))
+        self.properties: List[Tuple[str, str, Tuple[type, ...], Optional["_FastNode"]]] = []
+        for name, subschema in schema.get("properties", {}).items():
+            json_type = subschema.get("type")
+            if not isinstance(json_type, str) or json_type not in JSON_TYPES:
+                continue
+            child = _FastNode(subschema) if json_type == "object" else None
+            self.properties.append((name, json_type, JSON_TYPES[json_type], child))
+
+    def validate(self, instance: Dict, path: Tuple[str, ...] = ()):
+        error = next(self.iter_errors(instance, path), None)
+        if error is not None:
+            raise error
+
+    def iter_errors(self, instance: Dict, path: Tuple[str, ...] = ()) -> Iterator[Exception]:
+        for key in self.required:
+            if key not in instance:
+                from jsonschema import ValidationError
+                yield ValidationError(f"{key!r} is a required property", path=path)
+        for name, json_type, python_types, child in self.properties:
+            if name not in instance:
+                continue
+            value = instance[name]
+            # bool is a subclass of int, but JSON schema doesn't treat booleans as numbers
+            if not isinstance(value, python_types) or (isinstance(value, bool) and json_type != "boolean"):
+                from jsonschema import ValidationError
+                yield ValidationError(f"{value!r} is not of type {json_type!r}", path=path + (name,))
+            elif child is not None:
+                yield from child.iter_errors(value, path + (name,))
+
+
+class MetadataValidator:
+    """Validates metadata file contents against a JSON schema.
+
+    Args:
+        schema (Dict): the JSON schema
+        mode (Validation): `full` validates against the whole schema, `fast` only checks
+            required keys and property types, `off` skips validation altogether
+
+    Raises:
+        SchemaError: if `mode` is `full` and the schema itself is invalid
+        ValueError: if `mode` is not supported
+    """
+
+    def __init__(self, schema: Dict, mode: Validation = "full"):
+        if mode not in SUPPORTED_VALIDATION_MODES:
+            raise ValueError(f"Validation mode {mode} is not one of {SUPPORTED_VALIDATION_MODES}")
+        self.schema = schema
+        self.mode = mode
+        if mode == "full":
+            from jsonschema.validators import validator_for
+            validator_for(schema).check_schema(schema)
+        self._compile()
+
+    def _compile(self):
+        self._validator: Any = None
+        if self.mode == "full":
+            from jsonschema.validators import validator_for
+            self._validator = validator_for(self.schema)(self.schema)
+        elif self.mode == "fast":
+            self._validator = _FastNode(self.schema)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # compiled jsonschema validators can't be pickled, workers recompile them instead
+        return {"schema": self.schema, "mode": self.mode}
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.schema = state["schema"]
+        self.mode = state["mode"]
+        self._compile()
+
+    def __call__(self, instance: Dict[str, Any]):
+        """Validates `instance`.
+
+        Args:
+            instance (Dict[str, Any]): contents of a metadata file
+
+        Raises:
+            ValidationError: if `instance` does not conform to the schema
+        """
+        if self.mode == "full":
+            errors = self._validator.iter_errors(instance)
+            first_error = next(errors, None)
+            if first_error is not None:
+                from jsonschema.exceptions import best_match
+                # same error selection as `jsonschema.validate`
+                raise best_match(itertools.chain((first_error,), errors))
+        elif self.mode == "fast":
+            self._validator.validate(instance)
+
+    def iter_errors(self, instance: Dict[str, Any]) -> Iterator[Exception]:
+        """Lists every way in which `instance` doesn't conform to the schema.
+
+        Yields:
+            ValidationError: the errors, none if `mode` is `off`
+        """
+        if self._validator is not None:
+            yield from self._validator.iter_errors(instance)
+
+
+@dataclass
+class ValidationIssue:
+    """A problem found in a metadata file.
+
+    `kind` is `read` for files which can't be read or aren't UTF-8, `decode` for invalid
+    TOML and `schema` for schema violations. `line` and `column` are 1-based and `None`
+    when the problem can't be pinned to a line, e.g. for a missing top-level property.
+    """
+    file: str
+    kind: str
+    message: str
+    json_path: str = "$"
+    line: Optional[int] = None
+    column: Optional[int] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+_TABLE_HEADER = re.compile(r"^(\[\[?)\s*([^\]]+?)\s*\]\]?")
+_KEY = re.compile(r"""^("[^"]*"|'[^']*'|[A-Za-z0-9_.\-"' ]+?)\s*=""")
+
+
+def _split_key(key: str) -> Tuple[str, ...]:
+    return tuple(part.strip().strip("\"'") for part in key.split("."))
+
+
+def locate_line(text: str, path: Sequence[Any]) -> Optional[int]:
+    """Finds the line of a TOML document defining the value at `path`.
+
+    Tables, arrays of tables (`[[qa]]`) and keys are matched against `path`, e.g.
+    `("qa", 1, "comments")` is the `comments` key of the second `[[qa]]` table. If the
+    value itself isn't in the document, e.g. because it is missing, the line of its closest
+    enclosing table is returned.
+
+    Args:
+        text (str): the TOML document
+        path (Sequence[Any]): keys and array indices leading to the value
+
+    Returns:
+        Optional[int]: 1-based line number, `None` if not even the enclosing table was found
+    """
+    path = tuple(path)
+    found: Dict[Tuple[Any, ...], int] = {}
+    table: Tuple[Any, ...] = ()
+    array_lengths: Dict[Tuple[str, ...], int] = {}
+    in_multiline_string = False
+    for number, line in enumerate(text.splitlines(), 1):
+        stripped = line.strip()
+        if in_multiline_string:
+            in_multiline_string = (stripped.count('"""') + stripped.count("'''")) % 2 == 0
+            continue
+        header = _TABLE_HEADER.match(stripped)
+        if header is not None:
+            name = _split_key(header.group(2))
+            if header.group(1) == "[[":
+                array_lengths[name] = array_lengths.get(name, 0) + 1
+                table = name + (array_lengths[name] - 1,)
+            else:
+                table = name
+            found.setdefault(table, number)
+        else:
+            key = _KEY.match(stripped)
+            if key is not None:
+                found.setdefault(table + _split_key(key.group(1)), number)
+            in_multiline_string = (stripped.count('"""') + stripped.count("'''")) % 2 == 1
+        if path in found:
+            return found[path]
+    for length in range(len(path) - 1, 0, -1):
+        if path[:length] in found:
+            return found[path[:length]]
+    return None
+
+
+def issue_from_error(file: str, error: Exception, text: Optional[str] = None) -> ValidationIssue:
+    """Describes an error raised while loading a metadata file as a `ValidationIssue`.
+
+    Args:
+        file (str): name of the metadata file
+        error (Exception): the error, e.g. a `ValidationError` or `TomlDecodeError`
+        text (Optional[str]): contents of the file, used to find the line of schema violations
+    """
+    # `reader.load_metadata_file` re-raises errors with the file name, the original keeps the path
+    cause = error.__cause__ if error.__cause__ is not None and type(error.__cause__) is type(error) else error
+    if hasattr(cause, "absolute_path") and hasattr(cause, "validator"):
+        path = list(cause.absolute_path)
+        line = locate_line(text, path) if text is not None else None
+        return ValidationIssue(file, "schema", cause.message, cause.json_path, line)
+    if hasattr(error, "lineno") and hasattr(error, "colno"):
+        return ValidationIssue(file, "decode", _without_file_name(getattr(error, "msg", str(error))),
+                               line=error.lineno, column=error.colno)
+    if isinstance(error, UnicodeDecodeError):
+        line = error.object[:error.start].count(b"\n") + 1 if isinstance(error.object, bytes) else None
+        return ValidationIssue(file, "read", f"not UTF-8: {error.reason} at byte {error.start}", line=line)
+    return ValidationIssue(file, "read", _without_file_name(str(error)))
+
+
+_FILE_NAME_PREFIX = re.compile(r"^Crashed when processing metadata file [^;]*; ")
+
+
+def _without_file_name(message: str) -> str:
+    # the file is named by the issue already
+    return _FILE_NAME_PREFIX.sub("", message)
@@ -0,0 +1,214 @@
+"""Checks that the assets referenced by metadata files exist on disk.
+
+Metadata files reference their assets by name, without an extension: the RGBD captures
+in `rgbd_file_names` and the photos in `nutrition_facts_sources` and `texture_sources`.
+An asset is resolved next to its metadata file, with any of the supported data file
+extensions (see `reader.DataFileExtension`), and counts as present if such a file exists
+and isn't empty. The hand-maintained `qa.rgbd_files_present` flag is compared against
+what was actually found.
+
+Captures are large and numerous, so the `stat` calls are batched and run in a thread
+pool, and their results are cached per directory: as long as the modification time of a
+directory is unchanged, no file was added, removed or renamed in it and the cached sizes
+are reused. Empty files are always checked again, since they may still be being written.
+"""
+
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from mdframe.cache import ParseCache, StatCache
+from mdframe.discovery import record_sort_key
+from mdframe.reader import (SUPPORTED_DATA_FILE_EXTENSIONS, Config, discover_metadata_files, get_toml_backend,
+                            iter_metadata_files, iter_metadata_files_cached)
+from mdframe.records import lookup_flattened
+
+ASSET_FIELDS = ("rgbd_file_names", "nutrition_facts_sources", "texture_sources")
+
+# stat calls are I/O bound, network file systems benefit from many in flight
+DEFAULT_VERIFY_THREADS = 32
+# number of paths stat-ed by one task of the thread pool
+STAT_BATCH_SIZE = 256
+STAT_CACHE_FILE_NAME = "stat-cache.pickle"
+
+
+@dataclass
+class AssetReport:
+    """Assets of a single metadata file which are missing or empty.
+
+    `missing` and `empty` hold `(field, asset name)` pairs. `rgbd_files_present` is the
+    flag of the last `qa` entry, `None` if there is none.
+    """
+    gid: Any
+    uid: Any
+    metadata_file: str
+    assets: int = 0
+    rgbd_files: int = 0
+    missing: List[Tuple[str, str]] = field(default_factory=list)
+    empty: List[Tuple[str, str]] = field(default_factory=list)
+    rgbd_files_present: Optional[bool] = None
+
+    @property
+    def rgbd_files_found(self) -> bool:
+        """Whether RGBD files are referenced and all of them were found."""
+        return self.rgbd_files > 0 and not any(name == "rgbd_file_names" for name, _ in self.missing + self.empty)
+
+    @property
+    def flag_mismatch(self) -> bool:
+        """Whether `qa.rgbd_files_present` disagrees with the RGBD files found on disk."""
+        return self.rgbd_files_present is not None and self.rgbd_files_present != self.rgbd_files_found
+
+    @property
+    def ok(self) -> bool:
+        return not self.missing and not self.empty and not self.flag_mismatch
+
+
+def asset_file_names(name: str) -> List[str]:
+    """File names an asset may be stored under, e.g. `IMG_7099.jpg` or `IMG_7099.txt` for `IMG_7099`."""
+    if Path(name).suffix[1:] in SUPPORTED_DATA_FILE_EXTENSIONS:
+        return [name]
+    return [f"{name}.{extension}" for extension in SUPPORTED_DATA_FILE_EXTENSIONS]
+
+
+def iter_assets(record: Dict[str, Any]) -> Iterator[Tuple[str, str]]:
+    """Yields the `(field, asset name)` pairs referenced by a metadata record."""
+    for field_name in ASSET_FIELDS:
+        names = lookup_flattened(record, field_name)
+        if isinstance(names, list):
+            for name in names:
+                if isinstance(name, str) and name:
+                    yield field_name, name
+
+
+def _rgbd_files_present(record: Dict[str, Any]) -> Optional[bool]:
+    qa = record.get("qa")
+    if isinstance(qa, list) and qa and isinstance(qa[-1], dict):
+        return qa[-1].get("rgbd_files_present")
+    return None
+
+
+def _stat_batch(paths: List[Path]) -> List[Optional[int]]:
+    sizes = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            sizes.append(None)
+            continue
+        sizes.append(st.st_size if stat.S_ISREG(st.st_mode) else None)
+    return sizes
+
+
+def _directory_mtime(directory: Path) -> Optional[int]:
+    try:
+        return os.stat(directory).st_mtime_ns
+    except OSError:
+        return None
+
+
+def stat_files(files: Dict[Path, List[str]],
+               threads: int = DEFAULT_VERIFY_THREADS,
+               cache: Optional[StatCache] = None) -> Dict[Path, Dict[str, Optional[int]]]:
+    """Looks up the sizes of files, grouped by directory.
+
+    Args:
+        files (Dict[Path, List[str]]): names of the files to look up in each directory
+        threads (int): number of threads running `stat` calls
+        cache (Optional[StatCache]): sizes from previous runs, updated with the new ones
+
+    Returns:
+        Dict[Path, Dict[str, Optional[int]]]: size of every file, `None` for missing files
+    """
+    directories = list(files)
+    sizes: Dict[Path, Dict[str, Optional[int]]] = {directory: {} for directory in directories}
+    pending: List[Tuple[Path, str]] = []
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as executor:
+        mtimes = dict(zip(directories, executor.map(_directory_mtime, directories)))
+        for directory in directories:
+            cached = {}
+            if cache is not None and mtimes[directory] is not None:
+                cached = cache.get(directory, mtimes[directory])
+            for name in dict.fromkeys(files[directory]):
+                # empty files are stat-ed again, they may still be being written
+                if cached.get(name, 0) != 0:
+                    sizes[directory][name] = cached[name]
+                else:
+                    pending.append((directory, name))
+
+        batches = [pending[i:i + STAT_BATCH_SIZE] for i in range(0, len(pending), STAT_BATCH_SIZE)]
+        results = executor.map(_stat_batch, [[directory / name for directory, name in batch] for batch in batches])
+        for batch, batch_sizes in zip(batches, results):
+            for (directory, name), size in zip(batch, batch_sizes):
+                sizes[directory][name] = size
+
+    if cache is not None:
+        for directory in directories:
+            if mtimes[directory] is not None:
+                cache.update(directory, mtimes[directory], sizes[directory])
+    return sizes
+
+
+def _iter_records_with_files(config: Config, metadata_file_paths: List[Path]) -> Iterator[Dict[str, Any]]:
+    if config.cache_dir is not None and not config.sharded:
+        cache = ParseCache(config.cache_dir, config.data_paths[0], config.schema, config.validation,
+                           get_toml_backend().name)
+        return iter_metadata_files_cached(metadata_file_paths, config.schema, cache, config.workers, config.validator)
+    return iter_metadata_files(metadata_file_paths, config.schema, config.workers, config.validator)
+
+
+def verify_assets(config: Config,
+                  threads: int = DEFAULT_VERIFY_THREADS,
+                  cache_file: Optional[Path] = None) -> List[AssetReport]:
+    """Checks the assets referenced by every metadata file described by `config`.
+
+    Args:
+        config (Config): reader configuration
+        threads (int): number of threads running `stat` calls
+        cache_file (Optional[Path]): file caching the sizes between runs; defaults to a
+            file in `config.cache_dir`, no cache is used if neither is set
+
+    Returns:
+        List[AssetReport]: one report per metadata file, ordered by `gid`
+    """
+    if cache_file is None and config.cache_dir is not None:
+        cache_file = Path(config.cache_dir) / STAT_CACHE_FILE_NAME
+    cache = StatCache(cache_file) if cache_file is not None else None
+
+    metadata_files = discover_metadata_files(config)
+    records = _iter_records_with_files(config, [metadata_file.path for metadata_file in metadata_files])
+    reports, references, files = [], [], {}
+    for metadata_file, record in zip(metadata_files, records):
+        directory = metadata_file.path.parent
+        report = AssetReport(record.get("gid"), record.get("uid"), metadata_file.key,
+                             rgbd_files_present=_rgbd_files_present(record))
+        for field_name, name in iter_assets(record):
+            report.assets += 1
+            report.rgbd_files += field_name == "rgbd_file_names"
+            references.append((report, directory, field_name, name))
+            files.setdefault(directory, []).extend(asset_file_names(name))
+        reports.append(report)
+
+    sizes = stat_files(files, threads, cache)
+    for report, directory, field_name, name in references:
+        found = [sizes[directory][file_name] for file_name in asset_file_names(name)]
+        found = [size for size in found if size is not None]
+        if not found:
+            report.missing.append((field_name, name))
+        elif not any(found):
+            report.empty.append((field_name, name))
+
+    if cache is not None:
+        cache.save()
+    return sorted(reports, key=lambda report: record_sort_key({"gid": report.gid, "uid": report.uid}))
+
+
+def format_report(report: AssetReport) -> str:
+    """Describes the problems of a metadata file in one line."""
+    problems = [f"missing {field_name} {name}" for field_name, name in report.missing]
+    problems += [f"empty {field_name} {name}" for field_name, name in report.empty]
+    if report.flag_mismatch:
+        problems.append(f"qa.rgbd_files_present is {str(report.rgbd_files_present).lower()}"
+                        f" but RGBD files were {'' if report.rgbd_files_found else 'not '}found")
+    return f"gid {report.gid} ({report.metadata_file}): {'; '.join(problems)}"
@@ -0,0 +1,233 @@
+"""Live, incrementally updated view of a metadata directory.
+
+`LiveTable` loads a data directory once and then follows changes by polling: every
+`refresh` stats the metadata files with `os.scandir`, in every directory of a sharded
+archive (see `mdframe.discovery`), and only parses and validates the files that were
+added or modified since the previous refresh. Derived aggregates are
+updated by subtracting the old version of a changed record and adding the new one. The
+flattened table (`LiveTable.to_dataframe`) is not incremental: it is rebuilt in full from
+the current records, on the first request after a change.
+
+Polling is used rather than inotify to stay portable and dependency-free; a poll costs
+one `stat` per file, parsing cost is proportional to the number of changed files only.
+"""
+
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from mdframe.columnar import build_flattened_frame
+from mdframe.discovery import record_sort_key
+from mdframe.query import validate_query
+from mdframe.reader import Config, discover_metadata_files, load_metadata_file, load_metadata_files, push_down
+from mdframe.timing import calc_durations
+from mdframe.validation import SUPPORTED_ON_ERROR_MODES, ValidationIssue, issue_from_error
+
+
+@dataclass
+class Changes:
+    """Metadata files touched between two refreshes, as paths relative to the data directory."""
+    added: List[str] = field(default_factory=list)
+    modified: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    errors: Dict[str, str] = field(default_factory=dict)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.modified or self.removed or self.errors)
+
+
+@dataclass
+class Aggregates:
+    """Aggregates of the live table which are maintained incrementally."""
+    count: int = 0
+    food_types: Counter = field(default_factory=Counter)
+    total_time: float = 0.0
+    timed_count: int = 0
+
+    @staticmethod
+    def _contribution(record: Dict[str, Any]) -> Tuple[Any, float]:
+        food_type = record.get("item", {}).get("food_type")
+        times = record.get("time", {})
+        duration = calc_durations([times.get("started")], [times.get("finished")])[0]
+        return food_type, duration
+
+    def add(self, record: Dict[str, Any]):
+        food_type, duration = self._contribution(record)
+        self.count += 1
+        self.food_types[food_type] += 1
+        if not np.isnan(duration):
+            self.total_time += duration
+            self.timed_count += 1
+
+    def remove(self, record: Dict[str, Any]):
+        food_type, duration = self._contribution(record)
+        self.count -= 1
+        self.food_types[food_type] -= 1
+        if self.food_types[food_type] <= 0:
+            del self.food_types[food_type]
+        if not np.isnan(duration):
+            self.total_time -= duration
+            self.timed_count -= 1
+
+    @property
+    def rate(self) -> float:
+        return self.timed_count / self.total_time if self.total_time > 0 else float("nan")
+
+
+class LiveTable:
+    """In-memory table of the metadata records of a data directory, kept current by `refresh`.
+
+    Records not matching `config.where` are left out and the fields not in
+    `config.columns` dropped, like `reader.iter_records` does. Files which fail to parse
+    or validate (e.g. while they are still being written) are left out of the table until
+    they become valid. A refresh never aborts on such a file, whatever `config.on_error`:
+    they are reported in `Changes.errors` unless `on_error` is `skip`, and with `collect`
+    their problems are also kept in `config.errors`.
+
+    Args:
+        config (Config): reader configuration
+    """
+
+    def __init__(self, config: Config):
+        if config.on_error not in SUPPORTED_ON_ERROR_MODES:
+            raise ValueError(f"on_error must be one of {SUPPORTED_ON_ERROR_MODES}, got {config.on_error}")
+        if config.where is not None:
+            validate_query(config.where)
+        self.config = config
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self.aggregates = Aggregates()
+        self._fingerprints: Dict[str, Tuple[int, int]] = {}
+        # metadata file key -> path, keys are file names unless the archive is sharded
+        self._paths: Dict[str, Path] = {}
+        self._frame: Optional[pd.DataFrame] = None
+        # metadata file key -> problem of a file failing to load, kept if `on_error` is `collect`
+        self._issues: Dict[str, ValidationIssue] = {}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        fingerprints = {}
+        for metadata_file in discover_metadata_files(self.config):
+            fingerprints[metadata_file.key] = (metadata_file.mtime_ns, metadata_file.size)
+            self._paths[metadata_file.key] = metadata_file.path
+        return fingerprints
+
+    def _load(self, names: List[str]) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Exception]]:
+        paths = [self._paths[name] for name in names]
+        try:
+            records = load_metadata_files(paths, self.config.schema, self.config.workers, self.config.validator)
+            return self._select(dict(zip(names, records))), {}
+        except Exception:
+            pass
+        # at least one file is invalid, load them one by one to keep the valid ones
+        records, errors = {}, {}
+        for name, path in zip(names, paths):
+            try:
+                records[name] = load_metadata_file(path, self.config.schema, self.config.validator)
+            except Exception as error:
+                errors[name] = error
+        return self._select(records), errors
+
+    def _select(self, records: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Applies `config.where` and `config.columns` to freshly loaded records."""
+        if self.config.columns is None and self.config.where is None:
+            return records
+        selected = {}
+        for name, record in records.items():
+            for kept in push_down(iter((record,)), self.config.columns, self.config.where):
+                selected[name] = kept
+        return selected
+
+    def _issue(self, name: str, error: Exception) -> ValidationIssue:
+        path = self._paths[name]
+        try:
+            text = path.read_text(encoding="utf-8", errors="replace")
+        except OSError:
+            text = None
+        return issue_from_error(os.fspath(path), error, text)
+
+    def refresh(self) -> Changes:
+        """Re-parses the files changed since the last refresh and updates the table.
+
+        Returns:
+            Changes: the files that were added, modified, removed or failed to load
+        """
+        fingerprints = self._scan()
+        changes = Changes()
+        touched = []
+        for name, fingerprint in fingerprints.items():
+            previous = self._fingerprints.get(name)
+            if previous != fingerprint:
+                touched.append(name)
+        removed = [name for name in self._fingerprints if name not in fingerprints]
+
+        records, errors = self._load(sorted(touched))
+        if self.config.on_error != "skip":
+            changes.errors = {name: str(error) for name, error in errors.items()}
+        if self.config.on_error == "collect":
+            for name in touched + removed:
+                self._issues.pop(name, None)
+            self._issues.update((name, self._issue(name, error)) for name, error in errors.items())
+            self.config.errors[:] = [self._issues[name] for name in sorted(self._issues)]
+        for name in touched:
+            self._fingerprints[name] = fingerprints[name]
+            old_record = self.records.pop(name, None)
+            if old_record is not None:
+                self.aggregates.remove(old_record)
+            if name in records:
+                self.records[name] = records[name]
+                self.aggregates.add(records[name])
+                (changes.modified if old_record is not None else changes.added).append(name)
+            elif old_record is not None:
+                changes.removed.append(name)
+
+        for name in removed:
+            del self._fingerprints[name]
+            self._paths.pop(name, None)
+            old_record = self.records.pop(name, None)
+            if old_record is not None:
+                self.aggregates.remove(old_record)
+                changes.removed.append(name)
+
+        if changes:
+            self._frame = None
+        return changes
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Returns the flattened table of the current records, in the order of `reader.iter_records`.
+
+        After any change, even to a single file, the whole frame is rebuilt from all records
+        (O(archive)), lazily on the first call; unchanged tables are returned as they are.
+        Use `records` or `aggregates` to follow changes without paying for the rebuild.
+        """
+        if self._frame is None:
+            self._frame = build_flattened_frame(self.ordered_records())
+        return self._frame
+
+    def ordered_records(self) -> List[Dict[str, Any]]:
+        """Returns the current records in the order of the rows of `to_dataframe`."""
+        if self.config.sharded:
+            return sorted(self.records.values(), key=record_sort_key)
+        return [self.records[name] for name in sorted(self.records)]
+
+    def watch(self,
+              callback: Callable[["LiveTable", Changes], None],
+              interval: float = 1.0,
+              should_stop: Callable[[], bool] = lambda: False):
+        """Polls the data directory every `interval` seconds and calls `callback` on changes.
+
+        Args:
+            callback (Callable[[LiveTable, Changes], None]): called after every refresh which changed the table
+            interval (float): polling interval in seconds
+            should_stop (Callable[[], bool]): polled before every refresh, stops watching when True
+        """
+        while not should_stop():
+            changes = self.refresh()
+            if changes:
+                callback(self, changes)
+            time.sleep(interval)
@@ -0,0 +1,81 @@
+import unittest
+from collections import Counter
+from pathlib import Path
+import numpy as np
+from mdframe.reader import run, Config, iter_records
+from mdframe.analysis import flatten_property_dict, generate_histogram, plot_aggregate
+from mdframe.aggregation import BATCH_SIZE, aggregate, lookup_flattened
+
+root = Path(__file__).parent
+
+
+class TestAggregation(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.config = Config(
+            data_path=root / "../src/mdframe/data",
+            metadata_file_extension="toml",
+            schema_loc=root / "../src/mdframe/schema.json"
+        )
+        cls.flattened = [flatten_property_dict(entry.to_dict()) for entry in run(cls.config)]
+
+    def test_lookup_matches_flattening(self):
+        for record, flattened in zip(iter_records(self.config), self.flattened):
+            for name, value in flattened.items():
+                self.assertEqual(lookup_flattened(record, name), value)
+
+    def test_multiple_properties_in_one_pass(self):
+        result = aggregate(iter_records(self.config), discrete=["quality", "merged"], continuous=["weight"])
+
+        for name in ("quality", "merged"):
+            expected = Counter(entry[name] for entry in self.flattened if name in entry)
+            self.assertEqual(result[name].counts, expected)
+            self.assertEqual(result[name].missing, sum(name not in entry for entry in self.flattened))
+
+        weights = np.array([entry["weight"] for entry in self.flattened if "weight" in entry], dtype=float)
+        expected_counts, expected_edges = np.histogram(weights, bins="auto")
+        np.testing.assert_array_equal(result["weight"].counts, expected_counts)
+        np.testing.assert_allclose(result["weight"].edges, expected_edges)
+        self.assertEqual(result["weight"].count, len(weights))
+        self.assertAlmostEqual(result["weight"].mean, weights.mean())
+
+    def test_preset_edges(self):
+        rng = np.random.default_rng(0)
+        values = rng.uniform(-10, 110, 3 * BATCH_SIZE + 17)
+        records = ({"metrics": {"weight": float(value)}} for value in values)
+        edges = [0, 25, 50, 75, 100]
+        weight = aggregate(records, continuous={"weight": edges})["weight"]
+
+        np.testing.assert_array_equal(weight.counts, np.histogram(values, bins=edges)[0])
+        self.assertEqual(weight.underflow, int(np.sum(values < 0)))
+        self.assertEqual(weight.overflow, int(np.sum(values > 100)))
+        self.assertEqual(weight.count, len(values))
+
+    def test_invalid_values_and_edges(self):
+        records = [{"weight": 1}, {"weight": "heavy"}, {"weight": True}, {}]
+        weight = aggregate(records, continuous=["weight"])["weight"]
+        self.assertEqual((weight.count, weight.invalid, weight.missing), (1, 2, 1))
+
+        with self.assertRaises(ValueError):
+            aggregate([], continuous={"weight": [1, 0]})
+        with self.assertRaises(ValueError):
+            aggregate([], discrete=["weight"], continuous=["weight"])
+
+    def test_generate_histogram(self):
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+
+        generate_histogram(self.config, "quality", data_type="discrete")
+        generate_histogram(self.config, "weight", data_type="continuous", bins=[0, 100, 200, 500, 1000])
+        with self.assertRaises(ValueError):
+            generate_histogram(self.config, "no_such_property")
+
+        ax = plot_aggregate(aggregate(iter_records(self.config), continuous=["weight"])["weight"])
+        self.assertEqual(ax.get_title(), "Histogram of weight in Data")
+        plt.close("all")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,10 @@
+import shutil
+import tempfile
 import unittest
 from pathlib import Path
-from mdframe.reader import run, Config
+from mdframe.reader import run, Config, iter_records
 from mdframe.analysis import flatten_property_dict, load_flattened_data, filter_data, generate_histogram
+from mdframe.cache import ResultCache
 import pandas as pd
 import toml
 
@@ -60,6 +63,43 @@ class TestAnalysis(unittest.TestCase):
 
         assert first_df.equals(second_df)
 
+    def test_load_flattened_data_from_records(self):
+        config = Config(
+            data_path=Path(__file__).parent / "data", 
+            metadata_file_extension="toml", 
+            schema_loc=self.schema_loc
+        )
+        from_config = load_flattened_data(config)
+        from_records = load_flattened_data(iter_records(config))
+        from_series = load_flattened_data(run(config, stream=True))
+        assert from_config.equals(from_records)
+        assert from_config.equals(from_series)
+
+    def test_load_flattened_data_matches_row_wise_flattening(self):
+        config = Config(
+            data_path=root / "../src/mdframe/data",
+            metadata_file_extension="toml",
+            schema_loc=self.schema_loc
+        )
+        df = load_flattened_data(config)
+        expected = pd.DataFrame([flatten_property_dict(entry.to_dict()) for entry in run(config)])
+
+        assert list(df.columns) == list(expected.columns)
+        assert df["gid"].dtype == "int64"
+        assert df["weight"].dtype == "float64"
+        assert df["merged"].dtype == "boolean"
+        for column in ("unit", "food_type", "nutrition_subgroup"):
+            assert isinstance(df[column].dtype, pd.CategoricalDtype)
+
+        for column in df.columns:
+            for value, expected_value in zip(df[column].astype(object), expected[column]):
+                if isinstance(expected_value, list):
+                    assert value == expected_value
+                elif pd.isna(expected_value):
+                    assert pd.isna(value)
+                else:
+                    assert value == expected_value
+
     def test_filter_data(self):
         filtered_data_filename = 'filtered_data.csv'
         filtered_data_file_path = Path(__file__).parent / filtered_data_filename
@@ -93,6 +133,23 @@ class TestAnalysis(unittest.TestCase):
         if filtered_data_file_path.exists():
             filtered_data_file_path.unlink()
 
+    def test_filter_data_cache_replays_errors(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        data_path = Path(tmp_dir.name) / "data"
+        shutil.copytree(root / "data", data_path)
+        shutil.copy(root / "invalid_data" / "invalid_file_0.toml", data_path / "03_invalid_file.toml")
+        config = Config(data_path, "toml", self.schema_loc, on_error="collect")
+        cache = ResultCache()
+        output = Path(tmp_dir.name) / "filtered.csv"
+
+        for hits in (0, 1):
+            config.errors.clear()
+            filter_data(config, "quality >= 2", output, cache=cache)
+            self.assertEqual(cache.stats.hits, hits)
+            self.assertEqual([Path(issue.file).name for issue in config.errors], ["03_invalid_file.toml"])
+            self.assertEqual(len(pd.read_csv(output, index_col=0)), 3)
+
     def generate_histogram(self):
         pass
 
@@ -0,0 +1,44 @@
+import unittest
+import shutil
+import tempfile
+from pathlib import Path
+from mdframe.reader import run, Config
+from benchmarks.archive import SCHEMA_PATH, generate_archive, parse_size
+from benchmarks.suite import run_case
+
+
+class TestBenchmarkArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_parse_size(self):
+        self.assertEqual(parse_size("10k"), 10_000)
+        self.assertEqual(parse_size("1M"), 1_000_000)
+        self.assertEqual(parse_size("250"), 250)
+
+    def test_generated_archive_is_valid(self):
+        data_path = generate_archive(self.tmp_dir / "archive", 300)
+        records = run(Config(data_path, "toml", SCHEMA_PATH))
+        self.assertEqual([record["gid"] for record in records], list(range(300)))
+        self.assertEqual(len({record["uid"] for record in records}), 300)
+
+        # a complete archive is reused rather than written again
+        first_file = sorted(data_path.glob("*.toml"))[0]
+        mtime = first_file.stat().st_mtime_ns
+        generate_archive(data_path, 300)
+        self.assertEqual(first_file.stat().st_mtime_ns, mtime)
+
+    def test_run_case(self):
+        data_path = generate_archive(self.tmp_dir / "archive", 20)
+        result = run_case("load_flattened_data", data_path, 20)
+        self.assertEqual(result.size, 20)
+        self.assertGreater(result.wall_time, 0)
+        self.assertGreater(result.peak_rss, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import shutil
+import tempfile
+from pathlib import Path
+from mdframe.reader import run, Config
+from mdframe.cache import ParseCache, ResultCache
+
+root = Path(__file__).parent
+
+
+class TestParseCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.schema_loc = root / "../src/mdframe/schema.json"
+
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.data_path = self.tmp_dir / "data"
+        self.cache_dir = self.tmp_dir / "cache"
+        shutil.copytree(root / "data", self.data_path)
+        self.config = Config(
+            data_path=self.data_path,
+            metadata_file_extension="toml",
+            schema_loc=self.schema_loc,
+            cache_dir=self.cache_dir
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_cache_matches_uncached_load(self):
+        cold = run(self.config)
+        warm = run(self.config)
+        uncached = run(Config(self.data_path, "toml", self.schema_loc))
+        self.assertEqual([s.to_dict() for s in cold], [s.to_dict() for s in uncached])
+        self.assertEqual([s.to_dict() for s in warm], [s.to_dict() for s in uncached])
+
+        cache = ParseCache(self.cache_dir, self.data_path, self.config.schema)
+        self.assertEqual(len(cache), 3)
+
+    def test_cache_picks_up_changed_and_deleted_files(self):
+        run(self.config)
+
+        changed_file = self.data_path / "00_input_file.toml"
+        changed_file.write_text(changed_file.read_text().replace("weight = 1\n", "weight = 12345\n"))
+        (self.data_path / "01_input_file.toml").unlink()
+
+        records = run(self.config)
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0]["metrics"]["weight"], 12345)
+
+        cache = ParseCache(self.cache_dir, self.data_path, self.config.schema)
+        self.assertEqual(len(cache), 2)
+        self.assertNotIn(self.data_path / "01_input_file.toml", cache)
+
+
+
+class TestResultCache(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        cache = ResultCache(maxsize=2)
+        calls = []
+
+        def compute(value):
+            def inner():
+                calls.append(value)
+                return value
+            return inner
+
+        self.assertEqual(cache.get_or_compute("a", compute(1)), 1)
+        cache.get_or_compute("b", compute(2))
+        # "a" is now the most recently used entry, "b" is evicted
+        self.assertEqual(cache.get_or_compute("a", compute(None)), 1)
+        cache.get_or_compute("c", compute(3))
+        self.assertNotIn("b", cache)
+        self.assertEqual(calls, [1, 2, 3])
+        self.assertEqual(tuple(cache.stats), (1, 3, 1, 2, 2))
+
+        cache.clear()
+        self.assertEqual(tuple(cache.stats), (0, 0, 0, 0, 2))
+        with self.assertRaises(ValueError):
+            ResultCache(maxsize=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from mdframe.reader import Config, iter_records
+from mdframe.diagnostics import validate_archive
+from mdframe.validation import locate_line
+
+root = Path(__file__).parent
+
+
+class TestValidateArchive(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.schema_loc = root / "../src/mdframe/schema.json"
+
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.data_path = self.tmp_dir / "data"
+        shutil.copytree(root / "data", self.data_path)
+        shutil.copy(root / "invalid_data" / "invalid_file_0.toml", self.data_path / "03_invalid_file.toml")
+        # three schema violations in one file
+        text = (self.data_path / "00_input_file.toml").read_text()
+        text = text.replace('gid = 75', 'gid = "75"').replace('food_type = "nachos"\n', '').replace('unit = "g"', 'unit = 5')
+        (self.data_path / "04_invalid_file.toml").write_text(text)
+        (self.data_path / "05_invalid_file.toml").write_bytes(b'gid = 1\nuid = "\xff"\n')
+        self.config = Config(self.data_path, "toml", self.schema_loc)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_collects_every_problem(self):
+        report = validate_archive(self.config, workers=1)
+        self.assertEqual(report.files, 6)
+        self.assertEqual(report.invalid_files, ["03_invalid_file.toml", "04_invalid_file.toml", "05_invalid_file.toml"])
+
+        decode, = [issue for issue in report.issues if issue.file == "03_invalid_file.toml"]
+        self.assertEqual((decode.kind, decode.line), ("decode", 7))
+        self.assertNotIn("Crashed", decode.message)
+
+        schema = [(issue.kind, issue.json_path, issue.line) for issue in report.issues if issue.file == "04_invalid_file.toml"]
+        self.assertEqual(schema, [("schema", "$.gid", 1), ("schema", "$.item", 4), ("schema", "$.metrics.unit", 10)])
+
+        encoding, = [issue for issue in report.issues if issue.file == "05_invalid_file.toml"]
+        self.assertEqual((encoding.kind, encoding.line), ("read", 2))
+
+        # the same report from several processes
+        self.assertEqual(validate_archive(self.config, workers=2), report)
+        report_path = self.tmp_dir / "report.json"
+        report.save(report_path)
+        with open(report_path) as f:
+            self.assertEqual(json.load(f)["invalid_files"], 3)
+
+    def test_on_error(self):
+        with self.assertRaises(Exception):
+            list(iter_records(self.config))
+
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                config = Config(self.data_path, "toml", self.schema_loc, workers=workers, on_error="skip")
+                self.assertEqual([record["gid"] for record in iter_records(config)], [75, 62, 66])
+                self.assertEqual(config.errors, [])
+
+                config = Config(self.data_path, "toml", self.schema_loc, workers=workers, on_error="collect",
+                                cache_dir=self.tmp_dir / "cache", recursive=True)
+                self.assertEqual(sorted(record["gid"] for record in iter_records(config)), [62, 66, 75])
+                self.assertEqual([Path(issue.file).name for issue in config.errors],
+                                 ["03_invalid_file.toml", "04_invalid_file.toml", "05_invalid_file.toml"])
+                # loads keep the error they would have raised, one per file
+                self.assertEqual((config.errors[1].kind, config.errors[1].json_path, config.errors[1].line),
+                                 ("schema", "$.item", 4))
+
+        with self.assertRaises(ValueError):
+            list(iter_records(Config(self.data_path, "toml", self.schema_loc, on_error="ignore")))
+
+    def test_locate_line(self):
+        text = 'gid = 1\n[item]\ndescription = """\nnot_a_key = 1\n"""\n[[qa]]\ndone = true\n[[qa]]\ncomments = "x"\n'
+        self.assertEqual(locate_line(text, ["gid"]), 1)
+        self.assertEqual(locate_line(text, ["item", "not_a_key"]), 2)
+        self.assertEqual(locate_line(text, ["qa", 1, "comments"]), 9)
+        self.assertEqual(locate_line(text, ["qa", 0, "done"]), 7)
+        self.assertIsNone(locate_line(text, ["metrics", "weight"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
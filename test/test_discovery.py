@@ -0,0 +1,100 @@
+import unittest
+import re
+import json
+import shutil
+import tempfile
+from pathlib import Path
+from mdframe.reader import run, Config, iter_records
+from mdframe.discovery import discover_shards, record_sort_key
+from mdframe.index import ListIndex
+from mdframe.watch import LiveTable
+
+root = Path(__file__).parent
+
+
+def canonical(record):
+    return json.dumps(record, sort_keys=True, default=str)
+
+
+class TestShardedArchive(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.schema_loc = root / "../src/mdframe/schema.json"
+        cls.data_path = root / "../src/mdframe/data"
+        cls.flat_records = list(iter_records(Config(cls.data_path, "toml", cls.schema_loc)))
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.tmp_path = Path(tmp_dir.name)
+        # two volumes with capture sessions at different depths, files spread across all of them
+        self.roots = [self.tmp_path / "volume_a", self.tmp_path / "volume_b"]
+        self.shards = [self.roots[0] / "session_1", self.roots[0] / "session_2" / "camera",
+                       self.roots[1] / "session_3", self.roots[1]]
+        for shard in self.shards:
+            shard.mkdir(parents=True, exist_ok=True)
+        for i, path in enumerate(sorted(self.data_path.glob("*.toml"))):
+            shutil.copy(path, self.shards[i % len(self.shards)] / path.name)
+        hidden = self.roots[0] / ".trash"
+        hidden.mkdir()
+        shutil.copy(root / "data" / "00_input_file.toml", hidden / "00_input_file.toml")
+
+    def config(self, **kwargs) -> Config:
+        return Config(self.roots, "toml", self.schema_loc, recursive=True, **kwargs)
+
+    def test_discovery(self):
+        shards = discover_shards(self.roots, "toml", recursive=True)
+        # by root, then by path; the hidden directory is skipped
+        self.assertEqual([shard.path for shard in shards],
+                         [self.shards[0], self.shards[1], self.roots[1], self.shards[2]])
+        self.assertEqual(sum(len(shard) for shard in shards), len(self.flat_records))
+
+        shards = discover_shards(self.roots, "toml")
+        self.assertEqual([shard.path for shard in shards], [self.roots[1]])
+
+    def test_records_are_ordered_by_gid_and_uid(self):
+        records = list(iter_records(self.config()))
+        # some files share a gid and uid, those keep the order of their shards
+        self.assertEqual([record_sort_key(record) for record in records],
+                         sorted(record_sort_key(record) for record in self.flat_records))
+        self.assertEqual(sorted(map(canonical, records)), sorted(map(canonical, self.flat_records)))
+        self.assertEqual(list(iter_records(self.config(workers=2))), records)
+        self.assertEqual([series["uid"] for series in run(self.config())], [record["uid"] for record in records])
+
+    def test_unchanged_shards_are_skipped(self):
+        cache_dir = self.tmp_path / "cache"
+        config = self.config(cache_dir=cache_dir, profile=True)
+        first = list(iter_records(config))
+        self.assertEqual(config.profiler.counters["shard_cache_misses"], len(self.shards))
+
+        config = self.config(cache_dir=cache_dir, profile=True)
+        self.assertEqual(list(iter_records(config)), first)
+        self.assertEqual(config.profiler.counters["shard_cache_hits"], len(self.shards))
+        self.assertEqual(config.profiler.counters["files"], 0)
+
+        changed = sorted(self.shards[2].glob("*.toml"))[0]
+        changed.write_text(re.sub(r"^gid = \d+", "gid = 100000", changed.read_text(), flags=re.M))
+        config = self.config(cache_dir=cache_dir, profile=True)
+        records = list(iter_records(config))
+        self.assertEqual(config.profiler.counters["shard_cache_misses"], 1)
+        self.assertEqual(config.profiler.counters["files"], len(list(self.shards[2].glob("*.toml"))))
+        self.assertEqual(records[-1]["gid"], 100000)
+        self.assertEqual(records, sorted(records, key=record_sort_key))
+
+    def test_index_and_live_table(self):
+        config = self.config()
+        index = ListIndex.build(config)
+        self.assertEqual(len(index), len(self.flat_records))
+        self.assertTrue(all(Path(key).is_absolute() for key in index._files))
+
+        table = LiveTable(config)
+        changes = table.refresh()
+        self.assertEqual(len(changes.added), len(self.flat_records))
+        gids = list(table.to_dataframe()["gid"])
+        self.assertEqual(gids, sorted(gids))
+        self.assertFalse(table.refresh())
+
+
+if __name__ == '__main__':
+    unittest.main()
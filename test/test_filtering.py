@@ -0,0 +1,72 @@
+import unittest
+import shutil
+import tempfile
+from pathlib import Path
+from mdframe.reader import Config, iter_records
+from mdframe.analysis import load_flattened_data
+from mdframe.filtering import filter_files, filter_records
+from mdframe.query import compile_query
+from mdframe.cache import ResultCache
+
+root = Path(__file__).parent
+
+
+class TestFiltering(unittest.TestCase):
+
+    def test_filter_files_query(self):
+        self.assertEqual(filter_files(root / "data", "toml", query='weight == 1'), [75])
+        self.assertEqual(filter_files(root / "data", "toml", query='started == "test" and weight == 1'), [])
+        self.assertEqual(filter_files(root / "data", "toml", query='started == "test" or weight == 1'), [75])
+
+    def test_filter_files_compares_typed_values(self):
+        self.assertEqual(filter_files(root / "data", "toml", query="weight > 50"), [62, 66])
+        self.assertEqual(filter_files(root / "data", "toml", query='weight == "1"'), [])
+        self.assertEqual(filter_files(root / "data", "toml", query="weight == 75"), [])
+
+    def test_filter_files_contain_list(self):
+        self.assertEqual(filter_files(root / "data", "toml", contain_list=["IMG_7377"]), [75])
+        self.assertEqual(filter_files(root / "data", "toml", contain_list=["IMG_0000"]), [])
+
+    def test_filter_files_result_cache(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        data_path = Path(tmp_dir.name) / "data"
+        shutil.copytree(root / "data", data_path)
+        cache = ResultCache(maxsize=2)
+
+        self.assertEqual(filter_files(data_path, "toml", query='weight == 1', cache=cache), [75])
+        # spelled differently, the same normalized query
+        self.assertEqual(filter_files(data_path, "toml", query='df["weight"]==1', cache=cache), [75])
+        self.assertEqual(cache.stats[:2], (1, 1))
+
+        filter_files(data_path, "toml", contain_list=["IMG_7377", "IMG_0000"], cache=cache)
+        filter_files(data_path, "toml", contain_list=["IMG_0000", "IMG_7377"], cache=cache)
+        self.assertEqual(cache.stats[:2], (2, 2))
+
+        # changing a metadata file changes the data version
+        changed_file = data_path / "00_input_file.toml"
+        changed_file.write_text(changed_file.read_text().replace("weight = 1\n", "weight = 2\n"))
+        self.assertEqual(filter_files(data_path, "toml", query='weight == 1', cache=cache), [])
+        self.assertEqual(cache.stats[1:], (3, 1, 2, 2))
+
+    def test_filter_records_stream(self):
+        config = Config(root / "data", "toml", root / "../src/mdframe/schema.json")
+        self.assertEqual(filter_records(iter_records(config), query='weight == 1'),
+                         filter_files(root / "data", "toml", query='weight == 1'))
+
+    def test_filter_records_matches_filter_data(self):
+        config = Config(root / "data", "toml", root / "../src/mdframe/schema.json")
+        records = list(iter_records(config))
+        df = load_flattened_data(config)
+        for query in ("weight == 1", "weight > 50", 'started == "18:11:39" and weight == 1',
+                      'started == "test" or weight == 1', "quality == 3", 'food_type contains "mash"'):
+            expected = sorted(df[compile_query(query).evaluate(df)]["gid"])
+            self.assertEqual(filter_records(records, query), expected, query)
+        self.assertEqual(filter_records(records, contain_list=["IMG_7377", "66_mashed_potatoes_0_1"]), [66, 75])
+
+        # duplicated gids are returned once
+        self.assertEqual(filter_records(records + records, "quality >= 2"), [62, 66, 75])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+root = Path(__file__).parent
+
+HEAVY_MODULES = ("pandas", "numpy", "jsonschema", "urllib3", "matplotlib", "toml", "rich", "pyarrow")
+
+
+def modules_loaded_by(code: str) -> list:
+    """Runs `code` in a fresh interpreter and returns the heavy modules it imported."""
+    probe = (f"import sys, json\n{code}\n"
+             f"print(json.dumps([name for name in {HEAVY_MODULES!r} if name in sys.modules]))")
+    output = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+class TestImportTime(unittest.TestCase):
+
+    def test_package_import_is_lazy(self):
+        self.assertEqual(modules_loaded_by("import mdframe"), [])
+
+    def test_reader_import_is_lazy(self):
+        self.assertEqual(modules_loaded_by("import mdframe.reader"), [])
+
+    def test_cli_help_is_lazy(self):
+        code = ("import sys\nfrom mdframe.reader import main\nsys.argv = ['mdfr', '--help']\n"
+                "try:\n    main()\nexcept SystemExit:\n    pass")
+        self.assertEqual(modules_loaded_by(code), [])
+
+    def test_get_avg_timing_help_is_lazy(self):
+        code = ("import sys\nfrom mdframe.nutritionverse.get_avg_timing import main\n"
+                "sys.argv = ['get_avg_timing', '--help']\n"
+                "try:\n    main()\nexcept SystemExit:\n    pass")
+        self.assertEqual(modules_loaded_by(code), [])
+
+    def test_analysis_does_not_import_matplotlib(self):
+        self.assertNotIn("matplotlib", modules_loaded_by("import mdframe.analysis"))
+
+    def test_local_schema_does_not_import_urllib3(self):
+        package = root.parent / "src" / "mdframe"
+        code = ("from pathlib import Path\nfrom mdframe.reader import Config, iter_records\n"
+                f"config = Config(Path({str(package / 'data')!r}), 'toml', {str(package / 'schema.json')!r},"
+                " validation='fast')\n"
+                "next(iter_records(config))")
+        self.assertEqual(modules_loaded_by(code), [])
+
+    def test_submodules_are_reachable_from_the_package(self):
+        self.assertIn("pandas", modules_loaded_by("import mdframe\nmdframe.timing"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from mdframe.reader import Config, iter_records
+from mdframe.filtering import filter_files, filter_records
+from mdframe.index import FileIndex, ListIndex
+
+root = Path(__file__).parent
+
+
+class TestListIndex(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.schema_loc = root / "../src/mdframe/schema.json"
+
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.data_path = self.tmp_dir / "data"
+        shutil.copytree(root / "data", self.data_path)
+        self.config = Config(self.data_path, "toml", self.schema_loc)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_lookup_matches_scan(self):
+        index = ListIndex.build(self.config)
+        records = list(iter_records(self.config))
+        for contain_list in (["IMG_7377"], ["IMG_4267", "75_nachos_0_1"], ["missing"], []):
+            self.assertEqual(index.lookup(contain_list), filter_records(records, contain_list=contain_list))
+        self.assertEqual(index.lookup(["IMG_7377"], fields=["rgbd_file_names"]), [])
+
+    def test_incomplete_index_fails_on_instantiation(self):
+        class AddOnlyIndex(FileIndex):
+            def add(self, key, record, fingerprint=None):
+                pass
+
+        with self.assertRaises(TypeError):
+            AddOnlyIndex()
+
+    def test_persisted_and_incremental(self):
+        index_path = self.tmp_dir / "index.pickle"
+        self.assertEqual(filter_files(self.data_path, "toml", contain_list=["IMG_7377"], index_path=index_path), [75])
+        self.assertTrue(index_path.exists())
+
+        changed_file = self.data_path / "00_input_file.toml"
+        changed_file.write_text(changed_file.read_text().replace('"IMG_7377"', '"IMG_9999"'))
+        (self.data_path / "01_input_file.toml").unlink()
+
+        index = ListIndex.load(index_path)
+        self.assertEqual(index.lookup(["IMG_7377"]), [75])
+        self.assertTrue(index.refresh(self.config))
+        self.assertEqual(index.lookup(["IMG_7377"]), [])
+        self.assertEqual(index.lookup(["IMG_9999"]), [75])
+        self.assertEqual(len(index), 2)
+        self.assertFalse(index.refresh(self.config))
+
+        self.assertEqual(filter_files(self.data_path, "toml", contain_list=["IMG_9999"], index_path=index_path), [75])
+
+
+if __name__ == "__main__":
+    unittest.main()
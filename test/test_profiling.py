@@ -0,0 +1,83 @@
+import unittest
+import io
+import json
+import tempfile
+from pathlib import Path
+from rich.console import Console
+from mdframe.reader import run, Config, iter_records
+from mdframe.analysis import load_flattened_data
+from mdframe.profiling import Profile, current_profile
+
+root = Path(__file__).parent
+
+
+class TestProfiling(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.schema_loc = root / "../src/mdframe/schema.json"
+        cls.data_path = root / "../src/mdframe/data"
+        cls.bytes_total = sum(path.stat().st_size for path in cls.data_path.glob("*.toml"))
+        cls.file_count = len(list(cls.data_path.glob("*.toml")))
+
+    def test_profile_is_off_by_default(self):
+        config = Config(self.data_path, "toml", self.schema_loc)
+        run(config)
+        self.assertIsNone(config.profiler)
+
+    def test_run_records_stages(self):
+        config = Config(self.data_path, "toml", self.schema_loc, profile=True)
+        run(config)
+        report = config.profiler.to_dict()
+
+        for stage in ("total", "glob", "read", "decode", "validate", "dataframe"):
+            self.assertIn(stage, report["stages"])
+        self.assertEqual(report["stages"]["decode"]["calls"], self.file_count)
+        self.assertEqual(report["counters"]["files"], self.file_count)
+        self.assertEqual(report["counters"]["bytes_read"], self.bytes_total)
+        self.assertEqual(len(report["slowest_files"]), 10)
+        seconds = [entry["seconds"] for entry in report["slowest_files"]]
+        self.assertEqual(seconds, sorted(seconds, reverse=True))
+        self.assertIsNone(current_profile())
+
+    def test_workers_are_merged(self):
+        config = Config(self.data_path, "toml", self.schema_loc, profile=True, workers=2)
+        load_flattened_data(config)
+        report = config.profiler.to_dict()
+        self.assertEqual(report["counters"]["files"], self.file_count)
+        self.assertEqual(report["stages"]["flatten"]["calls"], self.file_count)
+        self.assertIn("dataframe", report["stages"])
+
+    def test_streaming_does_not_leak_the_profile(self):
+        config = Config(self.data_path, "toml", self.schema_loc, profile=True)
+        records = iter_records(config)
+        next(records)
+        self.assertIsNone(current_profile())
+        list(records)
+        self.assertEqual(config.profiler.counters["files"], self.file_count)
+
+    def test_report_output(self):
+        config = Config(self.data_path, "toml", self.schema_loc, profile=True)
+        run(config)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            report_path = Path(tmp_dir) / "profile.json"
+            config.profiler.save(report_path)
+            self.assertEqual(json.loads(report_path.read_text()), config.profiler.to_dict())
+
+        output = io.StringIO()
+        config.profiler.print(Console(file=output, width=200))
+        self.assertIn("decode", output.getvalue())
+        self.assertIn("bytes_read", output.getvalue())
+
+    def test_merge_keeps_top_n(self):
+        profile, other = Profile(top_n=2), Profile(top_n=2)
+        profile.record_file(Path("a"), 1.0, 10)
+        other.record_file(Path("b"), 3.0, 20)
+        other.record_file(Path("c"), 2.0, 30)
+        profile.merge(other)
+        self.assertEqual([path for _, path, _ in profile.slowest_files], ["b", "c"])
+        self.assertEqual(profile.counters["bytes_read"], 60)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from pathlib import Path
+import pandas as pd
+from mdframe.reader import run, Config, iter_records, project_record
+from mdframe.analysis import load_flattened_data
+from mdframe.query import QueryError, compile_query
+
+root = Path(__file__).parent
+
+QUERIES = (
+    'quality >= 2 and food_type in ["apple", "banana"]',
+    'weight != 100',
+    'not (weight > 100) or merged',
+    '"IMG_4166" in rgbd_file_names',
+    'description contains "chip" and gid not in (52, 53)',
+    'nutrition_facts_sources',
+    'started == "15:02:33" or weight < "heavy"',
+)
+
+
+class TestPushdown(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data_path = root / "../src/mdframe/data"
+        cls.schema_loc = root / "../src/mdframe/schema.json"
+        cls.df = load_flattened_data(Config(cls.data_path, "toml", cls.schema_loc))
+
+    def test_where_matches_dataframe_queries(self):
+        for query in QUERIES:
+            with self.subTest(query=query):
+                expected = self.df[compile_query(query).evaluate(self.df)]
+                config = Config(self.data_path, "toml", self.schema_loc, where=query)
+                self.assertEqual([record["gid"] for record in iter_records(config)], list(expected["gid"]))
+
+    def test_columns(self):
+        columns = ["gid", "food_type", "weight", "time"]
+        config = Config(self.data_path, "toml", self.schema_loc, columns=columns, where="quality >= 2")
+        df = load_flattened_data(config)
+        expected = self.df[self.df["quality"] >= 2].reset_index(drop=True)
+
+        self.assertEqual(list(df.columns), ["gid", "food_type", "weight", "started", "finished"])
+        # categories only hold the values of the kept records
+        pd.testing.assert_frame_equal(df, expected[list(df.columns)], check_categorical=False)
+        self.assertEqual([series["gid"] for series in run(config)], list(expected["gid"]))
+        self.assertEqual([record.gid for record in run(config, output="records")], list(expected["gid"]))
+
+        record = {"gid": 1, "item": {"food_type": "apple", "description": "..."}, "qa": [{"comments": "..."}]}
+        self.assertEqual(project_record(record, frozenset(columns)), {"gid": 1, "item": {"food_type": "apple"}})
+
+    def test_filtered_records_are_counted(self):
+        config = Config(self.data_path, "toml", self.schema_loc, where="quality >= 2", profile=True)
+        kept = list(iter_records(config))
+        self.assertEqual(config.profiler.counters["records_filtered"], len(self.df) - len(kept))
+
+    def test_malformed_where(self):
+        config = Config(self.data_path, "toml", self.schema_loc, where="quality >=")
+        with self.assertRaises(QueryError):
+            run(config)
+
+
+if __name__ == '__main__':
+    unittest.main()
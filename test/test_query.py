@@ -0,0 +1,57 @@
+import unittest
+import pandas as pd
+from mdframe.query import compile_query, QueryError
+
+
+class TestQuery(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.df = pd.DataFrame({
+            "gid": [1, 2, 3, 4],
+            "food_type": pd.Series(["apple", "banana", "apple", "carrot"], dtype="category"),
+            "quality": [1, 2, None, 3],
+            "description": ["porous crust", "ripe", "merge failed", None],
+            "rgbd_file_names": [["IMG_1"], [], ["IMG_4166", "IMG_2"], None],
+        })
+
+    def select(self, query):
+        return self.df[compile_query(query).evaluate(self.df)]["gid"].tolist()
+
+    def test_comparisons(self):
+        self.assertEqual(self.select('gid >= 3'), [3, 4])
+        self.assertEqual(self.select('food_type == "apple"'), [1, 3])
+        self.assertEqual(self.select('quality != 2'), [1, 3, 4])
+        self.assertEqual(self.select('df["quality"] == 1'), [1])
+
+    def test_boolean_logic(self):
+        self.assertEqual(self.select('food_type == "apple" and quality == 1'), [1])
+        self.assertEqual(self.select('gid == 1 or (gid > 2 and not food_type == "carrot")'), [1, 3])
+        self.assertEqual(self.select('(df["gid"] < 2) | (df["gid"] > 3)'), [1, 4])
+        self.assertEqual(self.select('~(gid < 4)'), [4])
+
+    def test_membership(self):
+        self.assertEqual(self.select('food_type in ["banana", "carrot"]'), [2, 4])
+        self.assertEqual(self.select('gid not in (1, 2)'), [3, 4])
+        self.assertEqual(self.select('"IMG_4166" in rgbd_file_names'), [3])
+        self.assertEqual(self.select('rgbd_file_names'), [1, 3])
+
+    def test_contains(self):
+        self.assertEqual(self.select('description contains "por"'), [1])
+        self.assertEqual(self.select('rgbd_file_names contains "IMG_2"'), [3])
+
+    def test_compiled_once(self):
+        self.assertIs(compile_query('gid == 1'), compile_query('gid == 1'))
+        self.assertEqual(compile_query('gid == 1 and "x" in rgbd_file_names').columns,
+                         {"gid", "rgbd_file_names"})
+
+    def test_invalid_queries(self):
+        for query in ('__import__("os").system("ls")', 'gid ==', 'gid = 1', 'df.gid', ''):
+            with self.assertRaises(QueryError):
+                compile_query(query)
+        with self.assertRaises(QueryError):
+            compile_query('unknown == 1').evaluate(self.df)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,25 @@
 import unittest
 from pathlib import Path
-from mdframe.reader import run, Config
+from mdframe.reader import run, Config, iter_records, get_toml_backend, list_metadata_files, load_metadata_file
 import json
+import shutil
+import tempfile
 import toml
 
 root = Path(__file__).parent
 
 
+def strip_trailing_spaces(value):
+    # `toml` drops trailing spaces on the lines of multi-line strings, the other parsers keep them
+    if isinstance(value, dict):
+        return {key: strip_trailing_spaces(subvalue) for key, subvalue in value.items()}
+    if isinstance(value, list):
+        return [strip_trailing_spaces(item) for item in value]
+    if isinstance(value, str):
+        return "\n".join(line.rstrip(" ") for line in value.split("\n"))
+    return value
+
+
 class TestReader(unittest.TestCase):
 
     @classmethod
@@ -35,5 +48,65 @@ class TestReader(unittest.TestCase):
         with self.assertRaises(toml.decoder.TomlDecodeError):
             df = run(config)
 
+    def test_metadata_parallel(self):
+        config = Config(
+            data_path=root / "../src/mdframe/data",
+            metadata_file_extension="toml",
+            schema_loc=self.schema_loc
+        )
+        serial = run(config)
+        parallel = run(config, workers=4)
+        self.assertEqual([s.to_dict() for s in serial], [s.to_dict() for s in parallel])
+
+    def test_metadata_stream(self):
+        config = Config(
+            data_path=root / "../src/mdframe/data",
+            metadata_file_extension="toml",
+            schema_loc=self.schema_loc
+        )
+        expected = [s.to_dict() for s in run(config)]
+
+        records = iter_records(config, workers=2)
+        self.assertEqual(next(records), expected[0])
+        self.assertEqual([next(records)] + list(records), expected[1:])
+        self.assertEqual([s.to_dict() for s in run(config, stream=True)], expected)
+
+    def test_metadata_invalid_parallel(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp_dir = Path(tmp_dir)
+            for path in (root / "data").glob("*.toml"):
+                shutil.copy(path, tmp_dir / path.name)
+            shutil.copy(root / "invalid_data" / "invalid_file_0.toml", tmp_dir / "invalid_file_0.toml")
+            config = Config(
+                data_path=tmp_dir,
+                metadata_file_extension="toml",
+                schema_loc=self.schema_loc,
+                workers=2
+            )
+
+            with self.assertRaises(toml.decoder.TomlDecodeError) as context:
+                run(config)
+            self.assertIn("invalid_file_0.toml", str(context.exception))
+
+    def test_toml_backends_agree(self):
+        schema = json.loads(self.schema_loc.read_text())
+        data_paths = list_metadata_files(root / "../src/mdframe/data", "toml")
+        reference = [strip_trailing_spaces(load_metadata_file(path, schema, toml_backend=get_toml_backend("toml")))
+                     for path in data_paths]
+        for name in ("tomllib", "tomli"):
+            try:
+                backend = get_toml_backend(name)
+            except ImportError:
+                continue
+            with self.subTest(backend=name):
+                records = [strip_trailing_spaces(load_metadata_file(path, schema, toml_backend=backend))
+                           for path in data_paths]
+                self.assertEqual(records, reference)
+                with self.assertRaises(toml.decoder.TomlDecodeError) as context:
+                    load_metadata_file(root / "invalid_data" / "invalid_file_0.toml", schema, toml_backend=backend)
+                self.assertIn("invalid_file_0.toml", str(context.exception))
+                self.assertEqual(context.exception.lineno, 7)
+
+
 if __name__ == "__main__":
     unittest.main()
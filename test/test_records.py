@@ -0,0 +1,89 @@
+import unittest
+import gc
+import pickle
+import tracemalloc
+from pathlib import Path
+import pandas as pd
+from mdframe.reader import run, Config, iter_records
+from mdframe.analysis import load_flattened_data
+from mdframe.filtering import filter_records
+from mdframe.records import MetadataRecord, record_class, records_to_dataframe
+
+root = Path(__file__).parent
+
+
+class TestRecords(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.config = Config(
+            data_path=root / "../src/mdframe/data",
+            metadata_file_extension="toml",
+            schema_loc=root / "../src/mdframe/schema.json"
+        )
+        cls.dicts = list(iter_records(cls.config))
+        cls.records = run(cls.config, output="records")
+
+    def test_generated_class(self):
+        cls = record_class(self.config.schema)
+        self.assertIs(cls, record_class(self.config.schema))
+        self.assertTrue(issubclass(cls, MetadataRecord))
+        self.assertIn("weight", cls.__slots__)
+        self.assertIs(cls.__annotations__["gid"], int)
+        with self.assertRaises(AttributeError):
+            self.records[0].not_in_schema = 1
+
+        with self.assertRaises(ValueError):
+            record_class({"properties": {"a": {"type": "object", "properties": {"x": {}}},
+                                         "b": {"type": "object", "properties": {"x": {}}}}})
+
+    def test_records_round_trip(self):
+        self.assertEqual([record.to_dict() for record in self.records], self.dicts)
+        self.assertEqual([series.to_dict() for series in run(self.config)],
+                         [record.to_series().to_dict() for record in self.records])
+
+        record = next(record for record in self.records if record.qa)
+        self.assertEqual(record.gid, record["gid"])
+        self.assertIsInstance(record.qa_tuples[0][1], tuple)
+        # keys of `qa` entries are shared between records
+        keys = [keys for other in self.records for keys, _ in other.qa_tuples]
+        self.assertEqual(len({id(entry_keys) for entry_keys in keys}), len(set(keys)))
+        # properties missing from the schema (`model.merged`) are kept too
+        merged = next(record for record in self.records if "merged" in record)
+        self.assertIsInstance(merged["merged"], bool)
+        with self.assertRaises(KeyError):
+            self.records[0]["no_such_property"]
+
+    def test_streaming_and_pickling(self):
+        self.assertEqual(list(run(self.config, stream=True, output="records")), self.records)
+        self.assertEqual(pickle.loads(pickle.dumps(self.records)), self.records)
+        with self.assertRaises(ValueError):
+            run(self.config, output="frames")
+
+    def test_to_dataframe(self):
+        expected = load_flattened_data(self.config)
+        df = records_to_dataframe(self.records)
+        self.assertEqual(sorted(df.columns), sorted(expected.columns))
+        pd.testing.assert_frame_equal(df[expected.columns], expected)
+        pd.testing.assert_frame_equal(load_flattened_data(self.records)[expected.columns], expected)
+        self.assertEqual(filter_records(self.records, query="quality >= 2"),
+                         filter_records(self.dicts, query="quality >= 2"))
+
+    def test_records_are_smaller_than_series(self):
+        def traced_size(output):
+            gc.collect()
+            tracemalloc.start()
+            try:
+                loaded = run(self.config, output=output)
+                return tracemalloc.get_traced_memory()[0] / len(loaded)
+            finally:
+                tracemalloc.stop()
+
+        # warm up pandas and the record class, so that only the loaded data is measured
+        traced_size("series")
+        traced_size("records")
+        self.assertLess(traced_size("records") * 3, traced_size("series"))
+
+
+if __name__ == '__main__':
+    unittest.main()
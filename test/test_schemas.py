@@ -0,0 +1,101 @@
+import unittest
+import json
+import shutil
+import tempfile
+import threading
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import urllib3
+from urllib3.exceptions import HTTPError
+from mdframe.reader import run, Config
+from mdframe.schemas import clear_memory_cache, fetch_schema
+
+root = Path(__file__).parent
+
+
+class SchemaHandler(BaseHTTPRequestHandler):
+    schema_bytes = b""
+    etag = '"v1"'
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", self.etag)
+        self.send_header("Content-Length", str(len(self.schema_bytes)))
+        self.end_headers()
+        self.wfile.write(self.schema_bytes)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestSchemaCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.schema_loc = root / "../src/mdframe/schema.json"
+        SchemaHandler.schema_bytes = cls.schema_loc.read_bytes()
+
+    def setUp(self):
+        clear_memory_cache()
+        SchemaHandler.requests = []
+        SchemaHandler.etag = '"v1"'
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), SchemaHandler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/schema.json"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        # no retries so the offline tests don't wait for the backoff
+        self.pool = urllib3.PoolManager(retries=False)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        clear_memory_cache()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_config_fetches_schema_once(self):
+        config = Config(root / "data", "toml", self.url, schema_cache_dir=self.tmp_dir)
+        records = run(config)
+        self.assertEqual(len(records), 3)
+        self.assertEqual(config.schema, json.loads(SchemaHandler.schema_bytes))
+
+        run(Config(root / "data", "toml", self.url, schema_cache_dir=self.tmp_dir))
+        self.assertEqual(len(SchemaHandler.requests), 1)
+
+    def test_revalidates_after_ttl(self):
+        schema = fetch_schema(self.url, self.tmp_dir, ttl=0, pool=self.pool)
+        clear_memory_cache()
+        self.assertEqual(fetch_schema(self.url, self.tmp_dir, ttl=0, pool=self.pool), schema)
+        self.assertEqual(SchemaHandler.requests, [None, '"v1"'])
+
+        SchemaHandler.etag = '"v2"'
+        SchemaHandler.schema_bytes = json.dumps({"type": "object"}).encode()
+        try:
+            self.assertEqual(fetch_schema(self.url, self.tmp_dir, ttl=0, pool=self.pool), {"type": "object"})
+        finally:
+            SchemaHandler.schema_bytes = self.schema_loc.read_bytes()
+
+    def test_falls_back_to_last_good_copy_when_offline(self):
+        schema = fetch_schema(self.url, self.tmp_dir, ttl=0, pool=self.pool)
+        self.server.shutdown()
+        self.server.server_close()
+        clear_memory_cache()
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            self.assertEqual(fetch_schema(self.url, self.tmp_dir, ttl=0, pool=self.pool), schema)
+        self.assertTrue(any("cached" in str(warning.message) for warning in caught))
+
+        with self.assertRaises(HTTPError):
+            fetch_schema(self.url, self.tmp_dir / "empty", ttl=0, pool=self.pool)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from mdframe.reader import Config, iter_records
+from mdframe.index import DEFAULT_INDEX_DIR, ListIndex
+from mdframe.search import TextIndex, field_text, tokenize
+
+root = Path(__file__).parent
+
+FIELDS = ("description", "quality_comments", "qa.comments")
+
+
+class TestTextIndex(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.schema_loc = root / "../src/mdframe/schema.json"
+
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.data_path = self.tmp_dir / "data"
+        shutil.copytree(root / "data", self.data_path)
+        self.config = Config(self.data_path, "toml", self.schema_loc)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_search_matches_scan(self):
+        config = Config(root / "../src/mdframe/data", "toml", self.schema_loc)
+        index = TextIndex.build(config)
+        records = list(iter_records(config))
+        for text in ("porous", "merge", "missing", "unable merg", "Meshlab", "no such words"):
+            with self.subTest(text=text):
+                expected = sorted(
+                    record["gid"] for record in records
+                    if all(any(word.startswith(term) for field in FIELDS for word in tokenize(field_text(record, field)))
+                           for term in tokenize(text)))
+                hits = index.search(text)
+                self.assertEqual(sorted(hit.gid for hit in hits), expected)
+                self.assertEqual([hit.score for hit in hits], sorted((hit.score for hit in hits), reverse=True))
+
+        # exact matches rank above prefix matches, boosts select and weight the fields
+        self.assertEqual(index.search("poro", prefix=False), [])
+        self.assertGreater(index.search("porous")[0].score, index.search("poro")[0].score)
+        hits = index.search("chips", boosts={"description": 1.0})
+        self.assertTrue(hits)
+        self.assertTrue(all(hit.fields == ("description",) for hit in hits))
+        self.assertEqual(len(index.search("merge", limit=3)), 3)
+
+    def test_persisted_and_incremental(self):
+        index_path = TextIndex.default_path(self.config, self.tmp_dir / "indexes")
+        index = TextIndex.open(self.config, index_path)
+        self.assertTrue(index_path.exists())
+        self.assertFalse(list(self.data_path.glob(".mdframe-*")))
+        self.assertEqual(sorted(hit.key for hit in index.search("merge")),
+                         ["00_input_file.toml", "01_input_file.toml", "02_input_file.toml"])
+        self.assertEqual([hit.gid for hit in index.search("triangular")], [75])
+
+        changed_file = self.data_path / "00_input_file.toml"
+        changed_file.write_text(changed_file.read_text().replace("triangular", "round"))
+        (self.data_path / "01_input_file.toml").unlink()
+
+        index = TextIndex.load(index_path)
+        self.assertTrue(index.refresh(self.config))
+        self.assertEqual(index.search("triangular"), [])
+        self.assertEqual([hit.gid for hit in index.search("round")], [75])
+        self.assertEqual(sorted(hit.key for hit in index.search("merge")), ["00_input_file.toml", "02_input_file.toml"])
+        self.assertFalse(index.refresh(self.config))
+
+        with self.assertRaises(ValueError):
+            ListIndex.load(index_path)
+
+    def test_default_path(self):
+        index_path = TextIndex.default_path(self.config)
+        self.assertEqual(index_path.parents[1], DEFAULT_INDEX_DIR)
+        self.assertEqual(index_path.name, TextIndex.default_file_name)
+        self.assertNotEqual(ListIndex.default_path(self.config), index_path)
+        other = Config(root / "data", "toml", self.schema_loc)
+        self.assertNotEqual(TextIndex.default_path(other).parent, index_path.parent)
+
+        # an index which can't be written is still usable
+        (self.tmp_dir / "file").write_text("")
+        index = TextIndex.open(self.config, self.tmp_dir / "file" / "index.pickle")
+        self.assertEqual([hit.gid for hit in index.search("triangular")], [75])
+
+
+if __name__ == "__main__":
+    unittest.main()
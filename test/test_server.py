@@ -0,0 +1,127 @@
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import urlopen
+from mdframe.reader import Config, get_toml_backend
+from mdframe.analysis import load_flattened_data
+from mdframe.filtering import filter_files
+from mdframe.server import MetadataServer
+
+root = Path(__file__).parent
+
+
+class TestServer(unittest.TestCase):
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.data_path = Path(tmp_dir.name) / "data"
+        shutil.copytree(root / "../src/mdframe/data", self.data_path)
+        self.config = Config(self.data_path, "toml", root / "../src/mdframe/schema.json")
+        self.df = load_flattened_data(self.config)
+
+        self.server = MetadataServer(self.config, port=0, threads=4, interval=0.05, quiet=True)
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+
+        def stop():
+            self.server.shutdown()
+            self.server.server_close()
+            thread.join()
+        self.addCleanup(stop)
+
+    def get(self, path, **parameters):
+        url = f"{self.server.url}{path}"
+        if parameters:
+            url += "?" + urlencode(parameters, doseq=True)
+        with urlopen(url, timeout=10) as response:
+            return json.load(response)
+
+    def test_queries(self):
+        self.assertEqual(self.get("/status")["records"], len(self.df))
+
+        query = 'quality >= 2 and food_type == "apple"'
+        self.assertEqual(self.get("/filter", query=query, contains="IMG_4166")["gids"],
+                         filter_files(self.data_path, "toml", query=query, contain_list=["IMG_4166"]))
+        # /filter and /records both compare typed values
+        for query in ("weight > 100", "weight == 234"):
+            with self.subTest(query=query):
+                self.assertEqual(self.get("/filter", query=query)["gids"],
+                                 filter_files(self.data_path, "toml", query=query))
+        gids = self.get("/filter", query="weight > 100")["gids"]
+        self.assertEqual(gids, sorted(set(self.df[self.df["weight"] > 100]["gid"])))
+        self.assertTrue(gids)
+
+        rows = self.get("/records", where="quality >= 2", columns="gid,weight", limit=3)["records"]
+        expected = self.df[self.df["quality"] >= 2].head(3)
+        self.assertEqual([row["gid"] for row in rows], list(expected["gid"]))
+        self.assertEqual({key for row in rows for key in row}, {"gid", "weight"})
+
+        records = self.get("/gid/52")["records"]
+        self.assertEqual({record["gid"] for record in records}, {52})
+        self.assertIn("item", records[0])
+
+        hits = self.get("/search", text="unable merg", limit=5)["hits"]
+        self.assertEqual(len(hits), 5)
+        self.assertIn("quality_comments", hits[0]["fields"])
+
+        histogram = self.get("/histogram", property="food_type")
+        self.assertEqual(sum(histogram["counts"]) + histogram["missing"], len(self.df))
+        histogram = self.get("/histogram", property="weight", type="continuous", bins=5)
+        self.assertEqual(len(histogram["edges"]), 6)
+
+        timing = self.get("/timing", group_by="food_type")
+        self.assertGreater(timing["count"], 0)
+        self.assertEqual(sum(group["count"] for group in timing["groups"]), timing["count"])
+
+    def test_errors(self):
+        for path, parameters, status in (("/gid/123456", {}, 404),
+                                         ("/nothing", {}, 404),
+                                         ("/records", {"where": "quality >="}, 400),
+                                         ("/histogram", {}, 400),
+                                         ("/histogram", {"property": "weight", "type": "pie"}, 400)):
+            with self.subTest(path=path, parameters=parameters):
+                with self.assertRaises(HTTPError) as context:
+                    self.get(path, **parameters)
+                self.assertEqual(context.exception.code, status)
+                self.assertIn("error", json.load(context.exception))
+
+    def test_reload(self):
+        version = self.get("/status")["version"]
+        removed = sorted(self.data_path.glob("*.toml"))[0]
+        uid = get_toml_backend().loads(removed.read_text())["uid"]
+        self.assertEqual(len(self.get(f"/uid/{uid}")["records"]), 1)
+        removed.unlink()
+        self.server.service.reload()
+
+        status = self.get("/status")
+        self.assertEqual(status["records"], len(self.df) - 1)
+        self.assertGreater(status["version"], version)
+        with self.assertRaises(HTTPError) as context:
+            self.get(f"/uid/{uid}")
+        self.assertEqual(context.exception.code, 404)
+
+    def test_reload_broken_file(self):
+        broken = sorted(self.data_path.glob("*.toml"))[0]
+        text = broken.read_text()
+        broken.write_text(text + "\nnot toml\n")
+        self.server.service.reload()
+
+        status = self.get("/status")
+        self.assertEqual(status["records"], len(self.df) - 1)
+        self.assertEqual(list(status["errors"]), [broken.name])
+
+        broken.write_text(text)
+        self.server.service.reload()
+        status = self.get("/status")
+        self.assertEqual(status["records"], len(self.df))
+        self.assertEqual(status["errors"], {})
+
+
+if __name__ == '__main__':
+    unittest.main()
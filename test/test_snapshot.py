@@ -0,0 +1,74 @@
+import importlib.util
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+from pathlib import Path
+import pandas as pd
+from mdframe.reader import Config, save_snapshot, load_snapshot, is_snapshot_stale
+from mdframe.analysis import load_flattened_data
+
+root = Path(__file__).parent
+
+
+def _same(a, b) -> bool:
+    a_missing = not isinstance(a, list) and pd.isna(a)
+    b_missing = not isinstance(b, list) and pd.isna(b)
+    if a_missing or b_missing:
+        return a_missing and b_missing
+    return a == b
+
+
+@unittest.skipUnless(importlib.util.find_spec("pyarrow"), "snapshots require pyarrow")
+class TestSnapshot(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.schema_loc = root / "../src/mdframe/schema.json"
+
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_round_trip(self):
+        config = Config(root / "../src/mdframe/data", "toml", self.schema_loc)
+        expected = load_flattened_data(config)
+
+        for name in ("snapshot.feather", "snapshot.parquet"):
+            snapshot_path = self.tmp_dir / name
+            save_snapshot(config, snapshot_path)
+            df = load_snapshot(snapshot_path)
+
+            self.assertEqual(list(df.columns), list(expected.columns))
+            self.assertIsInstance(df["unit"].dtype, pd.CategoricalDtype)
+            for column in expected.columns:
+                for value, expected_value in zip(df[column].astype(object), expected[column].astype(object)):
+                    self.assertTrue(_same(value, expected_value), (column, value, expected_value))
+            self.assertFalse(is_snapshot_stale(snapshot_path, config))
+
+    def test_stale_snapshot(self):
+        data_path = self.tmp_dir / "data"
+        shutil.copytree(root / "data", data_path)
+        config = Config(data_path, "toml", self.schema_loc)
+        snapshot_path = self.tmp_dir / "snapshot.feather"
+
+        save_snapshot(config, snapshot_path)
+        self.assertFalse(is_snapshot_stale(snapshot_path, config))
+
+        (data_path / "01_input_file.toml").unlink()
+        self.assertTrue(is_snapshot_stale(snapshot_path, config))
+
+
+class TestSnapshotWithoutPyarrow(unittest.TestCase):
+
+    def test_missing_pyarrow_names_extra(self):
+        with mock.patch.dict(sys.modules, {"pyarrow": None}):
+            with self.assertRaisesRegex(ImportError, r"mdframe\[snapshot\]"):
+                load_snapshot(Path("snapshot.feather"))
+
+
+if __name__ == "__main__":
+    unittest.main()
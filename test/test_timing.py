@@ -1,6 +1,6 @@
 import unittest
 import pandas as pd
-from mdframe.timing import calc_time_and_rate_from_a_generic_df
+from mdframe.timing import calc_time_and_rate_from_a_generic_df, calc_timing, calc_durations
 
 
 class TestTiming(unittest.TestCase):
@@ -17,5 +17,93 @@ class TestTiming(unittest.TestCase):
         self.assertEqual(total_time.total_seconds(), 30.0)
         self.assertAlmostEqual(rate, 0.1)
 
+    def test_calc_time_and_rate_from_records(self):
+        records = [
+            {"gid": 0, "time": {"started": "18:00:00", "finished": "18:00:30"}},
+            {"gid": 1, "time": {"started": "18:01:00", "finished": "18:01:30"}},
+        ]
+        total_time, rate = calc_time_and_rate_from_a_generic_df(records, start_key="started", end_key="finished")
+        self.assertEqual(total_time, 60.0)
+        self.assertAlmostEqual(rate, 2 / 60)
+
+    def test_calc_time_and_rate_invalid_samples(self):
+        df = pd.DataFrame({
+            "time": [
+                {"start": "2022-01-01 00:00:00", "end": "2022-01-01 00:00:10"},
+                {"start": "garbage", "end": "2022-01-01 00:00:20"},
+                {"start": "2022-01-01 00:00:20", "end": None}
+            ]
+        })
+        with self.assertRaises(ValueError):
+            calc_time_and_rate_from_a_generic_df(df)
+        total_time, rate = calc_time_and_rate_from_a_generic_df(df, skip_invalid=True)
+        self.assertEqual(total_time.total_seconds(), 10.0)
+        self.assertAlmostEqual(rate, 0.1)
+
+        records = [
+            {"gid": 0, "time": {"started": "18:00:00", "finished": "18:00:30"}},
+            {"gid": 1, "time": {"started": "18:01:00", "finished": "not a time"}},
+        ]
+        with self.assertRaises(ValueError):
+            calc_time_and_rate_from_a_generic_df(records, start_key="started", end_key="finished")
+        total_time, rate = calc_time_and_rate_from_a_generic_df(records, start_key="started", end_key="finished",
+                                                                skip_invalid=True)
+        self.assertEqual(total_time, 30.0)
+        self.assertAlmostEqual(rate, 1 / 30)
+        self.assertEqual(calc_timing(records).skipped, 1)
+
+    def test_calc_time_and_rate_from_dataframes(self):
+        frames = [
+            pd.DataFrame({"time": [{"start": "2022-01-01 00:00:00", "end": "2022-01-01 00:00:10"}]}),
+            pd.DataFrame({"time": [{"start": "2022-01-01 00:00:10", "end": "2022-01-01 00:00:30"}]}),
+        ]
+        total_time, rate = calc_time_and_rate_from_a_generic_df(iter(frames))
+        self.assertEqual(total_time, 30.0)
+        self.assertAlmostEqual(rate, 2 / 30)
+
+    def test_calc_durations(self):
+        durations = calc_durations(
+            ["23:50:00", "2022-01-01 00:00:00", None, "10:00:00", "garbage"],
+            ["00:10:00", "2022-01-01 00:01:00", "10:00:00", "2022-01-01 10:00:00", "10:00:00"]
+        )
+        self.assertEqual(durations[0], 20 * 60)
+        self.assertEqual(durations[1], 60)
+        self.assertTrue(pd.isna(durations[2:]).all())
+
+    def test_calc_durations_clock_times_without_seconds(self):
+        durations = calc_durations(["14:24", "9:05", "23:50"], ["14:48:13", "9:06", "00:10"])
+        self.assertEqual(durations.tolist(), [24 * 60 + 13, 60, 20 * 60])
+
+    def test_calc_durations_long_wrap_is_invalid(self):
+        # a placeholder end of midnight would otherwise count as a long overnight run
+        durations = calc_durations(["18:09:20", "23:00:00", "10:00:00"], ["00:00:00", "02:59:59", "00:00:00"])
+        self.assertTrue(pd.isna(durations[0]))
+        self.assertEqual(durations[1], 4 * 60 * 60 - 1)
+        self.assertTrue(pd.isna(durations[2]))
+
+    def test_calc_timing_groups(self):
+        records = [
+            {"item": {"food_type": "apple"}, "time": {"started": "10:00:00", "finished": "10:10:00"}},
+            {"item": {"food_type": "apple"}, "time": {"started": "11:00:00", "finished": "11:20:00"}},
+            {"item": {"food_type": "pear"}, "time": {"started": "23:55:00", "finished": "00:05:00"}},
+            {"item": {"food_type": "pear"}},
+        ]
+        summary = calc_timing(records, group_by="food_type")
+        self.assertEqual(summary.total_time, 40 * 60)
+        self.assertEqual(summary.count, 3)
+        self.assertEqual(summary.skipped, 1)
+        self.assertEqual(summary.groups.loc["apple", "total_time"], 30 * 60)
+        self.assertEqual(summary.groups.loc["pear", "count"], 1)
+        self.assertAlmostEqual(summary.groups.loc["apple", "rate"], 2 / (30 * 60))
+
+        flattened = pd.DataFrame([
+            {"food_type": "apple", "started": "10:00:00", "finished": "10:10:00"},
+            {"food_type": "pear", "started": "10:00:00", "finished": "10:05:00"},
+        ])
+        summary = calc_timing(flattened, group_by="food_type")
+        self.assertEqual(summary.total_time, 15 * 60)
+        self.assertEqual(summary.groups.loc["pear", "total_time"], 5 * 60)
+
+
 if __name__ == "__main__":
     unittest.main()
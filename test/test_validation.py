@@ -0,0 +1,68 @@
+import copy
+import json
+import unittest
+from pathlib import Path
+import toml
+from jsonschema import ValidationError, SchemaError
+from mdframe.reader import run, Config
+from mdframe.validation import MetadataValidator
+
+root = Path(__file__).parent
+
+
+class TestValidation(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.schema_loc = root / "../src/mdframe/schema.json"
+        with open(cls.schema_loc, "r") as f:
+            cls.schema = json.load(f)
+        with open(root / "data" / "00_input_file.toml", "r") as f:
+            cls.record = toml.load(f)
+
+    def test_modes_accept_valid_record(self):
+        for mode in ("full", "fast", "off"):
+            MetadataValidator(self.schema, mode)(self.record)
+
+    def test_missing_required_key(self):
+        record = copy.deepcopy(self.record)
+        del record["item"]["food_type"]
+        for mode in ("full", "fast"):
+            with self.assertRaises(ValidationError) as context:
+                MetadataValidator(self.schema, mode)(record)
+            self.assertEqual(context.exception.message, "'food_type' is a required property")
+        MetadataValidator(self.schema, "off")(record)
+
+    def test_wrong_type(self):
+        record = copy.deepcopy(self.record)
+        record["gid"] = "75"
+        for mode in ("full", "fast"):
+            with self.assertRaises(ValidationError) as context:
+                MetadataValidator(self.schema, mode)(record)
+            self.assertEqual(context.exception.message, "'75' is not of type 'integer'")
+
+        record["gid"] = True
+        with self.assertRaises(ValidationError):
+            MetadataValidator(self.schema, "fast")(record)
+
+    def test_invalid_schema(self):
+        with self.assertRaises(SchemaError):
+            MetadataValidator({"type": "not-a-type"})
+
+    def test_config_reuses_validator(self):
+        config = Config(
+            data_path=root / "data",
+            metadata_file_extension="toml",
+            schema_loc=self.schema_loc,
+            validation="fast"
+        )
+        self.assertIs(config.validator, config.validator)
+        self.assertEqual(config.validator.mode, "fast")
+
+        full = run(Config(root / "data", "toml", self.schema_loc))
+        fast = run(config)
+        self.assertEqual([s.to_dict() for s in full], [s.to_dict() for s in fast])
+
+
+if __name__ == "__main__":
+    unittest.main()
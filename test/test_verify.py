@@ -0,0 +1,76 @@
+import unittest
+import shutil
+import tempfile
+from pathlib import Path
+from mdframe.reader import Config, get_toml_backend
+from mdframe.verify import asset_file_names, iter_assets, verify_assets
+
+root = Path(__file__).parent
+
+FILES = ("0000_apple_0.toml", "0052_tortillacornchips_2.toml", "0076_rice_0.toml")
+
+
+class TestVerify(unittest.TestCase):
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.tmp_path = Path(tmp_dir.name)
+        self.data_path = self.tmp_path / "data"
+        self.data_path.mkdir()
+        self.schema_loc = root / "../src/mdframe/schema.json"
+        for name in FILES:
+            shutil.copy(root / "../src/mdframe/data" / name, self.data_path / name)
+        toml_backend = get_toml_backend()
+
+        # all assets of gid 52 exist, gid 76 has an empty RGBD capture and no photos
+        record = toml_backend.loads((self.data_path / FILES[1]).read_text())
+        self.assets_52 = list(iter_assets(record))
+        for _, name in self.assets_52:
+            (self.data_path / f"{name}.jpg").write_bytes(b"\xff\xd8")
+        record = toml_backend.loads((self.data_path / FILES[2]).read_text())
+        self.assets_76 = list(iter_assets(record))
+        (self.data_path / f"{self.assets_76[0][1]}.txt").touch()
+        self.config = Config(self.data_path, "toml", self.schema_loc, cache_dir=self.tmp_path / "cache")
+
+    def test_report(self):
+        apple, chips, rice = verify_assets(self.config, threads=4)
+        self.assertEqual([report.gid for report in (apple, chips, rice)], [0, 52, 76])
+
+        # no assets referenced and none claimed present
+        self.assertEqual(apple.assets, 0)
+        self.assertTrue(apple.ok)
+
+        self.assertEqual(chips.assets, len(self.assets_52))
+        self.assertEqual((chips.missing, chips.empty), ([], []))
+        self.assertTrue(chips.rgbd_files_found)
+
+        self.assertEqual(rice.empty, [self.assets_76[0]])
+        self.assertEqual(rice.missing, self.assets_76[1:])
+        self.assertFalse(rice.ok)
+
+    def test_cache_is_keyed_by_directory_mtime(self):
+        verify_assets(self.config)
+        self.assertTrue((self.tmp_path / "cache" / "stat-cache.pickle").exists())
+
+        # rewriting a file in place leaves the directory untouched, its cached size is reused
+        asset = self.data_path / f"{self.assets_52[-1][1]}.jpg"
+        with open(asset, "r+b") as f:
+            f.truncate(0)
+        chips = verify_assets(self.config)[1]
+        self.assertEqual(chips.empty, [])
+
+        # empty files are checked again, as are all files of a changed directory
+        (self.data_path / f"{self.assets_76[0][1]}.txt").write_text("0.0 0.0 0.0")
+        asset.unlink()
+        rice, chips = verify_assets(self.config)[2], verify_assets(self.config)[1]
+        self.assertEqual(rice.empty, [])
+        self.assertEqual(chips.missing, [self.assets_52[-1]])
+
+    def test_asset_file_names(self):
+        self.assertEqual(asset_file_names("IMG_7099"), ["IMG_7099.txt", "IMG_7099.jpg"])
+        self.assertEqual(asset_file_names("IMG_7099.jpg"), ["IMG_7099.jpg"])
+
+
+if __name__ == '__main__':
+    unittest.main()
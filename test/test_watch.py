@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from mdframe.reader import Config, iter_records
+from mdframe.analysis import load_flattened_data
+from mdframe.watch import LiveTable
+
+root = Path(__file__).parent
+
+
+class TestLiveTable(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.schema_loc = root / "../src/mdframe/schema.json"
+
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.data_path = self.tmp_dir / "data"
+        shutil.copytree(root / "data", self.data_path)
+        self.config = Config(self.data_path, "toml", self.schema_loc)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_initial_load(self):
+        table = LiveTable(self.config)
+        changes = table.refresh()
+        self.assertEqual(len(changes.added), 3)
+        self.assertTrue(table.to_dataframe().equals(load_flattened_data(self.config)))
+        self.assertFalse(table.refresh())
+
+    def test_incremental_changes(self):
+        table = LiveTable(self.config)
+        table.refresh()
+        total_time = table.aggregates.total_time
+
+        changed_file = self.data_path / "00_input_file.toml"
+        changed_file.write_text(changed_file.read_text().replace('food_type = "nachos"', 'food_type = "chips"'))
+        os.utime(changed_file, ns=(0, 0))
+        shutil.copy(self.data_path / "01_input_file.toml", self.data_path / "03_input_file.toml")
+        (self.data_path / "02_input_file.toml").unlink()
+        shutil.copy(root / "invalid_data" / "invalid_file_0.toml", self.data_path / "04_invalid_file.toml")
+
+        changes = table.refresh()
+        self.assertEqual(changes.added, ["03_input_file.toml"])
+        self.assertEqual(changes.modified, ["00_input_file.toml"])
+        self.assertEqual(changes.removed, ["02_input_file.toml"])
+        self.assertIn("04_invalid_file.toml", changes.errors)
+
+        self.assertEqual(len(table), 3)
+        self.assertEqual(table.aggregates.count, 3)
+        self.assertEqual(table.aggregates.food_types["chips"], 1)
+        self.assertNotIn("nachos", table.aggregates.food_types)
+        self.assertNotEqual(table.aggregates.total_time, total_time)
+        self.assertEqual(table.to_dataframe()["food_type"].tolist()[0], "chips")
+
+    def test_where_columns_and_on_error(self):
+        config = Config(self.data_path, "toml", self.schema_loc, columns=["gid", "food_type"],
+                        where='food_type != "chips"', on_error="collect")
+        table = LiveTable(config)
+        table.refresh()
+        self.assertEqual(table.ordered_records(), list(iter_records(config)))
+        self.assertEqual(set(table.to_dataframe().columns), {"gid", "food_type"})
+
+        # a record which stops matching `where` leaves the table
+        changed_file = self.data_path / "00_input_file.toml"
+        changed_file.write_text(changed_file.read_text().replace('food_type = "nachos"', 'food_type = "chips"'))
+        os.utime(changed_file, ns=(0, 0))
+        shutil.copy(root / "invalid_data" / "invalid_file_0.toml", self.data_path / "04_invalid_file.toml")
+        changes = table.refresh()
+        self.assertEqual(changes.removed, ["00_input_file.toml"])
+        self.assertEqual(list(changes.errors), ["04_invalid_file.toml"])
+        self.assertEqual([Path(issue.file).name for issue in config.errors], ["04_invalid_file.toml"])
+        self.assertEqual(table.ordered_records(), list(iter_records(config)))
+
+        (self.data_path / "04_invalid_file.toml").unlink()
+        table.refresh()
+        self.assertEqual(config.errors, [])
+
+        config = Config(self.data_path, "toml", self.schema_loc, on_error="skip")
+        shutil.copy(root / "invalid_data" / "invalid_file_0.toml", self.data_path / "04_invalid_file.toml")
+        self.assertEqual(LiveTable(config).refresh().errors, {})
+
+        with self.assertRaises(ValueError):
+            LiveTable(Config(self.data_path, "toml", self.schema_loc, on_error="ignore"))
+
+
+if __name__ == "__main__":
+    unittest.main()